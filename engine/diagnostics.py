@@ -0,0 +1,188 @@
+"""
+Script:         diagnostics.py
+Author:         DevOps Team
+
+Description:
+    Runtime diagnostics behind the MCP service admin endpoints: a CPU profile of the
+    event loop thread for a fixed window, tracemalloc reports (top allocation sites and
+    the difference since the previous report), and the running asyncio tasks with their
+    ages and where they are suspended.
+
+    Nothing here costs anything until it is used: task ages are recorded by a task
+    factory installed only when the admin endpoints are enabled, and profiling and
+    allocation tracing run only between an explicit start and stop.
+"""
+
+import asyncio
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+import weakref
+from typing import Any, Optional
+
+AUTO_FORGE_MODULE_NAME = "Diagnostics"
+AUTO_FORGE_MODULE_DESCRIPTION = "Event loop profiling and memory diagnostics"
+
+AUTO_FORGE_PROFILE_MAX_SECONDS = 60.0  # Longest profiling window one request may ask for
+AUTO_FORGE_PROFILE_SORT_KEYS = ("cumulative", "tottime", "ncalls", "pcalls", "filename", "name")
+AUTO_FORGE_DIAGNOSTICS_LIMIT = 25  # Default rows per report
+AUTO_FORGE_TRACEMALLOC_FRAMES = 10  # Stack depth recorded per allocation while tracing
+
+# Allocations made by the tracing machinery itself are noise in every report
+_TRACEMALLOC_FILTERS = (tracemalloc.Filter(False, tracemalloc.__file__),
+                        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+                        tracemalloc.Filter(False, "<unknown>"))
+
+
+class CoreDiagnostics:
+    """
+    Diagnostics for one service event loop. `install()` must run on that loop; the
+    profile and task reports describe the loop thread only (tool processes are not
+    included, their cost is visible in /status and the job history).
+    """
+
+    def __init__(self) -> None:
+        self._created: "weakref.WeakKeyDictionary[asyncio.Task, float]" = weakref.WeakKeyDictionary()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._previous_factory: Any = None
+        self._profiling: bool = False
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._started_tracing: bool = False  # tracemalloc was started here (not by PYTHONTRACEMALLOC)
+
+    def install(self, loop: asyncio.AbstractEventLoop) -> None:
+        """ Record the creation time of every task created on `loop` from now on. """
+        if self._loop is not None:
+            return
+        previous = loop.get_task_factory()
+
+        def _factory(_loop: asyncio.AbstractEventLoop, coro: Any, **kwargs: Any) -> asyncio.Task:
+            task = previous(_loop, coro, **kwargs) if previous is not None else asyncio.Task(coro, loop=_loop, **kwargs)
+            self._created[task] = time.monotonic()
+            return task
+
+        loop.set_task_factory(_factory)
+        self._loop, self._previous_factory = loop, previous
+
+    def uninstall(self) -> None:
+        """ Restore the loop's previous task factory and stop tracing started here. """
+        if self._loop is not None:
+            self._loop.set_task_factory(self._previous_factory)
+            self._loop = None
+        self.memory_stop()
+
+    def tasks(self, limit: int = AUTO_FORGE_DIAGNOSTICS_LIMIT) -> dict[str, Any]:
+        """
+        List running tasks, oldest first.
+        Args:
+            limit (int): Tasks returned at most.
+        Returns:
+            dict[str, Any]: "count" (all tasks) and "tasks": name, coroutine, age in seconds
+            (null for tasks created before `install()`) and the frame it is suspended in.
+        """
+        now = time.monotonic()
+        rows = []
+        for task in asyncio.all_tasks():
+            created = self._created.get(task)
+            coro = task.get_coro()
+            stack = task.get_stack(limit=1)
+            where = f"{stack[0].f_code.co_filename}:{stack[0].f_lineno}" if stack else None
+            rows.append({"name": task.get_name(),
+                         "coroutine": getattr(coro, "__qualname__", type(coro).__name__),
+                         "age": round(now - created, 3) if created is not None else None,
+                         "where": where})
+        rows.sort(key=lambda row: -1.0 if row["age"] is None else row["age"], reverse=True)
+        return {"count": len(rows), "tasks": rows[:max(1, int(limit))]}
+
+    async def profile(self, seconds: float, sort: str = "cumulative",
+                      limit: int = AUTO_FORGE_DIAGNOSTICS_LIMIT) -> dict[str, Any]:
+        """
+        Profile the event loop thread with cProfile for `seconds`, while it keeps serving.
+        Args:
+            seconds (float): Profiling window, capped at AUTO_FORGE_PROFILE_MAX_SECONDS.
+            sort (str): pstats sort key, one of AUTO_FORGE_PROFILE_SORT_KEYS.
+            limit (int): Functions listed.
+        Returns:
+            dict[str, Any]: The window, the call count and the pstats report as text.
+        Raises:
+            ValueError: Bad arguments.
+            RuntimeError: A profile is already running (one at a time per process).
+        """
+        if sort not in AUTO_FORGE_PROFILE_SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(AUTO_FORGE_PROFILE_SORT_KEYS)}")
+        seconds = min(float(seconds), AUTO_FORGE_PROFILE_MAX_SECONDS)
+        if seconds <= 0:
+            raise ValueError("seconds must be positive")
+        if self._profiling:
+            raise RuntimeError("a profile is already running")
+
+        self._profiling = True
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.disable()
+        finally:
+            self._profiling = False
+
+        report = io.StringIO()
+        stats = pstats.Stats(profiler, stream=report)
+        stats.sort_stats(sort).print_stats(max(1, int(limit)))
+        return {"seconds": seconds, "sort": sort, "calls": stats.total_calls,
+                "stats": report.getvalue()}
+
+    def memory_start(self, frames: int = AUTO_FORGE_TRACEMALLOC_FRAMES) -> dict[str, Any]:
+        """ Start tracing allocations (tracing slows allocation-heavy code down noticeably). """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(max(1, int(frames)))
+            self._started_tracing = True
+        self._snapshot = None
+        return {"tracing": True, "frames": tracemalloc.get_traceback_limit()}
+
+    def memory_stop(self) -> dict[str, Any]:
+        """ Stop tracing started by `memory_start()` and drop the stored snapshot. """
+        if self._started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._started_tracing = False
+        self._snapshot = None
+        return {"tracing": tracemalloc.is_tracing()}
+
+    def memory_report(self, limit: int = AUTO_FORGE_DIAGNOSTICS_LIMIT, group_by: str = "lineno") -> dict[str, Any]:
+        """
+        Top allocation sites now, and the largest changes since the previous report.
+        Args:
+            limit (int): Rows per list.
+            group_by (str): "lineno", "filename" or "traceback".
+        Returns:
+            dict[str, Any]: Traced "current" / "peak" bytes, "top" sites and "diff" (empty on the
+            first report after `memory_start()`).
+        Raises:
+            ValueError: Unknown `group_by`.
+            RuntimeError: Tracing is not running.
+        """
+        if group_by not in ("lineno", "filename", "traceback"):
+            raise ValueError("group_by must be lineno, filename or traceback")
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("allocation tracing is not running; start it first")
+
+        limit = max(1, int(limit))
+        snapshot = tracemalloc.take_snapshot().filter_traces(_TRACEMALLOC_FILTERS)
+        current, peak = tracemalloc.get_traced_memory()
+        top = [{"where": self._where(stat.traceback, group_by), "size": stat.size, "count": stat.count}
+               for stat in snapshot.statistics(group_by)[:limit]]
+        diff = [] if self._snapshot is None else [
+            {"where": self._where(stat.traceback, group_by), "size": stat.size, "size_diff": stat.size_diff,
+             "count": stat.count, "count_diff": stat.count_diff}
+            for stat in snapshot.compare_to(self._snapshot, group_by)[:limit] if stat.size_diff or stat.count_diff]
+        self._snapshot = snapshot
+        return {"current": current, "peak": peak, "top": top, "diff": diff}
+
+    @staticmethod
+    def _where(traceback: tracemalloc.Traceback, group_by: str) -> Any:
+        frames = [f"{frame.filename}:{frame.lineno}" if group_by != "filename" else frame.filename
+                  for frame in traceback]
+        return frames if group_by == "traceback" else frames[0]
@@ -0,0 +1,371 @@
+"""
+Script:         job_store.py
+Author:         DevOps Team
+
+Description:
+    Durable job and result store for the MCP service, backed by an embedded SQLite
+    database in WAL mode. One row per tool call (or pipeline) records its state,
+    timings, arguments, output size and the compressed result, so history survives
+    restarts and stays out of process memory.
+
+    Writes never block the event loop: they are queued and applied by a single writer
+    thread in batches (one transaction per batch). Reads run on a separate connection,
+    which WAL lets proceed while the writer commits. Old rows are removed by
+    retention-based compaction (age and row count), after which freed pages are
+    returned to the file system.
+"""
+
+import contextlib
+import itertools
+import json
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any, Optional, Union
+
+AUTO_FORGE_MODULE_NAME = "JobStore"
+AUTO_FORGE_MODULE_DESCRIPTION = "Durable job and result store"
+
+AUTO_FORGE_JOB_STORE_BATCH = 256  # Writes applied per transaction at most
+AUTO_FORGE_JOB_STORE_LIST_LIMIT = 50  # Default page size of list()
+AUTO_FORGE_JOB_STORE_LIST_MAX = 500  # Largest page size of list()
+AUTO_FORGE_JOB_STORE_COMPACT_INTERVAL = 3600.0  # Seconds between retention passes
+AUTO_FORGE_JOB_STATES = ("running", "ok", "failed", "error", "cancelled", "interrupted")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           INTEGER PRIMARY KEY,
+    job          TEXT,              -- Caller's job id (_meta.jobId / progressToken / request id)
+    tool         TEXT NOT NULL,     -- Tool name, or "pipeline" / "pipeline:<name>"
+    state        TEXT NOT NULL,     -- One of AUTO_FORGE_JOB_STATES
+    exit_status  INTEGER,
+    started      REAL NOT NULL,     -- Unix time
+    finished     REAL,
+    duration     REAL,
+    arguments    TEXT,              -- JSON
+    summary      TEXT,
+    error        TEXT,
+    output_lines INTEGER,           -- stdout + stderr lines the call produced
+    output_bytes INTEGER,           -- Their size in UTF-8
+    result       BLOB               -- zlib-compressed JSON of the full result
+);
+CREATE INDEX IF NOT EXISTS jobs_tool ON jobs (tool, id);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id);
+CREATE INDEX IF NOT EXISTS jobs_started ON jobs (started);
+"""
+
+_LIST_COLUMNS = ("id", "job", "tool", "state", "exit_status", "started", "finished", "duration", "arguments",
+                 "summary", "error", "output_lines", "output_bytes")
+
+
+@dataclass(frozen=True)
+class CoreJobStoreConfig:
+    """
+    The project's "job_store" settings.
+    Attributes:
+        path (str): Database file; relative paths resolve against the project directory.
+        retention_days (float): Finished jobs older than this are compacted away (0 = keep).
+        max_jobs (int): Newest jobs kept at most (0 = no limit).
+        store_results (bool): Keep each call's full result, not only its summary.
+    """
+    path: str = ".mcp_jobs.sqlite"
+    retention_days: float = 7.0
+    max_jobs: int = 100000
+    store_results: bool = True
+
+    @classmethod
+    def from_config(cls, config: Any) -> Optional["CoreJobStoreConfig"]:
+        """ Parse "job_store": null / false disables the store, true uses the defaults. """
+        if config is None or config is False:
+            return None
+        if config is True:
+            return cls()
+        if not isinstance(config, dict):
+            raise ValueError("'job_store' must be an object, true or null")
+        known = {f.name for f in fields(cls)}
+        unknown = sorted(set(config) - known)
+        if unknown:
+            raise ValueError(f"unknown job_store options: {', '.join(unknown)}")
+        if not isinstance(config.get("path", cls.path), str) or not config.get("path", cls.path):
+            raise ValueError("'path' must be a file name")
+        for key in ("retention_days", "max_jobs"):
+            if key in config and (not isinstance(config[key], (int, float)) or config[key] < 0):
+                raise ValueError(f"'{key}' must be a non-negative number")
+        return cls(**config)
+
+
+class CoreJobStore:
+    """
+    SQLite-backed job records. `start()` / `finish()` only queue the write and return at
+    once; `flush()` waits until everything queued so far is committed.
+    Row ids are assigned by SQLite when the start is written, so a process taking over
+    from another (see `CoreMCPService.hand_off()`) can share the database while the
+    predecessor finishes its calls; `start()` returns a key local to this store instead.
+    """
+
+    def __init__(self, config: CoreJobStoreConfig, base_path: Union[Path, str], handed_off: bool = False):
+        """
+        Args:
+            config (CoreJobStoreConfig): Store settings.
+            base_path (Path | str): Directory relative database paths resolve against.
+            handed_off (bool): The service took over from a running predecessor, whose
+                "running" jobs are still live and must not be marked interrupted.
+        """
+        path = Path(config.path)
+        self.path = path if path.is_absolute() else Path(base_path) / path
+        self.config = config
+
+        self._writes: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._read_lock = threading.Lock()
+        self._writer_db = self._connect(check_same_thread=False)  # Set up here, then used by the writer thread only
+        self._writer_db.executescript(_SCHEMA)
+
+        # Calls that were running when the previous process stopped will never finish
+        if not handed_off:
+            self._writer_db.execute("UPDATE jobs SET state = 'interrupted', error = 'service restarted' "
+                                    "WHERE state = 'running'")
+        self._keys = itertools.count(1)
+        self._row_ids: dict[int, int] = {}  # start() key -> row id, used by the writer thread only
+        self._reader_db = self._connect(check_same_thread=False)
+
+        self.written = 0
+        self.compacted = 0
+        self.last_error: Optional[str] = None
+        self._last_compact = time.monotonic()
+        self._writer = threading.Thread(target=self._writer_loop, name="mcp-job-store", daemon=True)
+        self._writer.start()
+        self.compact()  # Apply retention to what earlier runs left behind
+
+    def _connect(self, check_same_thread: bool) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=check_same_thread, isolation_level=None)
+        db.execute("PRAGMA auto_vacuum = INCREMENTAL")  # Only takes effect on a new database
+        db.execute("PRAGMA journal_mode = WAL")
+        db.execute("PRAGMA synchronous = NORMAL")  # WAL: durable at checkpoints, never corrupt
+        db.execute("PRAGMA busy_timeout = 5000")
+        return db
+
+    @property
+    def pending(self) -> int:
+        """ Writes queued but not yet committed. """
+        return self._writes.qsize()
+
+    def start(self, tool: str, job: Optional[str], arguments: Any) -> int:
+        """ Record a call that is starting; returns the key to pass to `finish()`. """
+        key = next(self._keys)
+        self._writes.put(("start", (key, job, tool, time.time(), arguments)))
+        return key
+
+    def finish(self, key: int, result: Optional[dict[str, Any]] = None, error: Optional[str] = None,
+               cancelled: bool = False) -> None:
+        """ Record how a call ended: its result, or the error that ended it. """
+        finished = time.time()
+        exit_status = result.get("status") if isinstance(result, dict) else None
+        if cancelled:
+            state = "cancelled"
+        elif error is not None:
+            state = "error"
+        else:
+            state = "ok" if not exit_status else "failed"
+
+        # Encoding and compressing the result is left to the writer thread
+        self._writes.put(("finish", (key, state, exit_status, finished, result, error)))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """ Block until every write queued before this call is committed (run it in a worker thread). """
+        done = threading.Event()
+        self._writes.put(("flush", done))
+        return done.wait(timeout)
+
+    def compact(self) -> None:
+        """ Queue a retention pass (also run periodically by the writer). """
+        self._writes.put(("compact", None))
+
+    def close(self) -> None:
+        """ Commit what is queued, stop the writer thread and close both connections. """
+        self._writes.put(None)
+        self._writer.join()
+        with self._read_lock:
+            self._reader_db.close()
+
+    def list_jobs(self, tool: Optional[str] = None, state: Optional[str] = None, job: Optional[str] = None,
+             since: Optional[float] = None, until: Optional[float] = None, limit: int = AUTO_FORGE_JOB_STORE_LIST_LIMIT,
+             cursor: Optional[int] = None, include_results: bool = False) -> dict[str, Any]:
+        """
+        Newest-first page of job records (blocking; run it in a worker thread).
+        Args:
+            tool, state, job: Exact-match filters.
+            since, until (float): Start time range (Unix time).
+            limit (int): Page size (capped at AUTO_FORGE_JOB_STORE_LIST_MAX).
+            cursor (int): "nextCursor" of the previous page.
+            include_results (bool): Also return each stored result.
+        Returns:
+            {"jobs": [...], "nextCursor": <id or None>}
+        """
+        clauses, values = [], []
+        for column, value in (("tool", tool), ("state", state), ("job", job)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                values.append(value)
+        if since is not None:
+            clauses.append("started >= ?")
+            values.append(since)
+        if until is not None:
+            clauses.append("started < ?")
+            values.append(until)
+        if cursor is not None:
+            clauses.append("id < ?")  # Keyset pagination: ids grow with start time
+            values.append(cursor)
+        limit = max(1, min(int(limit), AUTO_FORGE_JOB_STORE_LIST_MAX))
+
+        columns = _LIST_COLUMNS + (("result",) if include_results else ())
+        sql = f"SELECT {', '.join(columns)} FROM jobs{' WHERE ' + ' AND '.join(clauses) if clauses else ''} " \
+              f"ORDER BY id DESC LIMIT ?"
+        with self._read_lock:
+            rows = self._reader_db.execute(sql, (*values, limit + 1)).fetchall()
+
+        jobs = []
+        for row in rows[:limit]:
+            record = dict(zip(columns, row))
+            record["arguments"] = json.loads(record["arguments"]) if record["arguments"] else None
+            if include_results:
+                record["result"] = json.loads(zlib.decompress(record["result"])) if record["result"] else None
+            jobs.append(record)
+        return {"jobs": jobs, "nextCursor": jobs[-1]["id"] if len(rows) > limit else None}
+
+    def stats(self) -> dict[str, Any]:
+        """ Row counts per state (blocking). """
+        with self._read_lock:
+            rows = self._reader_db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return dict(rows)
+
+    @staticmethod
+    def _dumps(value: Any) -> str:
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+    def _finish_row(self, record_id: int, state: str, exit_status: Optional[int], finished: float,
+                    result: Optional[dict[str, Any]], error: Optional[str]) -> tuple:
+        """ UPDATE parameters for a finished call, including its output size and compressed result. """
+        lines = size = summary = None
+        if isinstance(result, dict):
+            output = [line for key in ("logs", "stderr") for line in result.get(key) or ()]
+            lines, size = len(output), sum(len(line.encode("utf-8")) + 1 for line in output)
+            summary = result.get("summary")
+        blob = zlib.compress(self._dumps(result).encode("utf-8"), 1) \
+            if result is not None and self.config.store_results else None
+        return state, exit_status, finished, finished, summary, error, lines, size, blob, record_id
+
+    def _apply(self, db: sqlite3.Connection, kind: str, payload: tuple) -> None:
+        """ Execute one queued "start" or "finish" write. """
+        if kind == "start":
+            self._row_ids[payload[0]] = db.execute(
+                "INSERT INTO jobs (job, tool, state, started, arguments) VALUES (?, ?, 'running', ?, ?)",
+                (*payload[1:4], self._dumps(payload[4]))).lastrowid
+        else:
+            row_id = self._row_ids.get(payload[0])
+            if row_id is not None:  # None: its start was lost to a write error
+                db.execute("UPDATE jobs SET state = ?, exit_status = ?, finished = ?, "
+                           "duration = ? - started, summary = ?, error = ?, output_lines = ?, "
+                           "output_bytes = ?, result = ? WHERE id = ?", self._finish_row(row_id, *payload[1:]))
+                del self._row_ids[payload[0]]
+
+    def _write_batch(self, db: sqlite3.Connection, writes: list[tuple]) -> None:
+        """
+        Apply writes in one transaction. If it fails, roll back and apply them one per
+        transaction instead, so a bad write loses only itself and not the whole batch.
+        """
+        try:
+            db.execute("BEGIN IMMEDIATE")  # Take the write lock up front; another process may share the file
+            for kind, payload in writes:
+                self._apply(db, kind, payload)
+            db.execute("COMMIT")
+            self.written += len(writes)
+            return
+        except Exception as write_error:  # sqlite3.Error, or a result that cannot be encoded
+            self.last_error = str(write_error)
+            with contextlib.suppress(sqlite3.Error):
+                db.execute("ROLLBACK")
+            for kind, payload in writes:
+                if kind == "start":
+                    self._row_ids.pop(payload[0], None)  # Rolled back with the rest
+
+        for position, (kind, payload) in enumerate(writes):
+            try:
+                db.execute("BEGIN IMMEDIATE")
+            except sqlite3.Error as lock_error:
+                # The database itself is unavailable (locked, read-only, ...): the rest would fail alike
+                self.last_error = str(lock_error)
+                for kind, payload in writes[position:]:
+                    if kind == "start":
+                        self._row_ids.pop(payload[0], None)
+                return
+            try:
+                self._apply(db, kind, payload)
+                db.execute("COMMIT")
+                self.written += 1
+            except Exception as write_error:
+                self.last_error = str(write_error)
+                with contextlib.suppress(sqlite3.Error):
+                    db.execute("ROLLBACK")
+                if kind == "start":
+                    self._row_ids.pop(payload[0], None)
+
+    def _writer_loop(self) -> None:
+        """ Apply queued writes in batches, one transaction each, and compact periodically. """
+        db = self._writer_db
+        running = True
+        while running:
+            try:
+                batch = [self._writes.get(timeout=AUTO_FORGE_JOB_STORE_COMPACT_INTERVAL / 4)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < AUTO_FORGE_JOB_STORE_BATCH:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+
+            # Sort the batch out before any SQL runs, so flush() waiters are released whatever happens
+            writes: list[tuple] = []
+            flushed: list[threading.Event] = []
+            compact = time.monotonic() - self._last_compact >= AUTO_FORGE_JOB_STORE_COMPACT_INTERVAL
+            for item in batch:
+                if item is None:
+                    running = False
+                elif item[0] == "flush":
+                    flushed.append(item[1])
+                elif item[0] == "compact":
+                    compact = True
+                else:
+                    writes.append(item)
+            try:
+                if writes:
+                    self._write_batch(db, writes)
+            finally:
+                for done in flushed:
+                    done.set()
+
+            if compact:
+                try:
+                    self._compact(db)
+                except sqlite3.Error as compact_error:
+                    self.last_error = str(compact_error)
+        db.close()
+
+    def _compact(self, db: sqlite3.Connection) -> None:
+        """ Delete jobs past retention, give freed pages back and truncate the WAL. """
+        self._last_compact = time.monotonic()
+        deleted = 0
+        if self.config.retention_days:
+            cutoff = time.time() - self.config.retention_days * 86400
+            deleted += db.execute("DELETE FROM jobs WHERE state != 'running' AND started < ?", (cutoff,)).rowcount
+        if self.config.max_jobs:
+            deleted += db.execute("DELETE FROM jobs WHERE id <= (SELECT id FROM jobs ORDER BY id DESC "
+                                  "LIMIT 1 OFFSET ?)", (self.config.max_jobs,)).rowcount
+        if deleted:
+            self.compacted += deleted
+            db.execute("PRAGMA incremental_vacuum")
+            db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
@@ -6,23 +6,27 @@ Author:         DevOps Team
 Description:
     MCP Service Demo Engine.
     Minimal entrypoint for the MCP demo service.
+
+    Only the standard library is imported at module level: `json5`, `colorama` and the
+    service itself (which pulls in `aiohttp`) are imported when first needed, so
+    `--version` and argument errors return without paying for them.
 """
 
+import time
+
+_LAUNCH_TIME = time.perf_counter()  # Reference point for --startup-time
+
 import argparse
+import contextlib
+import hashlib
+import json
 import os
 import sys
 from pathlib import Path
 from typing import Optional, Any
 
-import json5
-# Third-party
-from colorama import Fore, Style, init
-
-# MCP Service imports
-from local_types import ExceptionGuru
-from mcp_service import CoreMCPService
-
 MCP_ENGINE_VERSION = "1.1"
+MCP_PROJECT_CACHE_FORMAT = 2  # Bump when normalize_project() output changes
 
 
 def parse_args():
@@ -41,23 +45,127 @@ def parse_args():
     group.add_argument("-v", "--version", action="store_true", help="Show MCP engine version and exit", )
     group.add_argument("-p", "--project", help="Path to project JSON file for MCP service", )
 
-    return parser.parse_args()
+    parser.add_argument("-t", "--transport", choices=("tcp", "unix", "stdio", "agent"), default="tcp",
+                        help="Client transport: HTTP/SSE over TCP (default), HTTP/SSE over a Unix "
+                             "domain socket, newline-delimited JSON-RPC on stdin/stdout, or a remote "
+                             "execution agent of '--agent URL'", )
+    parser.add_argument("--unix-socket", metavar="PATH",
+                        help="Socket path for '--transport unix' (relative paths resolve against the project)", )
+    parser.add_argument("--agent", metavar="URL",
+                        help="Run as a remote execution agent of the coordinator at URL "
+                             "(e.g. ws://build-host:6275/agent); implies '--transport agent'", )
+    parser.add_argument("--agent-name", metavar="NAME", help="Agent name (default: <hostname>-<pid>)", )
+    parser.add_argument("--agent-slots", metavar="N", type=int, default=0,
+                        help="Tool runs this agent accepts at once (default: CPU count)", )
+    parser.add_argument("--agent-label", metavar="LABEL", action="append", default=[],
+                        help="Label matched against tool 'affinity' (repeatable)", )
+    parser.add_argument("--no-project-cache", action="store_true",
+                        help="Always parse the project file, ignoring (and not writing) the compiled cache", )
+    parser.add_argument("--startup-time", action="store_true",
+                        help="Report startup phase timings and the time to the first accepted connection", )
+
+    args = parser.parse_args()
+    if args.transport == "unix" and not args.unix_socket:
+        parser.error("--transport unix requires --unix-socket PATH")
+    if args.agent:
+        args.transport = "agent"
+    elif args.transport == "agent":
+        parser.error("--transport agent requires --agent URL")
+    if args.agent_slots < 0:
+        parser.error("--agent-slots must not be negative")
+    return args
 
 
-def load_project(json_path: Path) -> Optional[dict[str, Any]]:
+def normalize_project(project: Any) -> dict[str, Any]:
+    """
+    Validate the parsed project and fill in per-tool defaults, so the cached form is
+    complete and the service does not re-derive them on every start.
+    Args:
+        project: Parsed project data.
+    Returns:
+        The normalized project dictionary.
+    """
+    if not isinstance(project, dict):
+        raise ValueError("project root must be an object")
+
+    tools = project.get("tools")
+    if not isinstance(tools, dict) or not tools:
+        raise ValueError("'tools' must be a non-empty object")
+
+    for key, entry in tools.items():
+        if not isinstance(entry, dict):
+            raise ValueError(f"tool '{key}' must be an object")
+        if not entry.get("command"):
+            raise ValueError(f"tool '{key}' is missing 'command'")
+        entry.setdefault("args", [])
+        entry.setdefault("env", {})
+        entry.setdefault("params", [])
+        for param in entry["params"]:
+            if not isinstance(param, dict) or not param.get("name"):
+                raise ValueError(f"tool '{key}' has a parameter without a name")
+            param.setdefault("style", "flag")
+
+    if not isinstance(project.setdefault("templates", {}), dict):
+        raise ValueError("'templates' must be an object")
+    if not isinstance(project.setdefault("pipelines", {}), dict):
+        raise ValueError("'pipelines' must be an object")
+
+    return project
+
+
+def project_cache_path(json_path: Path) -> Path:
+    """ Compiled cache location: a hidden file next to the project file. """
+    return json_path.with_name(f".{json_path.name}.cache")
+
+
+def load_project(json_path: Path, use_cache: bool = True, stats: Optional[dict[str, Any]] = None) \
+        -> Optional[dict[str, Any]]:
     """
     Load and parse the project JSONC/JSON5 file.
+    A validated, normalized copy is kept as plain JSON next to the file, keyed by the
+    SHA-256 of the source bytes; while the hash matches, the (slow, pure Python) json5
+    parse is skipped and the stdlib C JSON decoder is used instead.
     Args:
         json_path: Absolute path to the JSONC/JSON5 file.
+        use_cache: Read and refresh the compiled cache.
+        stats: Optional dictionary receiving {"cache": "hit" | "miss" | "off"}.
     Returns:
         Parsed project dictionary, or None on failure.
     """
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            project = json5.load(f)
+        raw = Path(json_path).read_bytes()
+        digest = hashlib.sha256(raw).hexdigest()
+        cache_path = project_cache_path(Path(json_path))
+
+        if use_cache:
+            try:
+                cached = json.loads(cache_path.read_bytes())
+                if cached.get("sha256") == digest and cached.get("format") == MCP_PROJECT_CACHE_FORMAT:
+                    if stats is not None:
+                        stats["cache"] = "hit"
+                    return cached["project"]
+            except (OSError, ValueError, AttributeError, KeyError):
+                pass  # Missing, stale or unreadable cache: fall back to parsing
+
+        import json5
+        project = normalize_project(json5.loads(raw.decode("utf-8")))
+
+        if use_cache:
+            # Best effort: a read-only project directory simply means no cache
+            tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+            try:
+                tmp_path.write_text(json.dumps({"format": MCP_PROJECT_CACHE_FORMAT, "sha256": digest,
+                                                "project": project}, separators=(",", ":")), encoding="utf-8")
+                os.replace(tmp_path, cache_path)
+            except OSError:
+                with contextlib.suppress(OSError):
+                    tmp_path.unlink()
+
+        if stats is not None:
+            stats["cache"] = "miss" if use_cache else "off"
         return project
     except Exception as json_error:
-        print(f"Failed to load {json_path}: {json_error}")
+        print(f"Failed to load {json_path}: {json_error}", file=sys.stderr)  # stdout may be the stdio protocol channel
         return None
 
 
@@ -68,17 +176,25 @@ def main() -> int:
         Shell status, 0 success, else failure.
     """
     result: int = 1  # Default to error
-    init(autoreset=True)  # Init colorama
 
     try:
         args = parse_args()
 
         if args.version:
             print(f"MCP Engine Version: {MCP_ENGINE_VERSION}")
-            result = 0
+            return 0
+
+        # Third-party
+        from colorama import init
+        init(autoreset=True)  # Init colorama
+
+        timings: dict[str, float] = {"args": time.perf_counter()}
 
+        # MCP Service imports
+        from mcp_service import CoreMCPService
+        timings["imports"] = time.perf_counter()
 
-        elif args.project:
+        if args.project:
 
             # Expand user (~) and env vars, then resolve to absolute
 
@@ -92,20 +208,48 @@ def main() -> int:
             try:
                 # Switch to the directory containing the project file
                 os.chdir(json_path.parent)
-                project_data = load_project(json_path)
+                load_stats: dict[str, Any] = {}
+                use_cache = not args.no_project_cache
+                project_data = load_project(json_path, use_cache=use_cache, stats=load_stats)
+                timings["project"] = time.perf_counter()
+
                 # Instantiate and start the service
-                mcp_service = CoreMCPService(project_data=project_data)
-                mcp_service.start()
-                result = 0
+                mcp_service = CoreMCPService(project_data=project_data,
+                                             transport=args.transport,
+                                             unix_socket=args.unix_socket,
+                                             agent_url=args.agent,
+                                             agent_name=args.agent_name,
+                                             agent_slots=args.agent_slots,
+                                             agent_labels=args.agent_label,
+                                             restart_argv=[sys.executable, str(Path(__file__).resolve()),
+                                                           *sys.argv[1:]],
+                                             restart_cwd=old_cwd,
+                                             project_path=json_path,
+                                             project_loader=lambda p: load_project(p, use_cache=use_cache),
+                                             startup_t0=_LAUNCH_TIME if args.startup_time else None)
+                timings["service"] = time.perf_counter()
+
+                if args.startup_time:
+                    phases, previous = [], _LAUNCH_TIME
+                    for phase, stamp in timings.items():
+                        phases.append(f"{phase} {(stamp - previous) * 1000:.1f} ms")
+                        previous = stamp
+                    print(f"Startup phases: {', '.join(phases)} "
+                          f"(project cache: {load_stats.get('cache', 'n/a')})", file=sys.stderr, flush=True)
+
+                result = mcp_service.start()
 
             finally:
                 # Always restore original CWD
                 os.chdir(old_cwd)
 
     except KeyboardInterrupt:
+        from colorama import Fore, Style
         print(f"\n\n{Fore.YELLOW}Interrupted by user, shutting down.{Style.RESET_ALL}\n")
 
     except Exception as runtime_error:
+        from colorama import Fore, Style
+        from local_types import ExceptionGuru
         # Retrieve information about the original exception that triggered this handler.
         file_name, line_number = ExceptionGuru().get_context()
         invocation = " ".join(sys.argv)
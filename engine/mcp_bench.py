@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""
+Script:         mcp_bench.py
+Author:         DevOps Team
+
+Description:
+    Micro-benchmarks for the MCP service engine.
+    Each sub-command builds a small throw-away project, runs the engine in-process
+    (or as a child process where the transport requires it) and prints latency
+    figures, so changes to the engine can be compared against the baseline.
+
+Usage:
+    python mcp_bench.py transport [--calls N]
+    python mcp_bench.py startup [--tools N] [--runs N]
+    python mcp_bench.py output [--mb N]
+    python mcp_bench.py keywords [--mb N] [--keywords N]
+    python mcp_bench.py loop [--calls N] [--concurrency N]
+    python mcp_bench.py registry [--tools N] [--queries N]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+# Third-party
+import aiohttp
+
+# Optional faster event loop, compared against asyncio's by the "loop" benchmark
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# MCP Service imports
+from mcp_service import CoreMCPService
+from platform_tools import CoreKeywordScanner, CorePlatform, CoreOutputPipeline
+from tool_index import CoreToolIndex
+
+ENGINE_DIR = Path(__file__).resolve().parent
+
+BENCH_PROJECT: dict[str, Any] = {
+    "project_name": "bench",
+    "version": "1.0.0",
+    "mcp_server_bind_address": "127.0.0.1",
+    "tools": {
+        "say_hi": {
+            "description": "Prints a fixed line.",
+            "command": "echo",
+            "args": ["hi"],
+        },
+    },
+}
+
+
+def _free_port() -> int:
+    """ Ask the OS for an unused TCP port on the loopback interface. """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _report(label: str, samples: list[float]) -> None:
+    """ Print p50 / p99 / mean latency for a list of per-call durations (seconds). """
+    ordered = sorted(samples)
+    p50 = ordered[len(ordered) // 2] * 1e6
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e6
+    mean = statistics.fmean(ordered) * 1e6
+    print(f"  {label:<26} p50 {p50:9.1f} us   p99 {p99:9.1f} us   mean {mean:9.1f} us   (n={len(ordered)})")
+
+
+async def _time_calls(calls: int, send: Callable[[dict[str, Any]], Awaitable[Any]], method: str,
+                      params: dict[str, Any]) -> list[float]:
+    """ Issue `calls` sequential JSON-RPC requests through `send` and return per-call durations. """
+    samples: list[float] = []
+    for i in range(calls):
+        msg = {"jsonrpc": "2.0", "id": i + 1, "method": method, "params": params}
+        t0 = time.perf_counter()
+        reply = await send(msg)
+        samples.append(time.perf_counter() - t0)
+        if "error" in reply:
+            raise RuntimeError(f"{method} failed: {reply['error']}")
+    return samples
+
+
+async def _bench_http(calls: int, transport: str, workdir: Path) -> None:
+    """ Benchmark the HTTP JSON-RPC path over TCP or a Unix domain socket. """
+    project = dict(BENCH_PROJECT)
+    if transport == "tcp":
+        port = _free_port()
+        project["mcp_server_port"] = port
+        service = CoreMCPService(project_data=project)
+        connector: aiohttp.BaseConnector = aiohttp.TCPConnector()
+        url = f"http://127.0.0.1:{port}/message"
+    else:
+        socket_path = str(workdir / "bench.sock")
+        service = CoreMCPService(project_data=project, transport="unix", unix_socket=socket_path)
+        connector = aiohttp.UnixConnector(path=socket_path)
+        url = "http://localhost/message"
+
+    server = asyncio.create_task(service.serve())
+    await asyncio.sleep(0.2)
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            async def _send(msg: dict[str, Any]) -> Any:
+                async with session.post(url, json=msg) as resp:
+                    return await resp.json()
+
+            await _time_calls(10, _send, "ping", {})  # Warm-up
+            _report(f"{transport} ping", await _time_calls(calls, _send, "ping", {}))
+            _report(f"{transport} tools/call", await _time_calls(
+                calls, _send, "tools/call", {"name": "say_hi", "arguments": {}}))
+    finally:
+        service.stop()
+        await server
+
+
+async def _bench_stdio(calls: int, workdir: Path) -> None:
+    """ Benchmark the stdio transport by driving `mcp.py --transport stdio` as a child process. """
+    project_file = workdir / "bench.json"
+    project_file.write_text(json.dumps(BENCH_PROJECT), encoding="utf-8")
+
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, str(ENGINE_DIR / "mcp.py"), "--project", str(project_file), "--transport", "stdio",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    assert proc.stdin is not None and proc.stdout is not None
+
+    async def _send(msg: dict[str, Any]) -> Any:
+        proc.stdin.write(json.dumps(msg).encode() + b"\n")
+        await proc.stdin.drain()
+        return json.loads(await proc.stdout.readline())
+
+    try:
+        await _time_calls(10, _send, "ping", {})  # Warm-up
+        _report("stdio ping", await _time_calls(calls, _send, "ping", {}))
+        _report("stdio tools/call", await _time_calls(
+            calls, _send, "tools/call", {"name": "say_hi", "arguments": {}}))
+    finally:
+        proc.stdin.close()
+        await proc.wait()
+
+
+def _write_catalog_project(path: Path, tools: int) -> None:
+    """ Write a JSONC project with `tools` generated tool entries (comments included, as in real projects). """
+    lines = ["/* Generated benchmark project */", "{", '  "project_name": "bench",', '  "version": "1.0.0",',
+             '  "tools": {']
+    for i in range(tools):
+        lines.append(f'    // Tool {i}')
+        lines.append(f'    "tool_{i}": {{"description": "Generated tool number {i}.", "command": "echo", '
+                     f'"args": ["{i}"], "params": [{{"name": "value", "type": "string", '
+                     f'"description": "Value for tool {i}", "style": "positional"}}]}}'
+                     + ("," if i < tools - 1 else ""))
+    lines += ["  }", "}"]
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+async def _time_to_first_connection(args: list[str], socket_path: Path) -> tuple[float, str]:
+    """
+    Launch `mcp.py` with `args`, poll its Unix socket until a request succeeds and
+    return (seconds from launch to first successful request, engine startup report).
+    """
+    socket_path.unlink(missing_ok=True)
+    t0 = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, str(ENGINE_DIR / "mcp.py"), *args, "--transport", "unix", "--unix-socket", str(socket_path),
+        "--startup-time", stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    try:
+        async with aiohttp.ClientSession(connector=aiohttp.UnixConnector(path=str(socket_path))) as session:
+            while True:
+                try:
+                    async with session.get("http://localhost/status") as resp:
+                        await resp.read()
+                    break
+                except aiohttp.ClientConnectionError:
+                    await asyncio.sleep(0.002)
+        elapsed = time.perf_counter() - t0
+    finally:
+        proc.terminate()
+        stdout, stderr = await proc.communicate()
+    report = [line for line in (stderr + stdout).decode(errors="replace").splitlines() if "Startup" in line]
+    return elapsed, " | ".join(s.split("] ")[-1] for s in report)
+
+
+async def bench_startup(tools: int, runs: int) -> None:
+    """ Time `--version` and time-to-first-connection with a cold and a warm compiled project cache. """
+    print(f"Startup ({tools} tools, best of {runs}):")
+
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        proc = await asyncio.create_subprocess_exec(sys.executable, str(ENGINE_DIR / "mcp.py"), "--version",
+                                                    stdout=asyncio.subprocess.DEVNULL)
+        await proc.wait()
+        samples.append(time.perf_counter() - t0)
+    print(f"  {'--version':<26} {min(samples) * 1000:9.1f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        project_file = workdir / "bench.jsonc"
+        _write_catalog_project(project_file, tools)
+        socket_path = workdir / "bench.sock"
+
+        for label, cold in (("cold cache", True), ("warm cache", False)):
+            best: Optional[tuple[float, str]] = None
+            for _ in range(runs):
+                if cold:
+                    (workdir / f".{project_file.name}.cache").unlink(missing_ok=True)
+                sample = await _time_to_first_connection(["--project", str(project_file)], socket_path)
+                if best is None or sample[0] < best[0]:
+                    best = sample
+            print(f"  {label:<26} {best[0] * 1000:9.1f} ms to first response   [{best[1]}]")
+
+
+def _write_build_log(path: Path, megabytes: int) -> int:
+    """ Write a synthetic colored build log (compiler lines, progress bars, repeats); returns its size. """
+    rnd = random.Random(0)
+    templates = [
+        "\x1b[1m/src/module_{n}/file_{m}.c:{l}:{c}: \x1b[35mwarning:\x1b[0m unused variable 'tmp_{m}' "
+        "[\x1b[35m-Wunused-variable\x1b[0m]",
+        "\x1b[32m[{n:3}%]\x1b[0m Building C object module_{n}/CMakeFiles/obj.dir/file_{m}.c.o",
+        "Downloading artifacts " + "".join(f"{p}%\r" for p in range(0, 100, 10)) + "100%",
+        "   | {pad}",
+        "make[2]: Nothing to be done for 'all'.",
+    ]
+    size = 0
+    with path.open("w", encoding="utf-8") as log:
+        while size < megabytes * 1024 * 1024:
+            line = rnd.choice(templates).format(n=rnd.randrange(100), m=rnd.randrange(1000), l=rnd.randrange(999),
+                                                c=rnd.randrange(80), pad="~" * rnd.randrange(40, 400)) + "\n"
+            size += log.write(line)
+    return size
+
+
+def _run_pipeline(lines: list[str], stages: dict[str, Any]) -> list[str]:
+    """ Feed every line through one pipeline instance, as a tool stream would. """
+    pipeline = CoreOutputPipeline(**stages)
+    kept = [out for line in lines for out in pipeline.process(line)]
+    return kept + pipeline.flush()
+
+
+async def bench_output(megabytes: int) -> None:
+    """ Throughput of the output helpers and of a tool run with and without the output pipeline. """
+    print(f"Output processing ({megabytes} MiB synthetic build log):")
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = Path(tmp) / "build.log"
+        size = _write_build_log(log_path, megabytes)
+        lines = log_path.read_text(encoding="utf-8").splitlines()
+        platform = CorePlatform(tmp)
+        stages = {"collapse_cr": True, "strip_ansi": True, "max_line_length": 200, "dedupe": True}
+
+        def _rate(label: str, seconds: float) -> None:
+            print(f"  {label:<34} {size / seconds / 1e6:9.1f} MB/s   ({seconds * 1000:8.1f} ms)")
+
+        for label, fn in (("CorePlatform.strip_ansi", lambda: [platform.strip_ansi(x) for x in lines]),
+                          ("CorePlatform.truncate_for_terminal",
+                           lambda: [platform.truncate_for_terminal(x, fallback_width=120) for x in lines]),
+                          ("CoreOutputPipeline (all stages)", lambda: _run_pipeline(lines, stages))):
+            t0 = time.perf_counter()
+            fn()
+            _rate(label, time.perf_counter() - t0)
+
+        service = CoreMCPService(project_data=dict(BENCH_PROJECT))
+        for label, output in (("tool run, raw output", None), ("tool run, output pipeline", stages)):
+            t0 = time.perf_counter()
+            result = await service._run_one_cmdline_async(argv=["cat", str(log_path)], output=output)
+            elapsed = time.perf_counter() - t0
+            _rate(label, elapsed)
+            kept = sum(len(x) + 1 for x in result["logs"])
+            print(f"  {'':<34} {len(result['logs'])} lines, {kept / 1e6:.1f} MB returned")
+
+
+def bench_keywords(megabytes: int, keywords: int) -> None:
+    """ Keyword flagging on a build log: per-pattern loop vs the combined single-pass scanner. """
+    print(f"Keyword scanning ({megabytes} MiB synthetic build log, {keywords} keywords):")
+    base = ["error:", "warning:", "fatal", "undefined reference", "Nothing to be done", "-Wunused-variable"]
+    words = (base + [f"keyword_{i}" for i in range(keywords)])[:max(keywords, 1)]
+    labels = {"error": words[0::2], "warning": words[1::2]}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = Path(tmp) / "build.log"
+        size = _write_build_log(log_path, megabytes)
+        lines = CoreOutputPipeline(strip_ansi=True).process
+        lines = [out for line in log_path.read_text(encoding="utf-8").splitlines() for out in lines(line)]
+
+    scanner = CoreKeywordScanner(labels)
+    for label, fn in (("find_pattern_in_line per label",
+                       lambda: [CorePlatform.find_pattern_in_line(x, w) for x in lines for w in labels.values()]),
+                      ("CoreKeywordScanner.scan", lambda: [scanner.scan(x) for x in lines])):
+        t0 = time.perf_counter()
+        flagged = sum(1 for r in fn() if r)
+        elapsed = time.perf_counter() - t0
+        print(f"  {label:<34} {size / elapsed / 1e6:9.1f} MB/s   ({elapsed * 1000:8.1f} ms, {flagged} hits)")
+
+
+async def _bench_loop(calls: int, concurrency: int, label: str) -> None:
+    """ Sequential and concurrent tools/call latency over TCP on the running loop, plus its lag. """
+    port = _free_port()
+    service = CoreMCPService(project_data={**BENCH_PROJECT, "mcp_server_port": port, "max_concurrent_calls": concurrency,
+                                           "max_queued_calls": calls, "loop_lag_interval": 0.05})
+    server = asyncio.create_task(service.serve())
+    await asyncio.sleep(0.2)
+    try:
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+            async def _send(msg: dict[str, Any]) -> Any:
+                async with session.post(f"http://127.0.0.1:{port}/message", json=msg) as resp:
+                    return await resp.json()
+
+            call = {"name": "say_hi", "arguments": {}}
+            await _time_calls(10, _send, "ping", {})  # Warm-up
+            _report(f"{label} ping", await _time_calls(calls, _send, "ping", {}))
+            _report(f"{label} tools/call", await _time_calls(calls, _send, "tools/call", call))
+
+            per_worker = max(1, calls // concurrency)
+            t0 = time.perf_counter()
+            batches = await asyncio.gather(*(_time_calls(per_worker, _send, "tools/call", call)
+                                             for _ in range(concurrency)))
+            elapsed = time.perf_counter() - t0
+            _report(f"{label} tools/call x{concurrency}", [sample for batch in batches for sample in batch])
+            lag = service._loop_lag.as_dict()
+            print(f"  {'':<26} {per_worker * concurrency / elapsed:9.1f} calls/s   loop lag avg "
+                  f"{lag['avg_ms']:.2f} ms, max {lag['max_ms']:.2f} ms")
+    finally:
+        service.stop()
+        await server
+
+
+def bench_loop(calls: int, concurrency: int) -> None:
+    """ Run the same TCP workload on asyncio's default event loop and on uvloop (when installed). """
+    print(f"Event loops ({calls} calls per row, {concurrency} concurrent clients):")
+    loops: list[tuple[str, Callable[[], asyncio.AbstractEventLoop]]] = [("asyncio", asyncio.new_event_loop)]
+    if uvloop is not None:
+        loops.append(("uvloop", uvloop.new_event_loop))
+    else:
+        print("  uvloop is not installed, measuring asyncio only (pip install uvloop)")
+    for label, factory in loops:
+        loop = factory()
+        try:
+            loop.run_until_complete(_bench_loop(calls, concurrency, label))
+        finally:
+            loop.close()
+
+
+def _catalog_tools(tools: int) -> dict[str, Any]:
+    """ Generated tool entries with a varied vocabulary, like a catalog produced from build targets. """
+    rnd = random.Random(0)
+    verbs = ["build", "test", "deploy", "lint", "format", "package", "flash", "analyze", "sign", "upload"]
+    nouns = ["firmware", "bootloader", "kernel", "module", "image", "report", "bundle", "driver", "sdk", "docs"]
+    words = [f"word{i}" for i in range(2000)]
+    catalog = {}
+    for i in range(tools):
+        verb, noun = rnd.choice(verbs), rnd.choice(nouns)
+        catalog[f"{verb}_{noun}_{i}"] = {
+            "description": f"{verb.title()} the {noun} for target {i}: " + " ".join(rnd.sample(words, 8)),
+            "command": "echo",
+            "args": [str(i)],
+            "params": [{"name": "target", "type": "string", "description": f"Target name for {noun}",
+                        "style": "positional"},
+                       {"name": "verbose", "type": "boolean", "description": "Verbose output", "style": "flag"}],
+        }
+    return catalog
+
+
+async def bench_registry(tools: int, queries: int) -> None:
+    """ Catalog registration time and memory, and tools/search vs a linear scan of tools/list. """
+    print(f"Tool registry ({tools} tools):")
+    project = {**BENCH_PROJECT, "tools": _catalog_tools(tools)}
+
+    samples = []
+    for _ in range(3):
+        t0 = time.perf_counter()
+        service = CoreMCPService(project_data=project)
+        samples.append(time.perf_counter() - t0)
+    best = min(samples)
+    print(f"  {'register (service init)':<26} {best * 1000:9.1f} ms   {best / tools * 1e6:9.2f} us per tool")
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    service = CoreMCPService(project_data=project)
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"  {'retained memory':<26} {retained / 1e6:9.1f} MB   {retained / tools:9.0f} B per tool")
+
+    t0 = time.perf_counter()
+    service._rpc_tools_search({"query": "warm up"})  # Builds the search index
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    index = CoreToolIndex()
+    for tool in service._tools_registry.values():
+        index.add(tool.name, tool.description, tool.params)
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"  {'search index (1st search)':<26} {elapsed * 1000:9.1f} ms   {retained / tools:9.0f} B per tool")
+
+    catalog = service._rpc_tools_list()["tools"]
+    listed = len(json.dumps(catalog, separators=(",", ":")))
+
+    async def _send(msg: dict[str, Any]) -> Any:
+        return await service._handle_rpc_message(msg)
+
+    async def _scan(msg: dict[str, Any]) -> Any:
+        # What a client without tools/search does: fetch the catalog and filter it
+        terms = msg["params"]["query"].lower().split()
+        found = [t for t in json.loads(json.dumps(catalog)) if all(w in (t["name"] + t["description"]).lower()
+                                                                   for w in terms)]
+        return {"result": found}
+
+    _report("tools/list (full)", await _time_calls(max(1, queries // 10), _send, "tools/list", {}))
+    for query in ("kernel", "flash firmware", "word42", "deploy boot", "word1"):
+        _report(f"search '{query}'", await _time_calls(queries, _send, "tools/search", {"query": query}))
+    _report("linear scan 'flash firmware'",
+            await _time_calls(max(1, queries // 10), _scan, "scan", {"query": "flash firmware"}))
+
+    page = service._rpc_tools_search({"query": "flash firmware"})
+    print(f"  {'':<26} tools/list {listed / 1e6:.1f} MB vs one search page "
+          f"{len(json.dumps(page, separators=(',', ':'))) / 1e3:.1f} kB ({page['total']} matches)")
+
+
+async def bench_transport(calls: int) -> None:
+    """ Compare per-call latency of the TCP, Unix domain socket and stdio transports. """
+    print(f"Transport latency ({calls} sequential calls per row):")
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        await _bench_http(calls, "tcp", workdir)
+        if hasattr(socket, "AF_UNIX"):
+            await _bench_http(calls, "unix", workdir)
+        await _bench_stdio(calls, workdir)
+
+
+def main() -> int:
+    """
+    Benchmark entry point
+    Returns:
+        Shell status, 0 success, else failure.
+    """
+    parser = argparse.ArgumentParser(prog="mcp_bench", description="MCP engine micro-benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    transport = sub.add_parser("transport", help="Per-call latency: TCP vs Unix socket vs stdio")
+    transport.add_argument("--calls", type=int, default=500, help="Calls per measurement (default 500)")
+
+    startup = sub.add_parser("startup", help="Time to first accepted connection, cold vs warm project cache")
+    startup.add_argument("--tools", type=int, default=2000, help="Generated tools in the project (default 2000)")
+    startup.add_argument("--runs", type=int, default=3, help="Runs per measurement, best is kept (default 3)")
+
+    output = sub.add_parser("output", help="ANSI stripping / truncation / output pipeline throughput")
+    output.add_argument("--mb", type=int, default=8, help="Size of the synthetic build log in MiB (default 8)")
+
+    keywords = sub.add_parser("keywords", help="Multi-keyword scanning: per-pattern loop vs combined scanner")
+    keywords.add_argument("--mb", type=int, default=8, help="Size of the synthetic build log in MiB (default 8)")
+    keywords.add_argument("--keywords", type=int, default=16, help="Number of keywords (default 16)")
+
+    loop = sub.add_parser("loop", help="Event loop comparison: asyncio vs uvloop, latency and loop lag")
+    loop.add_argument("--calls", type=int, default=500, help="Calls per measurement (default 500)")
+    loop.add_argument("--concurrency", type=int, default=8, help="Concurrent clients (default 8)")
+
+    registry = sub.add_parser("registry", help="Tool catalog registration, tools/list and tools/search at scale")
+    registry.add_argument("--tools", type=int, default=10000, help="Generated tools (default 10000)")
+    registry.add_argument("--queries", type=int, default=200, help="Searches per query (default 200)")
+
+    args = parser.parse_args()
+    os.chdir(ENGINE_DIR)
+
+    # Keep the engine's per-request debug lines out of the report
+    CoreMCPService._log_fd = os.open(os.devnull, os.O_WRONLY)
+
+    if args.bench == "transport":
+        asyncio.run(bench_transport(args.calls))
+    elif args.bench == "startup":
+        asyncio.run(bench_startup(args.tools, args.runs))
+    elif args.bench == "output":
+        asyncio.run(bench_output(args.mb))
+    elif args.bench == "keywords":
+        bench_keywords(args.mb, args.keywords)
+    elif args.bench == "loop":
+        bench_loop(args.calls, args.concurrency)
+    elif args.bench == "registry":
+        asyncio.run(bench_registry(args.tools, args.queries))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
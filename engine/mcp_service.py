@@ -12,8 +12,10 @@ Description:
     (e.g. VS Code, MCP CLI, automation bots).
 
     Key design points:
-      - Single-workspace, single-flight: only one tool executes at a time,
-        concurrent calls are rejected with a JSON-RPC error.
+      - Single-workspace, single-flight by default: only one tool executes at a
+        time and concurrent calls are rejected with a JSON-RPC error. Concurrency,
+        a bounded wait queue and per-client / per-tool rate limits are configurable;
+        calls beyond those limits are shed with a retry hint.
       - Provides clean startup/shutdown hooks and status telemetry.
       - Returns all errors as JSON-RPC envelopes (never HTTP 500).
       - Service does not require authentication; any MCP client
@@ -33,32 +35,127 @@ Description:
 """
 
 import asyncio
+import codecs
 import contextlib
+import gzip
+import hmac
 import json
+import math
 import os
 import re
 import shlex
 import signal
 import socket
-from dataclasses import dataclass
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field, fields
 from datetime import datetime
 from json import JSONDecodeError
 from pathlib import Path
-from typing import Optional, Any, Union
+from typing import Optional, Any, Union, Callable
 from urllib.parse import urlparse, parse_qsl, unquote
 
 # Third-party
-from aiohttp import web
-from colorama import Fore, Style
+from aiohttp import hdrs, web
+
+try:
+    import resource  # POSIX only: per-tool resource limits
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+# Optional response encodings, used when installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Optional faster event loop, used by start() when the project asks for it
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 # MCP Service imports
+from diagnostics import AUTO_FORGE_DIAGNOSTICS_LIMIT, AUTO_FORGE_TRACEMALLOC_FRAMES, CoreDiagnostics
+from job_store import AUTO_FORGE_JOB_STATES, AUTO_FORGE_JOB_STORE_LIST_LIMIT, CoreJobStore, CoreJobStoreConfig
 from logger import CoreMCPLogger
+from platform_tools import CoreKeywordScanner, CoreOutputPipeline
+from tool_index import CoreToolIndex
 
 AUTO_FORGE_MODULE_NAME = "MCP"
 AUTO_FORGE_MODULE_DESCRIPTION = "MCP (Model Context Protocol) integration for AutoForge"
 AUTO_FORGE_MAX_BATCH_MCP_COMMANDS = 64
 AUTO_FORGE_BUSY_CODE = -32004
+AUTO_FORGE_RATE_LIMITED_CODE = -32005
+AUTO_FORGE_OVERLOADED_CODE = -32006
 AUTO_FORGE_DEFAULT_PORT = 6274
+AUTO_FORGE_TRANSPORTS = ("tcp", "unix", "stdio", "agent")  # "agent": no listener, executes for a coordinator
+AUTO_FORGE_MAX_MESSAGE_SIZE = 64 * 1024 * 1024  # Largest stdio line / WebSocket frame accepted
+AUTO_FORGE_WS_MAX_INFLIGHT = 32
+AUTO_FORGE_WS_SEND_QUEUE_SIZE = 1024
+AUTO_FORGE_NDJSON_CONTENT_TYPE = "application/x-ndjson"
+AUTO_FORGE_REST_STREAM_BUFFER = 1024  # Output events buffered per streaming REST call before dropping
+AUTO_FORGE_SSE_REPLAY_MAX_EVENTS = 1024
+AUTO_FORGE_SSE_REPLAY_MAX_BYTES = 4 * 1024 * 1024
+AUTO_FORGE_SSE_CLIENT_QUEUE_SIZE = 1024
+AUTO_FORGE_SSE_HEARTBEAT_INTERVAL = 15.0
+AUTO_FORGE_SSE_REAP_TIMEOUT = 60.0
+AUTO_FORGE_SSE_HEARTBEAT_FRAME = b"event: heartbeat\ndata: {}\n\n"
+AUTO_FORGE_SSE_FILTER_KEYS = ("job", "tool", "event")  # Most selective first: a client is indexed by the first it sets
+AUTO_FORGE_MAX_CONCURRENT_CALLS = 1  # Legacy single-flight
+AUTO_FORGE_MAX_QUEUED_CALLS = 0  # 0 = reject with Busy instead of queueing
+AUTO_FORGE_MAX_QUEUE_WAIT = 30.0
+AUTO_FORGE_PRIORITY_CLASSES = ("high", "normal", "low")  # Dispatch order of queued tool calls
+AUTO_FORGE_DEFAULT_PRIORITY = "normal"
+AUTO_FORGE_PRIORITY_AGING = 10.0  # Seconds of queueing that make up for one priority class
+AUTO_FORGE_COMPRESSION_MIN_SIZE = 1024  # Smaller bodies are sent as is
+AUTO_FORGE_COMPRESSION_OFFLOAD_SIZE = 64 * 1024  # Larger bodies are compressed in a worker thread
+AUTO_FORGE_AGENT_HELLO_TIMEOUT = 10.0  # Seconds a connecting agent has to introduce itself
+AUTO_FORGE_AGENT_RECONNECT_MAX = 30.0  # Longest back-off between agent reconnect attempts
+AUTO_FORGE_AGENT_MAX_SLOTS = 256  # Slots one agent may announce (each adds to the scheduler capacity)
+AUTO_FORGE_PIPE_READ_SIZE = 256 * 1024  # Bytes per read from a tool's stdout / stderr
+AUTO_FORGE_TOOL_RUNNERS = ("process", "daemon")  # "daemon": one long-lived process answering JSON lines
+AUTO_FORGE_DAEMON_RESTART_MAX = 30.0  # Longest back-off before restarting a daemon that keeps crashing
+AUTO_FORGE_DAEMON_STOP_TIMEOUT = 5.0  # Seconds a daemon has to exit after its stdin is closed
+AUTO_FORGE_PIPELINE_STREAM_CHUNKS = 16  # Stdout chunks buffered per stdin stream between pipeline steps
+AUTO_FORGE_PIPELINE_REF_PATTERN = re.compile(r"\$\{([A-Za-z0-9_-]+)(?:\.([^}]+))?\}")  # ${step.field} / ${args.name}
+AUTO_FORGE_PARAM_STYLES = ("flag", "positional", "stdin", "file")
+AUTO_FORGE_TOOL_NAME_PATTERN = re.compile(r"[a-z0-9_-]+")
+AUTO_FORGE_TOOL_SEARCH_LIMIT = 20  # Default tools/search page size
+AUTO_FORGE_TOOL_SEARCH_MAX_LIMIT = 100
+AUTO_FORGE_PARAM_FILE_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None  # "file" params: RAM backed if possible
+AUTO_FORGE_MEMORY_ERROR_MARKERS = ("MemoryError", "Cannot allocate memory", "std::bad_alloc", "out of memory")
+AUTO_FORGE_NPROC_ERROR_MARKERS = ("Resource temporarily unavailable", "fork: retry", "can't start new thread")
+AUTO_FORGE_RATE_LIMIT_MAX_CLIENTS = 4096  # Client buckets kept (least recently seen are evicted)
+AUTO_FORGE_RATE_LIMIT_CLIENT_HEADER = "X-Client-Id"
+AUTO_FORGE_IDEMPOTENCY_HEADER = "Idempotency-Key"  # Alternative to params._meta.idempotencyKey (HTTP)
+AUTO_FORGE_IDEMPOTENCY_TTL = 600.0  # Seconds a completed call's reply is replayed for its key
+AUTO_FORGE_IDEMPOTENCY_MAX_KEYS = 10000
+AUTO_FORGE_IDEMPOTENT_METHODS = ("tools/call", "tools/pipeline")
+AUTO_FORGE_EVENT_LOOPS = ("asyncio", "uvloop")  # "uvloop" falls back to asyncio when it is not installed
+AUTO_FORGE_LOOP_LAG_INTERVAL = 0.5  # Seconds between event loop lag probes (0 = off)
+AUTO_FORGE_LOOP_LAG_WARN = 0.1  # Probes delayed longer than this are logged as a blocked loop
+AUTO_FORGE_LOOP_LAG_WARN_EVERY = 10.0  # Seconds between repeated "blocked loop" warnings
+AUTO_FORGE_DRAIN_TIMEOUT = 30.0  # Seconds a shutdown waits for running calls (0 = stop at once)
+AUTO_FORGE_DRAIN_RETRY_AFTER = 1.0  # Retry hint for calls refused while draining, and SSE reconnect delay
+AUTO_FORGE_SSE_SHUTDOWN_FRAME = b"retry: %d\nevent: shutdown\ndata: {}\n\n" % int(AUTO_FORGE_DRAIN_RETRY_AFTER * 1000)
+AUTO_FORGE_LISTEN_FD_ENV = "MCP_LISTEN_FD"  # Listening socket inherited from the process handing off
+AUTO_FORGE_READY_FD_ENV = "MCP_READY_FD"  # Pipe the successor writes to once it is serving
+AUTO_FORGE_HANDOFF_TIMEOUT = 30.0  # Seconds a successor has to start serving before it is abandoned
+
+# Per-call sink for streamed log/progress events, set by transports that can push
+# them back to the caller (e.g. WebSocket). Context variables follow each call's task.
+_mcp_event_sink: ContextVar[Optional[Callable[[dict[str, Any]], None]]] = ContextVar("_mcp_event_sink", default=None)
 
 
 @dataclass
@@ -68,6 +165,890 @@ class _CoreMCPConfigType:
     advertise_ip: Optional[str] = None
     port: int = AUTO_FORGE_DEFAULT_PORT
     readonly: bool = False
+    transport: str = "tcp"  # One of AUTO_FORGE_TRANSPORTS
+    unix_socket: Optional[str] = None  # Socket path when transport is "unix"
+    agent_url: Optional[str] = None  # Coordinator WebSocket URL when transport is "agent"
+    agent_name: Optional[str] = None
+    agent_slots: int = 0  # Concurrent tool runs offered to the coordinator (0 = CPU count)
+    agent_labels: tuple[str, ...] = ()  # Matched against tool "affinity"
+
+
+@dataclass(frozen=True)
+class _CoreMCPCallContextType:
+    """ Identifies the tool call a broadcast event belongs to (used for SSE routing). """
+    tool: Optional[str] = None
+    job: Optional[str] = None
+
+
+# Tool call currently executing in this task; lets _broadcast() tag events without threading
+# the call identity through every helper.
+_mcp_call_context: ContextVar[_CoreMCPCallContextType] = ContextVar("_mcp_call_context",
+                                                                    default=_CoreMCPCallContextType())
+
+
+@dataclass(eq=False)
+class _CoreMCPSSEClientType:
+    """ One connected SSE subscriber and its pending (already encoded) frames. """
+    resp: web.StreamResponse
+    transport: Optional[asyncio.BaseTransport] = None
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=AUTO_FORGE_SSE_CLIENT_QUEUE_SIZE))
+    closing: bool = False  # Fell behind or reaped; will be disconnected and resume via Last-Event-ID
+    last_activity: float = 0.0  # Loop time of the last completed write
+    filters: dict[str, frozenset[str]] = field(default_factory=dict)  # Filter key -> accepted values
+
+    def matches(self, meta: dict[str, Optional[str]]) -> bool:
+        """ True when the event metadata satisfies every filter this client set. """
+        return all(meta.get(key) in accepted for key, accepted in self.filters.items())
+
+
+class _CoreMCPAdmissionError(Exception):
+    """ A call was refused before it ran (rate limited or shed); carries the JSON-RPC error to return. """
+
+    def __init__(self, code: int, message: str, retry_after: float):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.retry_after = retry_after
+
+
+@dataclass(eq=False)
+class _CoreMCPIdempotentCallType:
+    """ A call made under an idempotency key: its request fingerprint and the task producing its reply. """
+    fingerprint: str
+    task: asyncio.Task
+    expires: float = math.inf  # Monotonic; set to completion + TTL once the reply is known
+
+
+class _CoreMCPIdempotencyCacheType:
+    """
+    Bounded LRU of idempotency keys with a TTL. A retry carrying a known key replays the
+    stored reply of a completed call, or waits for the in-flight one, instead of running
+    the tool again. Only calls that were executed are remembered: admission errors
+    (busy, rate limited, overloaded) are not, so their retries are admitted afresh.
+    """
+
+    def __init__(self, ttl: float = AUTO_FORGE_IDEMPOTENCY_TTL, max_keys: int = AUTO_FORGE_IDEMPOTENCY_MAX_KEYS):
+        self.ttl = float(ttl)
+        self.max_keys = int(max_keys)
+        self.calls: OrderedDict[tuple[str, str], _CoreMCPIdempotentCallType] = OrderedDict()
+        self.hits = 0  # Replayed a completed call
+        self.attached = 0  # Joined a call still running
+        self.misses = 0  # Executed
+        self.conflicts = 0  # Key reused for a different request
+
+    @classmethod
+    def from_config(cls, config: Any) -> Optional["_CoreMCPIdempotencyCacheType"]:
+        """ Build the cache from the project's "idempotency" entry; false disables it. """
+        if config is False:
+            return None
+        config = config if isinstance(config, dict) else {}
+        return cls(ttl=config.get("ttl", AUTO_FORGE_IDEMPOTENCY_TTL),
+                   max_keys=config.get("max_keys", AUTO_FORGE_IDEMPOTENCY_MAX_KEYS))
+
+    def stats(self) -> dict[str, Any]:
+        return {"keys": len(self.calls), "hits": self.hits, "attached": self.attached, "misses": self.misses,
+                "conflicts": self.conflicts}
+
+    def get(self, key: tuple[str, str]) -> Optional[_CoreMCPIdempotentCallType]:
+        """ The live entry for a key, dropping expired entries on the way. """
+        now = time.monotonic()
+        while self.calls:
+            oldest_key, oldest = next(iter(self.calls.items()))
+            if oldest.expires > now:
+                break
+            del self.calls[oldest_key]
+        entry = self.calls.get(key)
+        if entry is not None and entry.expires <= now:
+            del self.calls[key]
+            entry = None
+        if entry is not None:
+            self.calls.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple[str, str], entry: _CoreMCPIdempotentCallType) -> None:
+        self.calls[key] = entry
+        self.calls.move_to_end(key)
+        while len(self.calls) > self.max_keys:
+            self.calls.popitem(last=False)
+
+    def settle(self, key: tuple[str, str], entry: _CoreMCPIdempotentCallType, keep: bool) -> None:
+        """ The call finished: keep its reply for the TTL, or forget the key. """
+        if self.calls.get(key) is not entry:
+            return  # Evicted meanwhile
+        if keep:
+            entry.expires = time.monotonic() + self.ttl
+        else:
+            del self.calls[key]
+
+
+class _CoreMCPTokenBucketType:
+    """
+    Token bucket rate limiter.
+    Attributes:
+        rate (float): Tokens added per second.
+        burst (float): Bucket capacity, i.e. how many calls may arrive back to back.
+        tokens (float): Tokens currently available.
+        updated (float): Monotonic time of the last refill.
+    """
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst if burst is not None else rate))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    @classmethod
+    def from_config(cls, config: Any) -> Optional["_CoreMCPTokenBucketType"]:
+        """ Build a bucket from a {"rate": .., "burst": ..} project entry; None or a rate <= 0 disables limiting. """
+        if not isinstance(config, dict) or float(config.get("rate") or 0) <= 0:
+            return None
+        return cls(rate=config["rate"], burst=config.get("burst"))
+
+    def retry_in(self, now: float) -> float:
+        """ Refill, then return 0.0 if a token is available, else the seconds until one is. """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        """ Consume one token (call after `retry_in()` returned 0.0). """
+        self.tokens -= 1.0
+
+
+@dataclass(eq=False)
+class _CoreMCPAgentRunType:
+    """ A tool call delegated to a remote agent and awaiting its result. """
+    future: asyncio.Future
+    context: _CoreMCPCallContextType  # Tags for re-broadcasting the agent's events
+    sink: Optional[Callable[[dict[str, Any]], None]]  # Caller's event sink (e.g. WebSocket progress)
+
+
+@dataclass(eq=False)
+class _CoreMCPAgentType:
+    """ A remote execution agent connected to this (coordinator) service. """
+    name: str
+    ws: web.WebSocketResponse
+    slots: int
+    labels: frozenset[str]
+    tools: frozenset[str]
+    inflight: int = 0
+    completed: int = 0
+    runs: dict[int, _CoreMCPAgentRunType] = field(default_factory=dict)
+
+    @property
+    def free(self) -> int:
+        return self.slots - self.inflight
+
+    def status(self) -> dict[str, Any]:
+        return {"name": self.name, "labels": sorted(self.labels), "slots": self.slots, "inflight": self.inflight,
+                "completed": self.completed, "tools": len(self.tools)}
+
+
+@dataclass(eq=False)
+class _CoreMCPWaiterType:
+    """ A tool call waiting for a run slot. """
+    future: asyncio.Future
+    priority: str
+    enqueued: float  # Monotonic time the call started waiting
+
+
+@dataclass
+class _CoreMCPPriorityStatsType:
+    """ Per priority class scheduler counters, reported on /status. """
+    admitted: int = 0
+    shed: int = 0
+    total_wait: float = 0.0  # Seconds admitted calls spent queued
+
+    def as_dict(self, queued: int) -> dict[str, Any]:
+        return {"queued": queued, "admitted": self.admitted, "shed": self.shed,
+                "avg_wait": round(self.total_wait / self.admitted, 3) if self.admitted else 0.0}
+
+
+@dataclass
+class _CoreMCPLoopLagType:
+    """ Event loop scheduling delay seen by the lag probe, reported on /status. """
+    samples: int = 0
+    total: float = 0.0
+    last: float = 0.0
+    max: float = 0.0
+    stalls: int = 0  # Probes late by more than the warning threshold
+
+    def record(self, lag: float, stalled: bool) -> None:
+        self.samples += 1
+        self.total += lag
+        self.last = lag
+        self.max = max(self.max, lag)
+        self.stalls += stalled
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"last_ms": round(self.last * 1000, 3), "max_ms": round(self.max * 1000, 3),
+                "avg_ms": round(self.total / self.samples * 1000, 3) if self.samples else 0.0,
+                "samples": self.samples, "stalls": self.stalls}
+
+
+class _CoreMCPSchedulerType:
+    """
+    Admission control for tool calls: a bounded number run at once, a bounded
+    queue waits, and everything beyond that is shed immediately so latency stays bounded.
+    Queued calls are dispatched by priority class (see AUTO_FORGE_PRIORITY_CLASSES). Each
+    class below the top one carries a handicap of `aging` seconds per step, so a waiting
+    call eventually outranks newer calls of a higher class and cannot starve.
+    Attributes:
+        max_running (int): Calls allowed to execute concurrently.
+        max_queued (int): Calls allowed to wait for a slot (0 = reject when busy).
+        max_wait (float): Seconds a queued call waits before it is shed.
+        max_processes (int): Shed new calls while this many tool processes are alive (0 = no limit).
+        aging (float): Seconds of waiting that make up for one priority class.
+    """
+
+    def __init__(self, max_running: int, max_queued: int, max_wait: float, max_processes: int,
+                 processes: Callable[[], int], aging: float = AUTO_FORGE_PRIORITY_AGING):
+        self.max_running = max(1, int(max_running))
+        self.max_queued = max(0, int(max_queued))
+        self.max_wait = float(max_wait)
+        self.max_processes = max(0, int(max_processes))
+        self.aging = max(0.0, float(aging))
+        self.running = 0
+        self.shed = 0
+        self.avg_duration = 1.0  # EWMA of call durations (seconds), used for retry hints
+        self._processes = processes
+        self._waiters: dict[str, deque[_CoreMCPWaiterType]] = {c: deque() for c in AUTO_FORGE_PRIORITY_CLASSES}
+        self._stats: dict[str, _CoreMCPPriorityStatsType] = {
+            c: _CoreMCPPriorityStatsType() for c in AUTO_FORGE_PRIORITY_CLASSES}
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self._waiters.values())
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """ Per priority class queue metrics. """
+        return {c: self._stats[c].as_dict(len(self._waiters[c])) for c in AUTO_FORGE_PRIORITY_CLASSES}
+
+    def retry_after(self) -> float:
+        """ Rough time until a newly arriving call could be admitted. """
+        backlog = (self.queued + 1) / self.max_running
+        return round(max(0.1, backlog * self.avg_duration), 3)
+
+    def _reject(self, code: int, message: str, priority: str) -> _CoreMCPAdmissionError:
+        self.shed += 1
+        self._stats[priority].shed += 1
+        return _CoreMCPAdmissionError(code, message, self.retry_after())
+
+    def _next_waiter(self) -> Optional[_CoreMCPWaiterType]:
+        """ Pop the queued call with the earliest aged deadline: enqueue time plus class handicap. """
+        best: Optional[deque[_CoreMCPWaiterType]] = None
+        best_key = 0.0
+        for rank, priority in enumerate(AUTO_FORGE_PRIORITY_CLASSES):
+            queue = self._waiters[priority]
+            if queue:
+                key = queue[0].enqueued + rank * self.aging
+                if best is None or key < best_key:
+                    best, best_key = queue, key
+        return best.popleft() if best is not None else None
+
+    def _evict_lower(self, priority: str) -> bool:
+        """ Full queue: shed the newest waiter of the lowest class below `priority`, if any. """
+        rank = AUTO_FORGE_PRIORITY_CLASSES.index(priority)
+        for lower in reversed(AUTO_FORGE_PRIORITY_CLASSES[rank + 1:]):
+            if self._waiters[lower]:
+                victim = self._waiters[lower].pop()
+                victim.future.set_exception(self._reject(
+                    AUTO_FORGE_OVERLOADED_CODE, "Overloaded: displaced by a higher priority call", lower))
+                return True
+        return False
+
+    async def acquire(self, priority: str = AUTO_FORGE_DEFAULT_PRIORITY) -> None:
+        """
+        Wait for a run slot.
+        Args:
+            priority (str): Priority class of the call.
+        Raises:
+            _CoreMCPAdmissionError: The call was shed (busy, queue full, queue wait exceeded,
+                displaced by a higher priority call or too many live processes).
+        """
+        stats = self._stats[priority]
+        if self.max_processes and self._processes() >= self.max_processes:
+            raise self._reject(AUTO_FORGE_OVERLOADED_CODE, "Overloaded: too many tool processes running", priority)
+
+        if self.running < self.max_running and not self.queued:
+            self.running += 1
+            stats.admitted += 1
+            return
+
+        if self.max_queued == 0:
+            raise self._reject(AUTO_FORGE_BUSY_CODE, "Busy: another tool is currently running in this workspace",
+                               priority)
+        if self.queued >= self.max_queued and not self._evict_lower(priority):
+            raise self._reject(AUTO_FORGE_OVERLOADED_CODE, "Overloaded: tool call queue is full", priority)
+
+        waiter = _CoreMCPWaiterType(future=asyncio.get_running_loop().create_future(), priority=priority,
+                                    enqueued=time.monotonic())
+        self._waiters[priority].append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            if not waiter.future.done():
+                self._waiters[priority].remove(waiter)
+                raise self._reject(AUTO_FORGE_OVERLOADED_CODE, "Overloaded: timed out waiting for a free slot",
+                                   priority)
+            if waiter.future.exception() is not None:
+                raise waiter.future.exception()
+            # Handed a slot just as the wait expired
+        except asyncio.CancelledError:
+            if not waiter.future.done():
+                self._waiters[priority].remove(waiter)
+            elif waiter.future.exception() is None:
+                self.release()  # The slot was already handed over; pass it on
+            raise
+
+        stats.admitted += 1
+        stats.total_wait += time.monotonic() - waiter.enqueued
+
+    def set_capacity(self, max_running: int) -> None:
+        """ Change how many calls may run at once (agents joining / leaving); new slots go to waiters. """
+        self.max_running = max(1, int(max_running))
+        while self.running < self.max_running and (waiter := self._next_waiter()) is not None:
+            if not waiter.future.done():
+                waiter.future.set_result(None)
+                self.running += 1
+
+    def release(self, duration: Optional[float] = None) -> None:
+        """ Free a run slot, handing it directly to the next waiter if there is one. """
+        if duration is not None:
+            self.avg_duration += 0.2 * (duration - self.avg_duration)
+        if self.running <= self.max_running:
+            while (waiter := self._next_waiter()) is not None:
+                if not waiter.future.done():
+                    waiter.future.set_result(None)  # Slot ownership moves to the waiter; `running` is unchanged
+                    return
+        self.running -= 1  # Over capacity (an agent left) or nobody waiting
+
+
+@dataclass(frozen=True)
+class _CoreMCPToolLimitsType:
+    """
+    Resource limits applied to a tool's process between fork and exec (POSIX only).
+    Attributes:
+        memory_mb (Optional[int]): Address space cap (RLIMIT_AS).
+        cpu_seconds (Optional[int]): CPU time cap (RLIMIT_CPU); the process gets SIGXCPU.
+        file_size_mb (Optional[int]): Largest file the process may write (RLIMIT_FSIZE); SIGXFSZ beyond it.
+        nproc (Optional[int]): Processes the invoking user may own (RLIMIT_NPROC; counts the user's
+            other processes too).
+        nice (Optional[int]): Niceness increment.
+        cpu_affinity (Optional[tuple[int, ...]]): CPUs the process may run on (Linux).
+    """
+    memory_mb: Optional[int] = None
+    cpu_seconds: Optional[int] = None
+    file_size_mb: Optional[int] = None
+    nproc: Optional[int] = None
+    nice: Optional[int] = None
+    cpu_affinity: Optional[tuple[int, ...]] = None
+
+    @classmethod
+    def from_config(cls, config: Any) -> Optional["_CoreMCPToolLimitsType"]:
+        """ Parse a tool's "limits" entry; None or an empty object means unlimited. """
+        if not config:
+            return None
+        if not isinstance(config, dict):
+            raise ValueError("'limits' must be an object")
+        known = {f.name for f in fields(cls)}
+        unknown = sorted(set(config) - known)
+        if unknown:
+            raise ValueError(f"unknown limits: {', '.join(unknown)}")
+
+        values: dict[str, Any] = {}
+        for key, value in config.items():
+            if value is None:
+                continue
+            if key == "cpu_affinity":
+                if not isinstance(value, list) or not value or not all(isinstance(c, int) and c >= 0 for c in value):
+                    raise ValueError("'cpu_affinity' must be a non-empty list of CPU numbers")
+                values[key] = tuple(value)
+            elif not isinstance(value, int) or (value <= 0 and key != "nice"):
+                raise ValueError(f"'{key}' must be a positive integer")
+            else:
+                values[key] = value
+        return cls(**values) if values else None
+
+    def apply(self) -> None:
+        """ Apply the limits to the current process; runs in the child right before exec. """
+        if resource is not None:
+            mb = 1024 * 1024
+            if self.memory_mb is not None:
+                resource.setrlimit(resource.RLIMIT_AS, (self.memory_mb * mb, self.memory_mb * mb))
+            if self.cpu_seconds is not None:
+                # Soft limit raises SIGXCPU (reported as "cpu"); the hard limit is the SIGKILL backstop
+                resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds + 1))
+            if self.file_size_mb is not None:
+                resource.setrlimit(resource.RLIMIT_FSIZE, (self.file_size_mb * mb, self.file_size_mb * mb))
+            if self.nproc is not None:
+                resource.setrlimit(resource.RLIMIT_NPROC, (self.nproc, self.nproc))
+        if self.nice:
+            os.nice(self.nice)
+        if self.cpu_affinity is not None and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, self.cpu_affinity)
+
+    def violation(self, status: int, output_tail: list[str], cpu_time: Optional[float] = None) -> Optional[str]:
+        """
+        Best-effort attribution of a failed run to one of the limits.
+        CPU and file size violations are signalled (SIGXCPU / SIGXFSZ, unless the tool
+        ignores them, as Python does for SIGXFSZ); memory and process count exhaustion
+        surface as allocation / fork failures. Both are also recognized from the last
+        lines of output. A SIGKILL only counts as the CPU hard limit when the run used
+        that much CPU time; anything else may have sent it, so it is not attributed.
+        Args:
+            status (int): Process return code (negative = killed by that signal).
+            output_tail (list[str]): Last output lines of the process.
+            cpu_time (Optional[float]): CPU seconds the process used, if known.
+        Returns:
+            "cpu", "file_size", "memory", "nproc" or None.
+        """
+        if status == 0:
+            return None
+        if self.cpu_seconds is not None and (status == -signal.SIGXCPU or (
+                status == -signal.SIGKILL and cpu_time is not None and cpu_time >= self.cpu_seconds)):
+            return "cpu"
+        tail = "\n".join(output_tail)
+        if self.file_size_mb is not None and (status == -signal.SIGXFSZ or "File too large" in tail):
+            return "file_size"
+        if self.memory_mb is not None and (status in (-signal.SIGSEGV, -signal.SIGABRT)
+                                           or any(m in tail for m in AUTO_FORGE_MEMORY_ERROR_MARKERS)):
+            return "memory"
+        if self.nproc is not None and any(m in tail for m in AUTO_FORGE_NPROC_ERROR_MARKERS):
+            return "nproc"
+        return None
+
+
+@dataclass(frozen=True)
+class _CoreMCPDaemonConfigType:
+    """
+    Options of a "daemon" runner tool (its "daemon" entry).
+    Attributes:
+        instances (int): Daemon processes started at most; more are started as concurrent calls need them.
+        max_pending (int): Requests pipelined to one instance before further calls wait.
+        request_timeout (float): Seconds a call may take; an instance that misses it is restarted.
+        health_interval (float): Seconds between pings of idle and busy instances (0 = no health checks).
+        health_timeout (float): Seconds an instance has to answer a ping before it is restarted.
+    """
+    instances: int = 1
+    max_pending: int = 16
+    request_timeout: float = 300.0
+    health_interval: float = 30.0
+    health_timeout: float = 5.0
+
+    @classmethod
+    def from_config(cls, config: Any) -> "_CoreMCPDaemonConfigType":
+        """ Parse a tool's "daemon" entry; None means all defaults. """
+        if config is None:
+            return cls()
+        if not isinstance(config, dict):
+            raise ValueError("'daemon' must be an object")
+        known = {f.name for f in fields(cls)}
+        unknown = sorted(set(config) - known)
+        if unknown:
+            raise ValueError(f"unknown daemon options: {', '.join(unknown)}")
+
+        for key in ("instances", "max_pending"):
+            if key in config and (not isinstance(config[key], int) or config[key] < 1):
+                raise ValueError(f"'{key}' must be a positive integer")
+        for key in ("request_timeout", "health_interval", "health_timeout"):
+            if key in config and (not isinstance(config[key], (int, float)) or config[key] < 0
+                                  or (config[key] == 0 and key != "health_interval")):
+                raise ValueError(f"'{key}' must be a positive number of seconds")
+        return cls(**config)
+
+
+class _CoreMCPDaemonType:
+    """
+    One instance of a daemon tool: a long-lived process answering newline-delimited
+    JSON-RPC requests on stdin with replies on stdout. Requests are pipelined: several
+    may be outstanding at once and replies are matched by id, in any order.
+    """
+
+    def __init__(self, index: int, max_pending: int):
+        self.index = index
+        self.proc: Optional[asyncio.subprocess.Process] = None
+        self.pending: dict[int, tuple[asyncio.Future, Optional[Callable[[str], Any]]]] = {}
+        self.next_id = 0
+        self.load = 0  # Calls assigned to this instance, including those still waiting for it to start
+        self.served = 0
+        self.starts = 0
+        self.failures = 0  # Consecutive crashes; drives the restart back-off
+        self.retry_at = 0.0  # Monotonic time before which the instance is not restarted
+        self.stderr_tail: deque[str] = deque(maxlen=20)
+        self.lock = asyncio.Lock()
+        self.slots = asyncio.Semaphore(max_pending)
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.returncode is None
+
+    def status(self) -> dict[str, Any]:
+        return {"instance": self.index, "pid": self.proc.pid if self.alive else None, "pending": len(self.pending),
+                "served": self.served, "restarts": max(0, self.starts - 1)}
+
+    def kill(self) -> None:
+        """ Kill the process; the stdout reader then fails its pending requests. """
+        if self.alive:
+            with contextlib.suppress(ProcessLookupError):
+                self.proc.kill()
+
+
+class _CoreMCPDaemonPoolType:
+    """
+    The daemon instances of one tool. Protocol, one JSON object per line:
+      engine -> daemon: {"jsonrpc": "2.0", "id": n, "method": "tools/call", "params": {"name", "arguments"}},
+                        {"jsonrpc": "2.0", "id": n, "method": "ping"} (health check) and
+                        {"jsonrpc": "2.0", "method": "notifications/cancelled", "params": {"requestId": n}}.
+      daemon -> engine: {"jsonrpc": "2.0", "id": n, "result": ...} or {"jsonrpc": "2.0", "id": n, "error": {...}},
+                        and optionally {"jsonrpc": "2.0", "method": "log", "params": {"id": n, "data": "line"}}
+                        to stream output of request n while it runs.
+    Other stdout lines and all stderr lines go to the service log. Instances start on first
+    use, are restarted with back-off after a crash, and are killed and restarted when they
+    miss a ping or a request timeout.
+    """
+
+    def __init__(self, name: str, argv: list[str], cwd: Optional[str], limits: Optional[_CoreMCPToolLimitsType],
+                 config: _CoreMCPDaemonConfigType, log: Callable[..., None]):
+        self.name = name
+        self.argv = argv
+        self.cwd = cwd
+        self.limits = limits
+        self.config = config
+        self.log = log
+        self.env: Optional[dict[str, str]] = None
+        self.instances = [_CoreMCPDaemonType(index, config.max_pending) for index in range(config.instances)]
+        self.closing = False
+        self._tasks: set[asyncio.Task] = set()
+        self._health: Optional[asyncio.Task] = None
+
+    def status(self) -> list[dict[str, Any]]:
+        return [instance.status() for instance in self.instances]
+
+    async def call(self, arguments: dict[str, Any], env: Optional[dict[str, str]],
+                   on_log: Optional[Callable[[str], Any]] = None) -> tuple[_CoreMCPDaemonType, dict[str, Any]]:
+        """
+        Send one tools/call request to the least loaded instance (starting it if needed).
+        Args:
+            arguments (dict[str, Any]): The call's arguments, passed to the daemon as is.
+            env (dict[str, str], optional): Environment for instances started by this call.
+            on_log (Callable, optional): Awaited with each "log" line the daemon streams for the request.
+        Returns:
+            The instance that served the call and its reply message ("result" or "error").
+        """
+        if self.closing:
+            raise RuntimeError(f"daemon '{self.name}' is shutting down")
+        self.env = env
+        instance = min(self.instances, key=lambda d: (d.load, not d.alive))
+        instance.load += 1
+        try:
+            async with instance.slots:
+                await self._ensure(instance)
+                reply = await self._request(instance, "tools/call", {"name": self.name, "arguments": arguments},
+                                            on_log, self.config.request_timeout)
+            instance.served += 1
+            instance.failures = 0
+            return instance, reply
+        finally:
+            instance.load -= 1
+
+    async def _ensure(self, instance: _CoreMCPDaemonType) -> None:
+        """ Start the instance unless it is running, honouring the crash back-off. """
+        async with instance.lock:
+            if instance.alive:
+                return
+            delay = instance.retry_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.closing:
+                raise RuntimeError(f"daemon '{self.name}' is shutting down")
+
+            try:
+                instance.proc = await asyncio.create_subprocess_exec(
+                    *self.argv,
+                    cwd=self.cwd,
+                    env=self.env,
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    limit=AUTO_FORGE_MAX_MESSAGE_SIZE,
+                    preexec_fn=self.limits.apply if self.limits is not None and resource is not None else None,
+                    start_new_session=True,  # A terminal Ctrl+C reaches only the service, which drains first
+                )
+            except Exception as execute_error:
+                self._crashed(instance)
+                raise RuntimeError(f"Failed to launch daemon {self.argv!r}: {execute_error}")
+
+            instance.starts += 1
+            self.log(f"Daemon '{self.name}' #{instance.index} started (pid {instance.proc.pid})")
+            self._spawn(self._read_replies(instance, instance.proc))
+            self._spawn(self._read_stderr(instance, instance.proc))
+            if self._health is None and self.config.health_interval > 0:
+                self._health = asyncio.create_task(self._health_loop())
+
+    async def _request(self, instance: _CoreMCPDaemonType, method: str, params: Optional[dict[str, Any]],
+                       on_log: Optional[Callable[[str], Any]], timeout: float) -> dict[str, Any]:
+        """ Pipeline one request to a running instance and wait for its reply. """
+        proc = instance.proc
+        if proc is None or proc.returncode is not None or proc.stdin is None:
+            raise RuntimeError(f"daemon '{self.name}' #{instance.index} is not running")
+
+        instance.next_id += 1
+        request_id = instance.next_id
+        future = asyncio.get_running_loop().create_future()
+        instance.pending[request_id] = (future, on_log)
+        message: dict[str, Any] = {"jsonrpc": "2.0", "id": request_id, "method": method}
+        if params is not None:
+            message["params"] = params
+        try:
+            proc.stdin.write(json.dumps(message, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n")
+            await proc.stdin.drain()
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.log(f"Daemon '{self.name}' #{instance.index} did not answer '{method}' within {timeout:g}s; "
+                     f"restarting it", level="warning")
+            instance.kill()
+            raise RuntimeError(f"daemon '{self.name}' timed out after {timeout:g}s")
+        except (BrokenPipeError, ConnectionResetError):
+            raise RuntimeError(f"daemon '{self.name}' #{instance.index} exited")
+        except asyncio.CancelledError:
+            with contextlib.suppress(Exception):
+                proc.stdin.write(json.dumps({"jsonrpc": "2.0", "method": "notifications/cancelled",
+                                             "params": {"requestId": request_id}}).encode("utf-8") + b"\n")
+            raise
+        finally:
+            instance.pending.pop(request_id, None)
+
+    async def _read_replies(self, instance: _CoreMCPDaemonType, proc: asyncio.subprocess.Process) -> None:
+        """ Match replies to pending requests and forward streamed log lines until the daemon exits. """
+        assert proc.stdout is not None
+        try:
+            while line := await proc.stdout.readline():
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    self.log(f"[{self.name}#{instance.index}] {line.decode('utf-8', 'replace').rstrip()}",
+                             level="debug")
+                    continue
+                if not isinstance(message, dict):
+                    continue
+
+                if "result" in message or "error" in message:
+                    entry = instance.pending.get(message.get("id"))
+                    if entry is not None and not entry[0].done():
+                        entry[0].set_result(message)
+                elif message.get("method") == "log" and isinstance(message.get("params"), dict):
+                    entry = instance.pending.get(message["params"].get("id"))
+                    if entry is not None and entry[1] is not None:
+                        with contextlib.suppress(Exception):
+                            await entry[1](str(message["params"].get("data", "")))
+        except (ValueError, asyncio.LimitOverrunError):
+            self.log(f"Daemon '{self.name}' #{instance.index} wrote an oversized line; restarting it",
+                     level="warning")
+            instance.kill()
+
+        status = await proc.wait()
+        for future, _ in instance.pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError(f"daemon '{self.name}' #{instance.index} exited ({status})"))
+        if self.closing:
+            return
+
+        self._crashed(instance)
+        tail = "; ".join(instance.stderr_tail)
+        self.log(f"Daemon '{self.name}' #{instance.index} exited with status {status}"
+                 f"{f' ({tail})' if tail else ''}; restarting in {instance.retry_at - time.monotonic():.1f}s",
+                 level="warning")
+        self._spawn(self._restart(instance))
+
+    async def _read_stderr(self, instance: _CoreMCPDaemonType, proc: asyncio.subprocess.Process) -> None:
+        """ Log the daemon's diagnostics; the last lines are kept for crash reports. """
+        assert proc.stderr is not None
+        with contextlib.suppress(ValueError, asyncio.LimitOverrunError):
+            while line := await proc.stderr.readline():
+                text = line.decode("utf-8", "replace").rstrip()
+                instance.stderr_tail.append(text)
+                self.log(f"[{self.name}#{instance.index}] {text}", level="debug")
+
+    def _crashed(self, instance: _CoreMCPDaemonType) -> None:
+        instance.failures += 1
+        instance.retry_at = time.monotonic() + min(0.5 * 2 ** (instance.failures - 1), AUTO_FORGE_DAEMON_RESTART_MAX)
+
+    async def _restart(self, instance: _CoreMCPDaemonType) -> None:
+        """ Bring a crashed instance back right away, so the next call does not pay for its start-up. """
+        try:
+            await self._ensure(instance)
+        except RuntimeError as restart_error:
+            self.log(str(restart_error), level="warning")
+
+    async def _health_loop(self) -> None:
+        """ Ping running instances; one that does not answer in time is killed (and so restarted). """
+        while True:
+            await asyncio.sleep(self.config.health_interval)
+            for instance in self.instances:
+                if instance.alive:
+                    with contextlib.suppress(RuntimeError):
+                        await self._request(instance, "ping", None, None, self.config.health_timeout)
+
+    def _spawn(self, coroutine: Any) -> None:
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self, grace: float = 0.0) -> None:
+        """
+        Stop all instances: wait up to `grace` seconds for calls in flight, close stdin (a
+        daemon should exit on EOF), and kill what is still running after a short timeout.
+        """
+        deadline = time.monotonic() + grace
+        while any(instance.load for instance in self.instances) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+        self.closing = True
+        if self._health is not None:
+            self._health.cancel()
+        for instance in self.instances:
+            if not instance.alive:
+                continue
+            with contextlib.suppress(Exception):
+                instance.proc.stdin.close()
+            try:
+                await asyncio.wait_for(instance.proc.wait(), AUTO_FORGE_DAEMON_STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                instance.kill()
+                await instance.proc.wait()
+        for task in list(self._tasks):
+            task.cancel()
+
+
+@dataclass(frozen=True)
+class _CoreMCPPipelineStepType:
+    """
+    One tool call of a pipeline.
+    Attributes:
+        id (str): Step name, referenced by other steps as ${id...}.
+        tool (str): Registered tool name.
+        arguments (dict[str, Any]): Tool arguments; strings may reference earlier steps or pipeline args.
+        after (frozenset[str]): Steps that must finish first (explicit "after" plus referenced steps).
+        stdin (Optional[str]): Step whose stdout is streamed into this step's stdin while both run.
+    """
+    id: str
+    tool: str
+    arguments: dict[str, Any]
+    after: frozenset[str]
+    stdin: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class _CoreMCPPipelineType:
+    """
+    A DAG of tool calls run server-side as one request (`tools/pipeline`). Steps start as
+    soon as the steps they depend on have finished, so independent branches run in
+    parallel; a step whose dependency failed is skipped.
+    """
+    steps: tuple[_CoreMCPPipelineStepType, ...]
+    description: str = ""
+    output: Optional[str] = None  # Step whose output is the pipeline's; default: the last step
+    priority: Optional[str] = None
+
+    @classmethod
+    def from_config(cls, config: Any) -> "_CoreMCPPipelineType":
+        """ Validate a pipeline definition (declared under "pipelines" or sent inline). """
+        if not isinstance(config, dict):
+            raise ValueError("pipeline must be an object")
+        raw_steps = config.get("steps")
+        if not isinstance(raw_steps, list) or not raw_steps:
+            raise ValueError("'steps' must be a non-empty list")
+
+        ids = [raw.get("id") if isinstance(raw, dict) else None for raw in raw_steps]
+        for step_id in ids:
+            if not isinstance(step_id, str) or not re.fullmatch(r"[A-Za-z0-9_-]+", step_id) or step_id == "args":
+                raise ValueError(f"invalid step id {step_id!r} (letters, digits, '_' and '-'; not 'args')")
+        if len(set(ids)) != len(ids):
+            raise ValueError("step ids must be unique")
+
+        steps: list[_CoreMCPPipelineStepType] = []
+        for raw in raw_steps:
+            arguments = raw.get("arguments") or {}
+            after = raw.get("after") or []
+            stdin = raw.get("stdin")
+            if not isinstance(raw.get("tool"), str) or not raw["tool"]:
+                raise ValueError(f"step '{raw['id']}' is missing 'tool'")
+            if not isinstance(arguments, dict):
+                raise ValueError(f"step '{raw['id']}': 'arguments' must be an object")
+            if not isinstance(after, list) or not all(isinstance(dep, str) for dep in after):
+                raise ValueError(f"step '{raw['id']}': 'after' must be a list of step ids")
+
+            depends = set(after) | {ref for ref, _ in cls.references(arguments) if ref != "args"}
+            for dep in sorted(depends | ({stdin} if stdin is not None else set())):
+                if dep not in ids or dep == raw["id"]:
+                    raise ValueError(f"step '{raw['id']}' refers to unknown step '{dep}'")
+            steps.append(_CoreMCPPipelineStepType(id=raw["id"], tool=raw["tool"], arguments=arguments,
+                                                  after=frozenset(depends), stdin=stdin))
+
+        by_id = {step.id: step for step in steps}
+
+        def _ancestors(_step_id: str, _seen: frozenset[str]) -> set[str]:
+            if _step_id in _seen:
+                raise ValueError(f"steps form a cycle through '{_step_id}'")
+            step = by_id[_step_id]
+            found = set(step.after)
+            for dep in step.after | ({step.stdin} if step.stdin else set()):
+                found |= _ancestors(dep, _seen | {_step_id})
+            return found
+
+        for step in steps:
+            ancestors = _ancestors(step.id, frozenset())
+            # A consumer that also waits for its producer to finish would stall it once the stream buffer is full
+            if step.stdin is not None and step.stdin in ancestors:
+                raise ValueError(f"step '{step.id}' streams stdin from '{step.stdin}' and also waits for it")
+
+        output = config.get("output")
+        if output is not None and output not in by_id:
+            raise ValueError(f"'output' refers to unknown step '{output}'")
+        priority = config.get("priority")
+        if priority is not None and priority not in AUTO_FORGE_PRIORITY_CLASSES:
+            raise ValueError(f"invalid priority '{priority}'")
+        return cls(steps=tuple(steps), description=str(config.get("description", "")),
+                   output=output or steps[-1].id, priority=priority)
+
+    @classmethod
+    def references(cls, value: Any) -> list[tuple[str, Optional[str]]]:
+        """ All ${name.field} references in a (nested) argument value. """
+        if isinstance(value, str):
+            return [(m.group(1), m.group(2)) for m in AUTO_FORGE_PIPELINE_REF_PATTERN.finditer(value)]
+        if isinstance(value, dict):
+            return [ref for item in value.values() for ref in cls.references(item)]
+        if isinstance(value, list):
+            return [ref for item in value for ref in cls.references(item)]
+        return []
+
+
+class _CoreMCPStreamType:
+    """
+    Bounded stdout -> stdin byte stream between two concurrently running pipeline steps.
+    The producer blocks while the buffer is full (back-pressure); once the consumer stops
+    reading, further output is discarded so the producer can always finish.
+    """
+
+    def __init__(self) -> None:
+        self._queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue(maxsize=AUTO_FORGE_PIPELINE_STREAM_CHUNKS)
+        self._closed = False
+
+    async def put(self, chunk: Optional[bytes]) -> None:
+        """ Queue a chunk; None marks the end of the stream. """
+        if not self._closed:
+            await self._queue.put(chunk)
+
+    async def get(self) -> Optional[bytes]:
+        return await self._queue.get()
+
+    def close(self) -> None:
+        """ Consumer side is done: drop what is buffered and ignore what follows. """
+        self._closed = True
+        while not self._queue.empty():
+            self._queue.get_nowait()
 
 
 class _CoreMCPToolType:
@@ -85,7 +1066,22 @@ class _CoreMCPToolType:
             to runtime arguments (name, type, description).
         env (dict[str, str]): Optional environment variables to set when running.
         resource (Optional[str]): Path to a documentation resource for this tool.
+        rate_limit (Optional[_CoreMCPTokenBucketType]): Per-tool call rate limit, shared by
+            all clients (None = unlimited).
+        priority (str): Scheduling class of the tool's calls when they have to queue.
+        limits (Optional[_CoreMCPToolLimitsType]): Resource limits for the tool's process.
+        stderr_metadata (bool): The tool's last stderr line is a JSON metadata object.
+        output (Optional[dict[str, Any]]): Output pipeline options (see `CoreOutputPipeline`).
+        keywords (Optional[CoreKeywordScanner]): Keywords flagged in the tool's output.
+        affinity (frozenset[str]): Agent labels / names the tool may be placed on ("local" =
+            this host); empty means any agent.
+        daemon (Optional[_CoreMCPDaemonPoolType]): Daemon instances of a "daemon" runner tool;
+            None runs a new process per call.
     """
+    # Generated projects register thousands of tools: no per-record __dict__
+    __slots__ = ("name", "description", "input_schema", "command", "working_dir", "args", "params", "env",
+                 "resource", "rate_limit", "priority", "limits", "stderr_metadata", "output", "keywords",
+                 "affinity", "daemon")
 
     def __init__(
             self,
@@ -98,6 +1094,14 @@ class _CoreMCPToolType:
             params: Optional[list[dict[str, Any]]] = None,
             env: Optional[dict[str, str]] = None,
             resource: Optional[str] = None,
+            rate_limit: Optional[_CoreMCPTokenBucketType] = None,
+            priority: str = AUTO_FORGE_DEFAULT_PRIORITY,
+            limits: Optional[_CoreMCPToolLimitsType] = None,
+            stderr_metadata: bool = False,
+            output: Optional[dict[str, Any]] = None,
+            keywords: Optional[CoreKeywordScanner] = None,
+            affinity: Optional[frozenset[str]] = None,
+            daemon: Optional[_CoreMCPDaemonPoolType] = None,
     ):
         self.name = name
         self.description = description
@@ -108,24 +1112,78 @@ class _CoreMCPToolType:
         self.params = params or []
         self.env = env or {}
         self.resource = resource
+        self.rate_limit = rate_limit
+        self.priority = priority
+        self.limits = limits
+        self.stderr_metadata = stderr_metadata
+        self.output = output
+        self.keywords = keywords
+        self.affinity = affinity or frozenset()
+        self.daemon = daemon
 
 
 class CoreMCPService:
-    def __init__(self, project_data: Optional[dict] = None) -> None:
+    # Log lines go to stdout unless stdout carries protocol traffic (stdio transport)
+    _log_fd: int = 1
+
+    def __init__(self, project_data: Optional[dict] = None,
+                 transport: str = "tcp",
+                 unix_socket: Optional[str] = None,
+                 project_path: Optional[Union[Path, str]] = None,
+                 project_loader: Optional[Callable[[Path], Optional[dict]]] = None,
+                 startup_t0: Optional[float] = None,
+                 agent_url: Optional[str] = None,
+                 agent_name: Optional[str] = None,
+                 agent_slots: int = 0,
+                 agent_labels: Optional[list[str]] = None,
+                 restart_argv: Optional[list[str]] = None,
+                 restart_cwd: Optional[Union[Path, str]] = None) -> None:
 
         """
         Initialize MCP server state and register routes.
         Args:
             project_data (Any): Project data (json parsed data).
+            transport (str): How clients reach the service:
+                "tcp"   - HTTP/SSE on the configured bind address and port (default).
+                "unix"  - The same HTTP/SSE application on a Unix domain socket.
+                "stdio" - Newline-delimited JSON-RPC on stdin/stdout (MCP stdio transport).
+                "agent" - No listener: connect to a coordinator service at `agent_url` and
+                          execute the tool calls it places here (remote execution agent).
+            unix_socket (str, optional): Socket path, required when transport is "unix".
+            project_path (Path, optional): Project file the data came from; enables hot
+                reload (see `project_reload_interval`) together with `project_loader`.
+            project_loader (Callable, optional): Parses `project_path` into project data.
+            startup_t0 (float, optional): `time.perf_counter()` at process launch. When set,
+                the time until the service listens and until the first connection is
+                accepted is logged (startup-time measurement mode).
+            agent_url (str, optional): Coordinator `/agent` WebSocket URL (agent transport).
+            agent_name (str, optional): Agent name; defaults to "<hostname>-<pid>".
+            agent_slots (int): Tool runs the agent offers at once (0 = CPU count).
+            agent_labels (list[str], optional): Labels matched against tool "affinity".
+            restart_argv (list[str], optional): Command line that starts this service again;
+                enables socket hand-off (SIGUSR2) for the "tcp" and "unix" transports.
+            restart_cwd (Path, optional): Working directory `restart_argv` is relative to.
         """
 
-        self._single_flight = asyncio.Semaphore(1)  # Single-flight across the whole workspace
-        self._current = None  # (tool_name, started_at) for status/telemetry
-
         self._mcp_config = _CoreMCPConfigType()
         self._logger = CoreMCPLogger("MCP")
         self._shutdown_event = asyncio.Event()
+        self._draining: bool = False
+        self._calls_in_flight: set[asyncio.Task] = set()  # Tasks executing tools/call or tools/pipeline
+        self._calls_idle = asyncio.Event()
+        self._calls_idle.set()
+        self._listen_site: Optional[web.BaseSite] = None
+        self._listen_socket: Optional[socket.socket] = None
+        self._handed_off: bool = False
+        self._restart_argv: Optional[list[str]] = list(restart_argv) if restart_argv else None
+        self._restart_cwd: Optional[str] = str(restart_cwd) if restart_cwd is not None else None
         self._tools_registry: dict[str, _CoreMCPToolType] = {}
+        self._tools_list_cache: Optional[dict[str, Any]] = None  # Prebuilt tools/list result
+        self._tool_index: Optional[CoreToolIndex] = None  # tools/search index, built by the first search
+        self._tool_env_cache: dict[str, dict[str, str]] = {}  # Tool name -> merged environment
+        self._project_path: Optional[Path] = Path(project_path) if project_path is not None else None
+        self._project_loader = project_loader
+        self._startup_t0: Optional[float] = startup_t0
         self._mcp_server_name: Optional[str] = None
         self._mcp_server_version: Optional[str] = None
         self._project_data: Optional[dict] = project_data
@@ -142,56 +1200,339 @@ class CoreMCPService:
         if not isinstance(project_data, dict):
             raise TypeError("project_data must be a dict")
 
+        if transport not in AUTO_FORGE_TRANSPORTS:
+            raise ValueError(f"Unsupported transport '{transport}', expected one of {AUTO_FORGE_TRANSPORTS}")
+        if transport == "unix" and not unix_socket:
+            raise ValueError("Unix socket transport requires a socket path")
+        if transport == "agent" and not agent_url:
+            raise ValueError("Agent transport requires a coordinator URL")
+
+        self._mcp_config.transport = transport
+        self._mcp_config.unix_socket = unix_socket
+        self._mcp_config.agent_url = agent_url
+        self._mcp_config.agent_name = agent_name or f"{socket.gethostname()}-{os.getpid()}"
+        self._mcp_config.agent_slots = int(agent_slots) or os.cpu_count() or 1
+        self._mcp_config.agent_labels = tuple(agent_labels or ())
+        if transport == "stdio":
+            # stdout is the protocol channel; keep it clean
+            CoreMCPService._log_fd = 2
+
         # Override defaults using configuration optional parameters
         self._show_usage_examples = self._project_data.get("show_usage_examples", self._show_usage_examples)
         self._patch_vscode_config = self._project_data.get("patch_vscode_config", self._patch_vscode_config)
         self._tool_prefix = self._project_data.get("tool_prefix", "")
+        self._tools_list_page_size: int = int(self._project_data.get("tools_list_page_size", 0))
 
         self._mcp_server_name = self._project_data.get("project_name", "MCP service")
         self._mcp_server_version = self._project_data.get("version", "1.0.0")
         self._tools_data: Optional[dict[str, Any]] = self._project_data.get("tools", {})
+        self._project_reload_interval: float = self._project_data.get("project_reload_interval", 0)
+        self._drain_timeout: float = self._project_data.get("drain_timeout", AUTO_FORGE_DRAIN_TIMEOUT)
+
+        # Event loop: implementation used by start(), and the lag probe run by serve()
+        self._event_loop: str = self._project_data.get("event_loop") or "asyncio"
+        if self._event_loop not in AUTO_FORGE_EVENT_LOOPS:
+            raise RuntimeError(f"Unsupported event_loop '{self._event_loop}' "
+                               f"(expected one of {', '.join(AUTO_FORGE_EVENT_LOOPS)})")
+        self._loop_lag_interval: float = self._project_data.get("loop_lag_interval", AUTO_FORGE_LOOP_LAG_INTERVAL)
+        self._loop_lag_warn: float = self._project_data.get("loop_lag_warn", AUTO_FORGE_LOOP_LAG_WARN)
+        self._loop_lag = _CoreMCPLoopLagType()
+        self._last_rpc_method: Optional[str] = None  # Hint for "blocked loop" warnings
 
         # Port and optional host bind address
         self._mcp_server_port = self._project_data.get("mcp_server_port", self._mcp_config.port)
         self._mcp_config.port = self._mcp_server_port
         self._mcp_server_bind_address = self._project_data.get("mcp_server_bind_address")
 
-        self._app = web.Application()
+        # WebSocket per-connection flow control
+        self._ws_max_inflight: int = self._project_data.get("ws_max_inflight", AUTO_FORGE_WS_MAX_INFLIGHT)
+        self._ws_send_queue_size: int = self._project_data.get("ws_send_queue_size", AUTO_FORGE_WS_SEND_QUEUE_SIZE)
+        self._ws_clients: dict[web.WebSocketResponse, asyncio.Queue[str]] = {}  # Connection -> its send queue
+        self._stdio_write: Optional[Callable[[bytes], Any]] = None  # Writes a line to the stdio peer while it runs
+        self._rest_calls: int = 0  # Request ids of REST tool calls ("rest-<n>")
+
+        # SSE subscribers, event ids and the replay ring of recent encoded frames
+        self._sse_clients: set[_CoreMCPSSEClientType] = set()
+        self._sse_unfiltered: set[_CoreMCPSSEClientType] = set()
+        self._sse_index: dict[str, dict[str, set[_CoreMCPSSEClientType]]] = {k: {} for k in AUTO_FORGE_SSE_FILTER_KEYS}
+        self._sse_event_id: int = 0
+        self._sse_replay: deque[tuple[int, bytes, dict[str, Optional[str]]]] = deque()
+        self._sse_replay_bytes: int = 0
+        self._sse_replay_max_events: int = self._project_data.get("sse_replay_max_events",
+                                                                  AUTO_FORGE_SSE_REPLAY_MAX_EVENTS)
+        self._sse_replay_max_bytes: int = self._project_data.get("sse_replay_max_bytes",
+                                                                 AUTO_FORGE_SSE_REPLAY_MAX_BYTES)
+        self._sse_heartbeat_interval: float = self._project_data.get("sse_heartbeat_interval",
+                                                                     AUTO_FORGE_SSE_HEARTBEAT_INTERVAL)
+        self._sse_reap_timeout: float = self._project_data.get("sse_reap_timeout", AUTO_FORGE_SSE_REAP_TIMEOUT)
+        self._sse_reaped: int = 0
+
+        # Admission control: token buckets per client and per tool, then the call scheduler
+        rate_limits = self._project_data.get("rate_limits") or {}
+        self._client_rate_limit: Optional[dict[str, Any]] = rate_limits.get("client")
+        self._tool_rate_limit: Optional[dict[str, Any]] = rate_limits.get("tool")
+        self._client_header: str = rate_limits.get("client_header", AUTO_FORGE_RATE_LIMIT_CLIENT_HEADER)
+        self._client_buckets: OrderedDict[str, _CoreMCPTokenBucketType] = OrderedDict()
+        self._rate_limited: int = 0
+        self._idempotency = _CoreMCPIdempotencyCacheType.from_config(self._project_data.get("idempotency"))
+        self._live_processes: int = 0
+        self._max_concurrent_calls: int = self._project_data.get("max_concurrent_calls", AUTO_FORGE_MAX_CONCURRENT_CALLS)
+        self._scheduler = _CoreMCPSchedulerType(
+            max_running=self._max_concurrent_calls,
+            max_queued=self._project_data.get("max_queued_calls", AUTO_FORGE_MAX_QUEUED_CALLS),
+            max_wait=self._project_data.get("max_queue_wait", AUTO_FORGE_MAX_QUEUE_WAIT),
+            max_processes=self._project_data.get("max_processes", 0),
+            processes=lambda: self._live_processes,
+            aging=self._project_data.get("priority_aging", AUTO_FORGE_PRIORITY_AGING))
+
+        # Remote execution agents (coordinator side): their slots add to the scheduler capacity
+        self._accept_agents: bool = bool(self._project_data.get("accept_agents", False))
+        self._agent_token: Optional[str] = self._project_data.get("agent_token")
+        self._agents: dict[str, _CoreMCPAgentType] = {}
+        self._retiring_daemons: set[asyncio.Task] = set()
+
+        # Durable job history (SQLite); opened by serve() so the writer thread lives with the service
+        try:
+            self._job_store_config = CoreJobStoreConfig.from_config(self._project_data.get("job_store"))
+        except (TypeError, ValueError) as store_error:
+            raise RuntimeError(f"Invalid job_store: {store_error}")
+        self._job_store: Optional[CoreJobStore] = None
+        self._agent_run_id: int = 0
+
+        # Admin diagnostics (profiling, allocation tracing, task list): off unless configured
+        admin = self._project_data.get("admin")
+        self._admin_token: Optional[str] = admin.get("token") if isinstance(admin, dict) else None
+        self._diagnostics: Optional[CoreDiagnostics] = CoreDiagnostics() if admin else None
+
+        # Response compression for non-streaming responses (null disables)
+        self._compression_min_size: Optional[int] = self._project_data.get("compression_min_size",
+                                                                           AUTO_FORGE_COMPRESSION_MIN_SIZE)
+        self._encoders: dict[str, Callable[[bytes], bytes]] = self._available_encoders()
+
+        # The startup probe middleware only exists in measurement mode
+        middlewares = [self._startup_probe_middleware] if startup_t0 is not None else []
+        if self._compression_min_size is not None:
+            middlewares.append(self._compression_middleware)
+        self._app = web.Application(middlewares=middlewares)
 
         # Register all tool routes derived from commands metadata
         self._register_all_commands()
+        self._pipelines: dict[str, _CoreMCPPipelineType] = self._build_pipelines(self._project_data.get("pipelines"))
 
         # Manual endpoints
         self._app.router.add_get("/sse", self._sse_handler)
+        self._app.router.add_get("/ws", self._ws_handler)
+        if self._accept_agents:
+            self._app.router.add_get("/agent", self._agent_handler)
+        if self._diagnostics is not None:
+            self._app.router.add_get("/admin/tasks", self._admin_handler)
+            self._app.router.add_get("/admin/memory", self._admin_handler)
+            self._app.router.add_post("/admin/memory/start", self._admin_handler)
+            self._app.router.add_post("/admin/memory/stop", self._admin_handler)
+            self._app.router.add_post("/admin/profile", self._admin_handler)
         self._app.router.add_post("/message", self._rpc_handler)
         self._app.router.add_get("/status", self._status_handler)
         self._app.router.add_get("/help", self._help_handler)
 
+        # REST endpoints, resolved against the live registry and executed as tools/call
+        self._app.router.add_post("/tool/{name}", self._rest_tool_handler)
+
         # HTTP (streamable) at base URL:
         self._app.router.add_post("/", self._rpc_handler)
 
         # SSE at base URL:
         self._app.router.add_get("/", self._sse_handler)
 
+        # Long-lived SSE and WebSocket handlers do not end on their own
+        self._app.on_shutdown.append(self._close_sse_clients)
+        self._app.on_shutdown.append(self._close_websockets)
+        self._app.on_shutdown.append(self._close_agents)
+
+    def _startup_report(self, what: str, final: bool = False) -> None:
+        """ Log how long after launch a startup milestone was reached (measurement mode only). """
+        if self._startup_t0 is None:
+            return
+        self._log_line(f"Startup: {what} {(time.perf_counter() - self._startup_t0) * 1000:.1f} ms after launch")
+        if final:
+            self._startup_t0 = None
+
+    @web.middleware
+    async def _startup_probe_middleware(self, request: web.Request, handler: Callable) -> web.StreamResponse:
+        """ Report the first accepted HTTP connection, then stay out of the way. """
+        if self._startup_t0 is not None:
+            self._startup_report("first connection accepted", final=True)
+        return await handler(request)
+
     @staticmethod
-    def _log_line(msg: str, level: str = "info", **_ignored) -> None:
+    def _available_encoders() -> dict[str, Callable[[bytes], bytes]]:
+        """ Content codings this process can produce, in server preference order. """
+        encoders: dict[str, Callable[[bytes], bytes]] = {}
+        if zstandard is not None:
+            encoders["zstd"] = zstandard.ZstdCompressor(level=3).compress
+        if brotli is not None:
+            encoders["br"] = lambda data: brotli.compress(data, quality=4)
+        encoders["gzip"] = lambda data: gzip.compress(data, compresslevel=6, mtime=0)
+        encoders["deflate"] = lambda data: zlib.compress(data, 6)
+        return encoders
+
+    def _negotiate_encoding(self, accept_encoding: str) -> Optional[str]:
+        """
+        Pick a content coding from an Accept-Encoding header: the highest q-value the
+        client gives, ties broken by server preference (see `_available_encoders()`).
+        Returns:
+            The coding name, or None to send the body uncompressed.
+        """
+        weights: dict[str, float] = {}
+        for item in accept_encoding.split(","):
+            coding, _, params = item.strip().partition(";")
+            quality = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                with contextlib.suppress(ValueError):
+                    quality = float(params[2:])
+            weights[coding.strip().lower()] = quality
+
+        best: Optional[str] = None
+        for coding in self._encoders:
+            quality = weights.get(coding, weights.get("*", 0.0))
+            if quality > 0 and (best is None or quality > weights.get(best, weights.get("*", 0.0))):
+                best = coding
+        return best
+
+    @web.middleware
+    async def _compression_middleware(self, request: web.Request, handler: Callable) -> web.StreamResponse:
+        """
+        Compress complete responses (JSON-RPC replies, REST tool results, status, help) when the
+        client accepts it and the body is at least `compression_min_size` bytes. Streaming
+        responses (SSE, WebSocket) pass through untouched. Large bodies are compressed in a
+        worker thread so the event loop keeps serving other clients.
+        """
+        response = await handler(request)
+        if not isinstance(response, web.Response) or response.compression or \
+                hdrs.CONTENT_ENCODING in response.headers:
+            return response
+
+        body = response.body
+        if not isinstance(body, (bytes, bytearray)) or len(body) < self._compression_min_size:
+            return response
+
+        response.headers[hdrs.VARY] = "Accept-Encoding"
+        coding = self._negotiate_encoding(request.headers.get(hdrs.ACCEPT_ENCODING, ""))
+        if coding is None:
+            return response
+
+        encoder = self._encoders[coding]
+        if len(body) >= AUTO_FORGE_COMPRESSION_OFFLOAD_SIZE:
+            compressed = await asyncio.get_running_loop().run_in_executor(None, encoder, bytes(body))
+        else:
+            compressed = encoder(bytes(body))
+
+        response.body = compressed
+        response.headers[hdrs.CONTENT_ENCODING] = coding
+        return response
+
+    @classmethod
+    def _log_line(cls, msg: str, level: str = "info", **_ignored) -> None:
         try:
             ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
             line = f"\r{ts} [{level.title():<8}] {msg}\n".encode()
-            os.write(1, line)  # bypasses Python stream redirection
+            os.write(cls._log_fd, line)  # bypasses Python stream redirection
         except Exception as e:
-            os.write(1, f"MCP Service log error: {e!r} | original message: {msg!r}\n".encode())
+            # Logging must never fail a request (e.g. the terminal went away after a hand-off)
+            with contextlib.suppress(OSError):
+                os.write(cls._log_fd, f"MCP Service log error: {e!r} | original message: {msg!r}\n".encode())
+
+    def _admin_refusal(self, request: web.Request) -> Optional[web.Response]:
+        """
+        Admin endpoints need `Authorization: Bearer <admin.token>`; without a configured
+        token they only answer local clients (loopback, or the Unix socket transport).
+        """
+        if self._admin_token:
+            supplied = request.headers.get(hdrs.AUTHORIZATION, "").encode()
+            if not hmac.compare_digest(supplied, f"Bearer {self._admin_token}".encode()):
+                return self._json_response({"error": "admin token required"}, status=401,
+                                           headers={hdrs.WWW_AUTHENTICATE: "Bearer"})
+        elif self._mcp_config.transport != "unix" and request.remote not in ("127.0.0.1", "::1"):
+            return self._json_response({"error": "admin endpoints answer local clients only "
+                                                 "(set admin.token for remote access)"}, status=403)
+        return None
+
+    async def _admin_handler(self, request: web.Request) -> web.Response:
+        """
+        Diagnostics for a slow or growing service (enabled by the project's "admin" entry):
+            GET  /admin/tasks                          running asyncio tasks, oldest first
+            POST /admin/profile?seconds=5&sort=cumulative
+                                                       cProfile of the event loop for the window
+            POST /admin/memory/start?frames=10         start tracemalloc
+            GET  /admin/memory?group_by=lineno         top allocation sites and the diff since the last call
+            POST /admin/memory/stop                    stop tracemalloc
+        All accept `limit` (rows per list).
+        """
+        refused = self._admin_refusal(request)
+        if refused is not None:
+            return refused
+
+        query = request.query
+        try:
+            limit = int(query.get("limit", AUTO_FORGE_DIAGNOSTICS_LIMIT))
+            if request.path == "/admin/tasks":
+                body = self._diagnostics.tasks(limit)
+            elif request.path == "/admin/profile":
+                body = await self._diagnostics.profile(float(query.get("seconds", 5)),
+                                                       query.get("sort", "cumulative"), limit)
+            elif request.path == "/admin/memory/start":
+                body = self._diagnostics.memory_start(int(query.get("frames", AUTO_FORGE_TRACEMALLOC_FRAMES)))
+            elif request.path == "/admin/memory/stop":
+                body = self._diagnostics.memory_stop()
+            else:
+                # Snapshots of a large heap take a while: keep the loop serving meanwhile
+                body = await asyncio.to_thread(self._diagnostics.memory_report, limit,
+                                               query.get("group_by", "lineno"))
+        except ValueError as bad_request:
+            return self._json_response({"error": str(bad_request)}, status=400)
+        except RuntimeError as conflict:
+            return self._json_response({"error": str(conflict)}, status=409)
+        return self._json_response(body, pretty=True)
 
     async def _status_handler(self, _request):
         """Basic runtime status (no secrets)."""
         return self._json_response({
+            "transport": self._mcp_config.transport,
             "host": self._mcp_config.host,
             "port": self._mcp_config.port,
             "readonly": bool(self._mcp_config.readonly),
+            "ws_connections": len(self._ws_clients),
+            "sse_connections": len(self._sse_clients),
+            "sse_filtered_connections": len(self._sse_clients) - len(self._sse_unfiltered),
+            "sse_reaped": self._sse_reaped,
+            "sse_last_event_id": self._sse_event_id,
+            "sse_replay_events": len(self._sse_replay),
+            "sse_replay_bytes": self._sse_replay_bytes,
+            "calls_running": self._scheduler.running,
+            "calls_queued": self._scheduler.queued,
+            "calls_shed": self._scheduler.shed,
+            "calls_rate_limited": self._rate_limited,
+            "calls_by_priority": self._scheduler.stats(),
+            "idempotency": self._idempotency.stats() if self._idempotency is not None else None,
+            "tool_processes": self._live_processes,
+            "asyncio_tasks": len(asyncio.all_tasks()),
+            "draining": self._draining,
+            "event_loop": {"implementation": type(asyncio.get_running_loop()).__module__.split(".")[0],
+                           **self._loop_lag.as_dict()},
+            "job_store": None if self._job_store is None else {
+                "path": str(self._job_store.path),
+                "pending_writes": self._job_store.pending,
+                "written": self._job_store.written,
+                "compacted": self._job_store.compacted,
+                "last_error": self._job_store.last_error,
+            },
+            "agents": [agent.status() for agent in self._agents.values()],
+            "daemons": {tool.name: tool.daemon.status() for tool in self._tools_registry.values()
+                        if tool.daemon is not None},
             "tool_count": sum(
                 1 for k, v in self._tools_data.items() if not v.get("hidden")
             )
-        })
+        }, pretty=True)
 
     async def _help_handler(self, _request: web.Request) -> web.Response:
         """
@@ -203,46 +1544,170 @@ class CoreMCPService:
 
         except json.JSONDecodeError as e:
             self._log_line(f"Invalid JSON in commands metadata: {e}", level="error")
-            return self._json_response({"error": "Internal error: invalid help data"}, status=500)
+            return self._json_response({"error": "Internal error: invalid help data"}, status=500, pretty=True)
 
     async def _broadcast(self, obj: dict[str, Any]) -> None:
         """
-        Broadcast a JSON-serializable object to all connected SSE clients.
+        Broadcast a JSON-serializable object to the SSE clients subscribed to it.
         Args:
             obj (dict[str, Any]): The message payload to send. Must be JSON-serializable.
         Behavior:
-            - Encodes the object as compact JSON (no extra whitespace).
-            - Frames the data per SSE spec: prefix with "data: " and terminate
-              with a double newline.
-            - Attempts to send to all active SSE clients; one failing client will
-              not disrupt others (exceptions are suppressed).
-            - If the client stream supports `.flush()`, it is called after writing.
-            - Sending is asynchronous: writes are awaited (or scheduled with
-              `asyncio.create_task`) so the server does not block.
+            - Encodes the object once as compact JSON (no extra whitespace).
+            - Frames the data per SSE spec with a monotonically increasing `id:` field,
+              so clients can resume with `Last-Event-ID` after a reconnect.
+            - Keeps the encoded frame in the bounded replay ring (see `_sse_remember()`).
+            - Tags the frame with its event type (`event` or `method` field) and the
+              tool/job of the call in progress, then routes it through the subscription
+              index: unfiltered clients plus the clients indexed under one of those
+              values. Clients filtering on something else are never visited.
+            - Queues the frame on every recipient without awaiting its socket; each
+              `_sse_handler()` writes its own queue, so one slow client cannot stall
+              the broadcast for the others.
 
         Notes:
-            - This is a best-effort broadcast; slow or disconnected clients may
-              miss events if they cannot keep up.
-            - Assumes `self._sse_clients` is a set of `aiohttp.web.StreamResponse`
-              instances that have been prepared by `_sse_handler()`.
+            - A client whose queue is full is marked as closing and disconnected;
+              it picks up the missed frames from the replay ring when it reconnects.
         """
-        if not hasattr(self, "_sse_clients"):
-            return
-        frame = (b"data: " + json.dumps(obj, separators=(",", ":")).encode("utf-8") + b"\n\n")
-        for ws in list(self._sse_clients):
-            with contextlib.suppress(Exception):
-                await ws.write(frame)
-                if hasattr(ws, "flush"):
-                    await ws.flush()
+        call = _mcp_call_context.get()
+        meta = {"job": call.job, "tool": call.tool, "event": obj.get("event") or obj.get("method")}
+
+        self._sse_event_id += 1
+        event_id = self._sse_event_id
+        frame = b"id: %d\ndata: %s\n\n" % (event_id, json.dumps(obj, separators=(",", ":")).encode("utf-8"))
+        self._sse_remember(event_id, frame, meta)
+
+        overflowed: list[_CoreMCPSSEClientType] = []
+
+        def _deliver(_client: _CoreMCPSSEClientType) -> None:
+            try:
+                _client.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                _client.closing = True
+                overflowed.append(_client)
+
+        for client in self._sse_unfiltered:
+            _deliver(client)
+        for key in AUTO_FORGE_SSE_FILTER_KEYS:
+            value = meta[key]
+            if value is None:
+                continue
+            for client in self._sse_index[key].get(value, ()):
+                if client.matches(meta):
+                    _deliver(client)
+
+        for client in overflowed:
+            self._sse_unsubscribe(client)
+
+    def _sse_subscribe(self, client: _CoreMCPSSEClientType) -> None:
+        """ Register a client, indexing it under the values of its most selective filter. """
+        self._sse_clients.add(client)
+        for key in AUTO_FORGE_SSE_FILTER_KEYS:
+            if key in client.filters:
+                for value in client.filters[key]:
+                    self._sse_index[key].setdefault(value, set()).add(client)
+                return
+        self._sse_unfiltered.add(client)
+
+    def _sse_unsubscribe(self, client: _CoreMCPSSEClientType) -> None:
+        """ Remove a client from the subscriber set and the routing index. """
+        self._sse_clients.discard(client)
+        self._sse_unfiltered.discard(client)
+        for key in AUTO_FORGE_SSE_FILTER_KEYS:
+            if key in client.filters:
+                index = self._sse_index[key]
+                for value in client.filters[key]:
+                    bucket = index.get(value)
+                    if bucket is not None:
+                        bucket.discard(client)
+                        if not bucket:
+                            del index[value]
+                return
+
+    @staticmethod
+    def _sse_parse_filters(query: Any) -> dict[str, frozenset[str]]:
+        """
+        Read subscription filters from `/sse` query parameters.
+        Each of `job`, `tool` and `event` accepts a comma-separated list and may be
+        repeated, e.g. `/sse?tool=greet_user&event=log,done`. Different keys must all
+        match; values of one key are alternatives.
+        """
+        filters: dict[str, frozenset[str]] = {}
+        for key in AUTO_FORGE_SSE_FILTER_KEYS:
+            values = {v.strip() for raw in query.getall(key, []) for v in raw.split(",") if v.strip()}
+            if values:
+                filters[key] = frozenset(values)
+        return filters
+
+    def _sse_remember(self, event_id: int, frame: bytes, meta: dict[str, Optional[str]]) -> None:
+        """
+        Append an encoded frame (and its routing metadata) to the replay ring, evicting
+        the oldest frames once either `sse_replay_max_events` or `sse_replay_max_bytes`
+        is exceeded.
+        """
+        self._sse_replay.append((event_id, frame, meta))
+        self._sse_replay_bytes += len(frame)
+        while self._sse_replay and (len(self._sse_replay) > self._sse_replay_max_events or
+                                    self._sse_replay_bytes > self._sse_replay_max_bytes):
+            _, evicted, _ = self._sse_replay.popleft()
+            self._sse_replay_bytes -= len(evicted)
+
+    def _sse_replay_since(self, last_event_id: Optional[str], client: _CoreMCPSSEClientType) -> list[bytes]:
+        """
+        Collect the buffered frames a resuming client missed.
+        Args:
+            last_event_id (str, optional): Value of the client's `Last-Event-ID`.
+            client (_CoreMCPSSEClientType): The resuming client; only frames matching
+                its filters are replayed.
+        Returns:
+            list[bytes]: Frames with an id greater than `last_event_id`, preceded by a
+            `replay-gap` event when some of them have already been evicted (or the ids
+            belong to a previous run of the service).
+        """
+        if last_event_id is None:
+            return []
+        try:
+            last = int(last_event_id)
+        except ValueError:
+            return []
+
+        frames = [frame for event_id, frame, meta in self._sse_replay if event_id > last and client.matches(meta)]
+        oldest = self._sse_replay[0][0] if self._sse_replay else self._sse_event_id + 1
+        if last > self._sse_event_id or oldest > last + 1:
+            gap = json.dumps({"requested": last + 1, "oldest": oldest}, separators=(",", ":")).encode("utf-8")
+            frames.insert(0, b"event: replay-gap\ndata: %s\n\n" % gap)
+        return frames
+
+    async def _notify(self, message: dict[str, Any]) -> None:
+        """
+        Send a JSON-RPC notification to every connected MCP client, whatever its transport:
+        SSE subscribers (through `_broadcast()`), open WebSocket connections and the stdio peer.
+        Args:
+            message (dict[str, Any]): The notification (no "id").
+        Notes:
+            - A WebSocket client whose send queue is full misses the notification, as it
+              would a progress note (see `_ws_handler()`).
+        """
+        await self._broadcast(message)
+        frame = json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+        for ws, send_queue in list(self._ws_clients.items()):
+            if not ws.closed:
+                with contextlib.suppress(asyncio.QueueFull):
+                    send_queue.put_nowait(frame)
+        if self._stdio_write is not None:
+            await self._stdio_write(frame.encode("utf-8") + b"\n")
 
     async def _sse_handler(self, request: web.Request) -> web.StreamResponse:
         """
         Handle a Server-Sent Events (SSE) client connection.
         Behavior:
             - Prepares an SSE-compatible HTTP response with required headers.
-            - Adds the connection to `self._sse_clients` for use by `_broadcast()`.
+            - Adds the connection to `self._sse_clients` for use by `_broadcast()`,
+              subscribed to the `job`, `tool` and `event` query filters if given.
             - Sends an initial `: connected` comment to confirm the stream is active.
-            - Periodically sends a `heartbeat` event every 15 seconds until shutdown.
+            - Honours `Last-Event-ID` (header, or `lastEventId` query parameter for
+              clients that cannot set headers) by replaying missed frames first.
+            - Writes queued frames as they arrive until shutdown. The handler owns no
+              timer: heartbeats are queued by the shared `_sse_heartbeat_loop()`.
             - Suppresses all exceptions from the write loop to avoid noisy disconnect errors.
             - Removes the connection from the active client set on exit.
         Args:
@@ -262,26 +1727,439 @@ class CoreMCPService:
         )
         await resp.prepare(request)
 
-        if not hasattr(self, "_sse_clients"):
-            self._sse_clients = set()
-        self._sse_clients.add(resp)
+        # Snapshot the replay and register in one step (no await in between), so no
+        # frame broadcast meanwhile is either lost or delivered twice.
+        client = _CoreMCPSSEClientType(resp=resp, transport=request.transport,
+                                       filters=self._sse_parse_filters(request.query),
+                                       last_activity=asyncio.get_running_loop().time())
+        replay = self._sse_replay_since(request.headers.get("Last-Event-ID") or request.query.get("lastEventId"),
+                                        client)
+        self._sse_subscribe(client)
 
         with contextlib.suppress(Exception):
-            # Send initial connection comment
-            await resp.write(b": connected\n\n")
+            # Send initial connection comment, followed by anything the client missed
+            await resp.write(b": connected\n\n" + b"".join(replay))
             if hasattr(resp, "flush"):
                 await resp.flush()
 
-            # Periodic heartbeat
-            while not self._shutdown_event.is_set():
-                await asyncio.sleep(15)
-                await resp.write(b"event: heartbeat\ndata: {}\n\n")
+            loop = asyncio.get_running_loop()
+            while not self._shutdown_event.is_set() and not client.closing:
+                frame = await client.queue.get()
+                if frame is None:
+                    break
+                await resp.write(frame)
                 if hasattr(resp, "flush"):
                     await resp.flush()
+                client.last_activity = loop.time()
 
-        self._sse_clients.discard(resp)
+        self._sse_unsubscribe(client)
         return resp
 
+    async def _close_sse_clients(self, _app: web.Application) -> None:
+        """
+        aiohttp on_shutdown hook: wake every SSE handler so it returns. Clients first get a
+        "shutdown" event whose `retry` field makes EventSource reconnect (to the restarted
+        or successor service) after AUTO_FORGE_DRAIN_RETRY_AFTER, resuming via Last-Event-ID.
+        """
+        for client in list(self._sse_clients):
+            try:
+                client.queue.put_nowait(AUTO_FORGE_SSE_SHUTDOWN_FRAME)
+                client.queue.put_nowait(None)
+            except asyncio.QueueFull:
+                client.closing = True
+
+    async def _sse_heartbeat_loop(self) -> None:
+        """
+        Single service-wide timer replacing per-connection heartbeat sleeps.
+        Every `sse_heartbeat_interval` seconds it walks the subscribers once and:
+            - Reaps clients whose socket is already closed, and clients whose queued
+              frames have not drained for `sse_reap_timeout` seconds (stalled readers).
+            - Queues the pre-encoded heartbeat frame for clients with nothing written
+              during the last half interval; busy connections are skipped.
+        """
+        interval = max(0.1, float(self._sse_heartbeat_interval))
+        loop = asyncio.get_running_loop()
+
+        while not self._shutdown_event.is_set():
+            await asyncio.sleep(interval)
+            now = loop.time()
+
+            for client in list(self._sse_clients):
+                idle_for = now - client.last_activity
+                gone = client.transport is None or client.transport.is_closing()
+                stalled = not client.queue.empty() and idle_for >= self._sse_reap_timeout
+                if gone or stalled:
+                    self._sse_reap(client)
+                elif idle_for >= interval / 2 and client.queue.empty():
+                    client.queue.put_nowait(AUTO_FORGE_SSE_HEARTBEAT_FRAME)
+
+    def _sse_reap(self, client: _CoreMCPSSEClientType) -> None:
+        """ Drop a dead or stalled SSE client and abort its socket so its handler returns. """
+        client.closing = True
+        self._sse_unsubscribe(client)
+        self._sse_reaped += 1
+        if client.transport is not None:
+            client.transport.close()
+        with contextlib.suppress(asyncio.QueueFull):
+            client.queue.put_nowait(None)
+
+    async def _ws_handler(self, request: web.Request) -> web.WebSocketResponse:
+        """
+        Handle a WebSocket client connection carrying JSON-RPC in both directions.
+        Behavior:
+            - Each text frame is one JSON-RPC message or batch; each is dispatched in its
+              own task so many calls can be in flight at once, multiplexed by their ids.
+            - Responses are sent as soon as their call finishes, in completion order.
+            - Log lines produced by a call on this connection are pushed back as
+              `notifications/progress` (when the request carries `_meta.progressToken`)
+              or `notifications/message` tagged with the originating request id.
+        Flow control:
+            - At most `ws_max_inflight` calls run per connection; beyond that the read
+              loop stops pulling frames, letting TCP back-pressure the client.
+            - Outgoing frames go through a bounded queue drained by a single writer.
+              Responses always wait for space; notifications are dropped (and counted)
+              when the client does not keep up.
+            - When the client closes the connection, its calls still running are cancelled.
+        Args:
+            request (web.Request): The aiohttp request object.
+        Returns:
+            web.WebSocketResponse: The connection, once closed.
+        """
+        ws = web.WebSocketResponse(heartbeat=30, max_msg_size=AUTO_FORGE_MAX_MESSAGE_SIZE)
+        await ws.prepare(request)
+        client_id = self._client_id(request)
+
+        inflight = asyncio.Semaphore(max(1, int(self._ws_max_inflight)))
+        send_queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max(1, int(self._ws_send_queue_size)))
+        self._ws_clients[ws] = send_queue
+        pending: set[asyncio.Task] = set()
+        dropped = 0
+
+        async def _writer() -> None:
+            while True:
+                frame = await send_queue.get()
+                if ws.closed:
+                    continue  # Discard, so a call waiting for queue space is not blocked forever
+                with contextlib.suppress(ConnectionError, RuntimeError):
+                    await ws.send_str(frame)
+
+        def _make_sink(_msg: Any) -> Optional[Callable[[dict[str, Any]], None]]:
+            if not isinstance(_msg, dict) or _msg.get("id") is None:
+                return None
+            _meta = (_msg.get("params") or {}).get("_meta") if isinstance(_msg.get("params"), dict) else None
+            progress_token = _meta.get("progressToken") if isinstance(_meta, dict) else None
+            progress = 0
+
+            def _sink(event: dict[str, Any]) -> None:
+                nonlocal dropped, progress
+                if event.get("event") != "log":
+                    return
+                progress += 1
+                if progress_token is not None:
+                    note = {"jsonrpc": "2.0", "method": "notifications/progress",
+                            "params": {"progressToken": progress_token, "progress": progress,
+                                       "message": event.get("data")}}
+                else:
+                    note = {"jsonrpc": "2.0", "method": "notifications/message",
+                            "params": {"level": "info", "requestId": _msg["id"], "data": event.get("data")}}
+                try:
+                    send_queue.put_nowait(json.dumps(note, separators=(",", ":"), ensure_ascii=False))
+                except asyncio.QueueFull:
+                    dropped += 1
+
+            return _sink
+
+        async def _serve_frame(_data: str) -> None:
+            try:
+                try:
+                    payload: Any = json.loads(_data)
+                except Exception as parse_error:
+                    reply: Any = self._jr_err(jid=None, code=-32700, message="Parse error", data=str(parse_error))
+                else:
+                    _mcp_event_sink.set(_make_sink(payload))
+                    reply = await self._dispatch_rpc_payload(payload, client_id=client_id)
+
+                if reply is not None and not ws.closed:
+                    await send_queue.put(json.dumps(reply, separators=(",", ":"), ensure_ascii=False))
+            finally:
+                inflight.release()
+
+        writer = asyncio.create_task(_writer())
+        try:
+            async for frame in ws:
+                if frame.type != web.WSMsgType.TEXT:
+                    continue
+                await inflight.acquire()
+                task = asyncio.create_task(_serve_frame(frame.data))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        finally:
+            # The connection is gone and replies cannot be delivered: cancel the calls still
+            # running (killing their processes) rather than wait for them
+            for task in list(pending):
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            writer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await writer
+            self._ws_clients.pop(ws, None)
+            if dropped:
+                self._log_line(f"WebSocket client dropped {dropped} notifications (slow consumer)", level="warning")
+
+        return ws
+
+    async def _close_websockets(self, _app: web.Application) -> None:
+        """ aiohttp on_shutdown hook: close open WebSocket connections so their handlers return. """
+        # 1012 (Service Restart) tells clients to reconnect; 1001 (Going Away) that the service is gone
+        code, message = (1012, b"Server restart") if self._handed_off else (1001, b"Server shutdown")
+        for ws in list(self._ws_clients):
+            with contextlib.suppress(Exception):
+                await ws.close(code=code, message=message)
+
+    async def _agent_handler(self, request: web.Request) -> web.WebSocketResponse:
+        """
+        Coordinator side of a remote execution agent (/agent, enabled by `accept_agents`).
+        Protocol (JSON text frames):
+          agent -> here: {"type": "hello", "name", "slots", "labels", "tools", "token"} first,
+                         then {"type": "event", "id", "event"} while a run streams output and
+                         {"type": "result", "id", "result"} / {"type": "error", "id", "error"}.
+          here -> agent: {"type": "run", "id", "name", "arguments"} and {"type": "cancel", "id"}.
+        Runs still pending when the agent disconnects fail with an error.
+        Like the admin endpoints, agents must present `agent_token` when one is configured,
+        otherwise only local peers (loopback, or the Unix socket transport) may join.
+        """
+        if not self._agent_token and self._mcp_config.transport != "unix" \
+                and request.remote not in ("127.0.0.1", "::1"):
+            self._log_line(f"Agent from {request.remote} rejected: agent_token is required for remote agents",
+                           level="warning")
+            return self._json_response({"error": "agents may join from local peers only "
+                                                 "(set agent_token for remote agents)"}, status=403)
+
+        ws = web.WebSocketResponse(heartbeat=30, max_msg_size=AUTO_FORGE_MAX_MESSAGE_SIZE)
+        await ws.prepare(request)
+
+        try:
+            hello = await ws.receive_json(timeout=AUTO_FORGE_AGENT_HELLO_TIMEOUT)
+        except (asyncio.TimeoutError, TypeError, ValueError):
+            await ws.close(message=b"expected hello")
+            return ws
+
+        name = str(hello.get("name") or "") if isinstance(hello, dict) else ""
+        if not name or hello.get("type") != "hello":
+            await ws.close(message=b"expected hello")
+            return ws
+        if self._agent_token and not hmac.compare_digest(str(hello.get("token") or "").encode(),
+                                                         str(self._agent_token).encode()):
+            self._log_line(f"Agent '{name}' rejected: bad token", level="warning")
+            await ws.close(message=b"bad token")
+            return ws
+        if name in self._agents:
+            await ws.close(message=b"duplicate agent name")
+            return ws
+
+        slots, labels, tools = hello.get("slots") or 1, hello.get("labels") or [], hello.get("tools") or []
+        if not isinstance(slots, int) or isinstance(slots, bool) or slots < 1 or \
+                not all(isinstance(v, list) and all(isinstance(item, str) for item in v) for v in (labels, tools)):
+            self._log_line(f"Agent '{name}' rejected: malformed hello", level="warning")
+            await ws.close(message=b"malformed hello")
+            return ws
+        if slots > AUTO_FORGE_AGENT_MAX_SLOTS:
+            self._log_line(f"Agent '{name}' announced {slots} slots, capped at {AUTO_FORGE_AGENT_MAX_SLOTS}",
+                           level="warning")
+            slots = AUTO_FORGE_AGENT_MAX_SLOTS
+
+        agent = _CoreMCPAgentType(name=name, ws=ws, slots=slots, labels=frozenset(labels) | {name},
+                                  tools=frozenset(tools))
+        self._agents[name] = agent
+        self._update_capacity()
+        self._log_line(f"Agent '{name}' joined with {agent.slots} slots, labels {sorted(agent.labels)}")
+
+        try:
+            async for frame in ws:
+                if frame.type != web.WSMsgType.TEXT:
+                    continue
+                with contextlib.suppress(ValueError, TypeError, KeyError, AttributeError):
+                    message = json.loads(frame.data)
+                    run = agent.runs.get(message.get("id"))
+                    if run is None:
+                        continue
+                    if message["type"] == "event":
+                        token = _mcp_call_context.set(run.context)
+                        try:
+                            await self._broadcast(message["event"])
+                        finally:
+                            _mcp_call_context.reset(token)
+                        if run.sink is not None:
+                            run.sink(message["event"])
+                    elif message["type"] == "result" and not run.future.done():
+                        if isinstance(message["result"], dict):
+                            run.future.set_result(message["result"])
+                        else:
+                            run.future.set_exception(RuntimeError(f"agent '{name}': malformed result"))
+                    elif message["type"] == "error" and not run.future.done():
+                        run.future.set_exception(RuntimeError(f"agent '{name}': {message['error']}"))
+        finally:
+            self._agents.pop(name, None)
+            self._update_capacity()
+            for run in agent.runs.values():
+                if not run.future.done():
+                    run.future.set_exception(RuntimeError(f"agent '{name}' disconnected"))
+            self._log_line(f"Agent '{name}' left", level="warning")
+        return ws
+
+    async def _close_agents(self, _app: web.Application) -> None:
+        """ Disconnect agents on shutdown. """
+        for agent in list(self._agents.values()):
+            with contextlib.suppress(Exception):
+                await agent.ws.close(code=1001, message=b"server shutdown")
+
+    def _update_capacity(self) -> None:
+        """ Scheduler capacity: local concurrency plus the slots of every connected agent. """
+        self._scheduler.set_capacity(self._max_concurrent_calls + sum(a.slots for a in self._agents.values()))
+
+    def _pick_agent(self, tool: _CoreMCPToolType) -> Optional[_CoreMCPAgentType]:
+        """
+        Place a call: the connected agent with the most free slots that has the tool and
+        matches its affinity (if any), or None to run locally (no agent available, all busy,
+        or affinity "local").
+        """
+        if not self._agents or "local" in tool.affinity:
+            return None
+        candidates = [agent for agent in self._agents.values()
+                      if agent.free > 0 and tool.name in agent.tools
+                      and (not tool.affinity or tool.affinity & agent.labels)]
+        return max(candidates, key=lambda a: (a.free, -a.inflight), default=None)
+
+    async def _run_on_agent(self, agent: _CoreMCPAgentType, tool: _CoreMCPToolType,
+                            arguments: dict[str, Any]) -> dict[str, Any]:
+        """
+        Execute a tool call on a remote agent. Its output events are re-broadcast here (and
+        passed to the caller's sink) as they arrive; the result is tagged with the agent name.
+        """
+        self._agent_run_id += 1
+        run_id = self._agent_run_id
+        run = _CoreMCPAgentRunType(future=asyncio.get_running_loop().create_future(),
+                                   context=_mcp_call_context.get(), sink=_mcp_event_sink.get())
+        agent.runs[run_id] = run
+        agent.inflight += 1
+        try:
+            await agent.ws.send_str(json.dumps({"type": "run", "id": run_id, "name": tool.name,
+                                                "arguments": arguments}, separators=(",", ":")))
+            result = await run.future
+        except asyncio.CancelledError:
+            with contextlib.suppress(Exception):
+                await agent.ws.send_str(json.dumps({"type": "cancel", "id": run_id}))
+            raise
+        finally:
+            agent.runs.pop(run_id, None)
+            agent.inflight -= 1
+            agent.completed += 1
+
+        result["agent"] = agent.name
+        with contextlib.suppress(Exception):
+            await self._broadcast({"event": "done", **result})
+        return result
+
+    async def _run_agent(self) -> None:
+        """
+        Agent transport: connect to the coordinator, announce this host's tools and slots,
+        and execute the calls it places here until `stop()`. Reconnects with back-off.
+        """
+        import aiohttp  # Client side is only needed in agent mode
+
+        url = self._mcp_config.agent_url
+        backoff = 1.0
+        async with aiohttp.ClientSession() as session:
+            while not self._shutdown_event.is_set():
+                try:
+                    async with session.ws_connect(url, heartbeat=30, max_msg_size=AUTO_FORGE_MAX_MESSAGE_SIZE) as ws:
+                        await ws.send_str(json.dumps({
+                            "type": "hello",
+                            "name": self._mcp_config.agent_name,
+                            "slots": self._mcp_config.agent_slots,
+                            "labels": list(self._mcp_config.agent_labels),
+                            "tools": list(self._tools_registry),
+                            "token": self._agent_token,
+                        }))
+                        self._log_line(f"Agent connected to {url}")
+                        backoff = 1.0
+                        await self._agent_session(ws)
+                        if ws.close_code is not None and ws.close_code != 1000:
+                            self._log_line(f"Coordinator closed the connection: {ws.close_code}", level="warning")
+                except (aiohttp.ClientError, OSError) as connect_error:
+                    self._log_line(f"Agent cannot reach {url}: {connect_error}", level="warning")
+
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._shutdown_event.wait(), timeout=backoff)
+                backoff = min(backoff * 2, AUTO_FORGE_AGENT_RECONNECT_MAX)
+
+    async def _agent_session(self, ws: Any) -> None:
+        """ Serve one coordinator connection: run placed calls concurrently, stream their events back. """
+        outbox: asyncio.Queue[str] = asyncio.Queue()
+        slots = asyncio.Semaphore(self._mcp_config.agent_slots)
+        runs: dict[Any, asyncio.Task] = {}
+
+        async def _writer() -> None:
+            while True:
+                frame = await outbox.get()
+                await ws.send_str(frame)
+
+        def _send(_message: dict[str, Any]) -> None:
+            outbox.put_nowait(json.dumps(_message, separators=(",", ":"), ensure_ascii=False))
+
+        async def _execute(_id: Any, _name: str, _arguments: dict[str, Any]) -> None:
+            try:
+                async with slots:
+                    _mcp_event_sink.set(lambda event: _send({"type": "event", "id": _id, "event": event}))
+                    result = await self._rpc_tools_call({"name": _name, "arguments": _arguments})
+                _send({"type": "result", "id": _id, "result": result})
+            except asyncio.CancelledError:
+                _send({"type": "error", "id": _id, "error": "cancelled"})
+            except Exception as run_error:
+                _send({"type": "error", "id": _id, "error": str(run_error)})
+            finally:
+                runs.pop(_id, None)
+
+        writer = asyncio.create_task(_writer())
+        shutdown = asyncio.create_task(self._shutdown_event.wait())
+        try:
+            while True:
+                receive = asyncio.create_task(ws.receive())
+                await asyncio.wait({receive, shutdown}, return_when=asyncio.FIRST_COMPLETED)
+                if not receive.done():
+                    receive.cancel()
+                    await ws.close()
+                    return
+                frame = receive.result()
+                if frame.type != web.WSMsgType.TEXT:
+                    return  # Closed, closing or error
+                with contextlib.suppress(ValueError, TypeError, KeyError, AttributeError):
+                    message = json.loads(frame.data)
+                    if message["type"] == "run":
+                        runs[message["id"]] = asyncio.create_task(
+                            _execute(message["id"], message["name"], message.get("arguments") or {}))
+                    elif message["type"] == "cancel" and message["id"] in runs:
+                        runs[message["id"]].cancel()
+        finally:
+            shutdown.cancel()
+            for task in list(runs.values()):
+                task.cancel()
+            writer.cancel()
+
+    @staticmethod
+    def _jr_ok(jid: Any, result: Any) -> dict[str, Any]:
+        """ Build a JSON-RPC 2.0 success envelope. """
+        return {"jsonrpc": "2.0", "id": jid, "result": result}
+
+    @staticmethod
+    def _jr_err(jid: Any, code: int, message: str, data: Any = None) -> dict[str, Any]:
+        """ Build a JSON-RPC 2.0 error envelope. """
+        err: dict[str, Any] = {"code": code, "message": message}
+        if data is not None:
+            err["data"] = data
+        return {"jsonrpc": "2.0", "id": jid, "error": err}
+
     async def _rpc_handler(self, request: web.Request) -> web.Response:
         """
         JSON-RPC endpoint for MCP over HTTP POST.
@@ -294,36 +2172,119 @@ class CoreMCPService:
           - Never lets exceptions bubble to aiohttp (prevents HTTP 500).
         """
 
-        # Helper builders (avoid repeating structure everywhere)
-        def _jr_ok(_jid: Any, _result: Any) -> dict[str, Any]:
-            return {"jsonrpc": "2.0", "id": _jid, "result": _result}
-
-        def _jr_err(_jid: Any, _code: int, _message: str, _data: Any = None) -> dict[str, Any]:
-            err: dict[str, Any] = {"code": _code, "message": _message}
-            if _data is not None:
-                err["data"] = _data
-            return {"jsonrpc": "2.0", "id": _jid, "error": err}
-
         with contextlib.suppress(Exception):
             self._log_line(msg="POST /message", level="debug")
 
         # Method gate first (cheap)
         if request.method != "POST":
-            error_body = _jr_err(_jid=None, _code=-32600, _message="method not allowed")
-            return web.json_response(error_body)
+            error_body = self._jr_err(jid=None, code=-32600, message="method not allowed")
+            return self._json_response(error_body)
 
         # Read body defensively
         raw = await request.read()
         if not raw:
-            error_body = _jr_err(_jid=None, _code=-32600, _message="Empty request")
-            return web.json_response(error_body)
+            error_body = self._jr_err(jid=None, code=-32600, message="Empty request")
+            return self._json_response(error_body)
 
         try:
             payload: Any = json.loads(raw.decode("utf-8"))
         except Exception as e:
-            error_body = _jr_err(_jid=None, _code=-32700, _message="Parse error", _data=str(e))
-            return web.json_response(error_body)
+            error_body = self._jr_err(jid=None, code=-32700, message="Parse error", data=str(e))
+            return self._json_response(error_body)
+
+        reply = await self._dispatch_rpc_payload(payload, client_id=self._client_id(request),
+                                                 idempotency_key=request.headers.get(AUTO_FORGE_IDEMPOTENCY_HEADER))
+
+        # Refused calls stay HTTP 200 (JSON-RPC envelope), with the hint mirrored for HTTP-aware clients
+        headers = None
+        retry_after = (reply.get("error") or {}).get("data") if isinstance(reply, dict) else None
+        if isinstance(retry_after, dict) and "retryAfter" in retry_after:
+            headers = {"Retry-After": str(math.ceil(retry_after["retryAfter"]))}
+
+        # All notifications: return {} (VS Code compat)
+        response = self._json_response(reply if reply is not None else {}, headers=headers)
+        if self._draining:
+            response.force_close()  # Keep-alive clients reconnect, to the successor after a hand-off
+        return response
+
+    def _client_id(self, request: web.Request) -> str:
+        """ Rate limiting identity of an HTTP / WebSocket client: the configured header, else the peer address. """
+        if self._client_header:
+            header_id = request.headers.get(self._client_header)
+            if header_id:
+                return f"id:{header_id}"
+        return f"addr:{request.remote or self._mcp_config.transport}"
+
+    def _rate_limit(self, msg: dict[str, Any], client_id: str) -> Optional[_CoreMCPAdmissionError]:
+        """
+        Apply the per-client and per-tool token buckets to a `tools/call` message.
+        A `tools/pipeline` message is one client call and one call of each tool it uses.
+        All buckets are checked before any is charged, so a call refused by one
+        does not use up the budget of the others.
+        Args:
+            msg (dict[str, Any]): The JSON-RPC message.
+            client_id (str): Caller identity (see `_client_id()`).
+        Returns:
+            None when the call may proceed, else the error to return.
+        """
+        if msg.get("method") not in ("tools/call", "tools/pipeline"):
+            return None
+
+        buckets: list[tuple[str, _CoreMCPTokenBucketType]] = []
+        if self._client_rate_limit is not None:
+            bucket = self._client_buckets.get(client_id)
+            if bucket is None:
+                bucket = _CoreMCPTokenBucketType.from_config(self._client_rate_limit)
+                if bucket is not None:
+                    self._client_buckets[client_id] = bucket
+                    if len(self._client_buckets) > AUTO_FORGE_RATE_LIMIT_MAX_CLIENTS:
+                        self._client_buckets.popitem(last=False)
+            else:
+                self._client_buckets.move_to_end(client_id)
+            if bucket is not None:
+                buckets.append(("client", bucket))
 
+        params = msg.get("params")
+        if msg["method"] == "tools/call":
+            tool_names = [params.get("name")] if isinstance(params, dict) else []
+        else:
+            try:
+                pipeline, _ = self._pipeline_request(params)
+                tool_names = list(dict.fromkeys(step.tool for step in pipeline.steps))
+            except ValueError:
+                tool_names = []  # Rejected by the handler
+        for tool_name in tool_names:
+            tool = self._tools_registry.get(tool_name)
+            if tool is not None and tool.rate_limit is not None:
+                buckets.append((f"tool '{tool.name}'", tool.rate_limit))
+
+        now = time.monotonic()
+        for scope, bucket in buckets:
+            wait = bucket.retry_in(now)
+            if wait > 0:
+                self._rate_limited += 1
+                return _CoreMCPAdmissionError(AUTO_FORGE_RATE_LIMITED_CODE, f"Rate limited: {scope} call rate exceeded",
+                                              round(wait, 3))
+        for _, bucket in buckets:
+            bucket.take()
+        return None
+
+    async def _dispatch_rpc_payload(self, payload: Any, client_id: str = "local",
+                                    idempotency_key: Optional[str] = None) \
+            -> Optional[Union[dict[str, Any], list[dict[str, Any]]]]:
+        """
+        Transport-independent JSON-RPC dispatch shared by HTTP, Unix socket and stdio.
+        Idempotent retries are answered first, then rate limits are applied, per message,
+        before anything is executed.
+        Args:
+            payload (Any): Decoded JSON body, either a single message or a batch.
+            client_id (str): Caller identity the per-client rate limit and idempotency keys are scoped to.
+            idempotency_key (str, optional): Key from the transport (HTTP header) for a single
+                message that does not carry `_meta.idempotencyKey` itself.
+        Returns:
+            The reply envelope (dict), a list of envelopes for batches, or None when
+            every message was a notification and nothing should be sent back.
+        """
         with contextlib.suppress(Exception):
             self._log_line(msg="RPC handler got payload", level="debug")
 
@@ -331,255 +2292,444 @@ class CoreMCPService:
                 pretty = json.dumps(payload, indent=2, sort_keys=True, ensure_ascii=False)
                 self._log_line(msg=f"Request:\n{pretty}", level="debug")
 
-        async def _handle_one(msg: dict[str, Any]) -> Optional[dict[str, Any]]:
-            """
-            Handle a single JSON-RPC message. Returns a response dict,
-            or None if input was a notification (no 'id').
-            """
-            jid = msg.get("id", None)
-            is_notification = jid is None
-            method = msg.get("method")
-            params = msg.get("params") or {}
+        async def _admit_and_handle(_msg: dict[str, Any]) -> Optional[dict[str, Any]]:
+            key = self._idempotency_key(_msg, client_id, idempotency_key if not isinstance(payload, list) else None)
+            if key is not None:
+                return await self._handle_idempotent(key, _msg, _admit_and_run)
+            return await _admit_and_run(_msg)
+
+        async def _admit_and_run(_msg: dict[str, Any]) -> Optional[dict[str, Any]]:
+            refused = self._drain_refusal(_msg) or self._rate_limit(_msg, client_id)
+            if refused is None:
+                if _msg.get("method") not in AUTO_FORGE_IDEMPOTENT_METHODS:
+                    return await self._handle_rpc_message(_msg)
+                with self._call_in_flight():
+                    return await self._handle_rpc_message(_msg)
+            if _msg.get("id") is None:
+                return None  # Refused notification: nothing to reply to
+            return self._jr_err(_msg["id"], refused.code, refused.message, {"retryAfter": refused.retry_after})
 
-            with contextlib.suppress(Exception):
-                self._log_line(msg=f"Incoming method: {method}, id: {jid}", level="debug")
+        # Single vs batch
+        try:
+            if isinstance(payload, list):
+                # Empty batch is invalid
+                if len(payload) == 0:
+                    return self._jr_err(jid=None, code=-32600, message="invalid request (empty batch)")
 
-            # Inline helpers return proper envelopes only when id is present
-            if is_notification:
-                def ok(_: Any) -> None:  # type: ignore[override]
-                    return None
+                if len(payload) > AUTO_FORGE_MAX_BATCH_MCP_COMMANDS:
+                    return self._jr_err(jid=None, code=-32600, message="batch too large")
 
-                def make_error(_: int, __: str) -> None:  # type: ignore[override]
-                    return None
+                replies: list[dict[str, Any]] = []
+                for item in payload:
+                    resp = await _admit_and_handle(item if isinstance(item, dict) else {})
+                    if resp is not None:
+                        replies.append(resp)
+
+                return replies or None
+
+            # Single message
+            if not isinstance(payload, dict):
+                return self._jr_err(jid=None, code=-32600, message="Invalid request")
+
+            return await _admit_and_handle(payload)
+
+        except Exception as e:
+            with contextlib.suppress(Exception):
+                self._log_line(f"RPC dispatch crash (outer): {e!r}", level="error")
+            return self._jr_err(jid=None, code=-32603, message="Internal error")
+
+    def _drain_refusal(self, msg: dict[str, Any]) -> Optional[_CoreMCPAdmissionError]:
+        """ While draining, new tool calls are refused with a retry hint (for the successor). """
+        if not self._draining or msg.get("method") not in AUTO_FORGE_IDEMPOTENT_METHODS:
+            return None
+        return _CoreMCPAdmissionError(AUTO_FORGE_OVERLOADED_CODE, "Service is shutting down",
+                                      AUTO_FORGE_DRAIN_RETRY_AFTER)
+
+    @contextlib.contextmanager
+    def _call_in_flight(self):
+        """ Count the current task as running a tool call, so drain() waits for it. """
+        task = asyncio.current_task()
+        self._calls_in_flight.add(task)
+        self._calls_idle.clear()
+        try:
+            yield
+        finally:
+            self._calls_in_flight.discard(task)
+            if not self._calls_in_flight:
+                self._calls_idle.set()
+
+    def _idempotency_key(self, msg: dict[str, Any], client_id: str,
+                         transport_key: Optional[str]) -> Optional[tuple[str, str]]:
+        """ The (client, key) a call is deduplicated on, or None if it is not an idempotent request. """
+        if self._idempotency is None or msg.get("id") is None or msg.get("method") not in AUTO_FORGE_IDEMPOTENT_METHODS:
+            return None
+        params = msg.get("params")
+        meta = params.get("_meta") if isinstance(params, dict) and isinstance(params.get("_meta"), dict) else {}
+        key = meta.get("idempotencyKey") or transport_key
+        return (client_id, str(key)) if key else None
+
+    async def _handle_idempotent(self, key: tuple[str, str], msg: dict[str, Any],
+                                 run: Callable[[dict[str, Any]], Any]) -> Optional[dict[str, Any]]:
+        """
+        Answer a call carrying an idempotency key: replay the reply of the completed call,
+        attach to the one still running, or run it. The call runs in its own task, so a
+        client that gives up and retries finds it still running rather than cancelled.
+        """
+        params = msg.get("params") if isinstance(msg.get("params"), dict) else {}
+        fingerprint = json.dumps([msg.get("method"), {k: v for k, v in params.items() if k != "_meta"}],
+                                 sort_keys=True, separators=(",", ":"), default=str)
+
+        entry = self._idempotency.get(key)
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                self._idempotency.conflicts += 1
+                return self._jr_err(msg["id"], -32602, "Idempotency key was already used for a different request")
+            if entry.task.done():
+                self._idempotency.hits += 1
             else:
-                def ok(_result: Any) -> dict[str, Any]:
-                    return _jr_ok(jid, _result)
+                self._idempotency.attached += 1
+        else:
+            self._idempotency.misses += 1
+            entry = _CoreMCPIdempotentCallType(fingerprint=fingerprint, task=asyncio.create_task(run(msg)))
+            self._idempotency.put(key, entry)
 
-                def make_error(_code: int, _message: str) -> dict[str, Any]:
-                    return _jr_err(jid, _code, _message)
+            def _settle(_task: asyncio.Task, _entry: _CoreMCPIdempotentCallType = entry) -> None:
+                reply = None if _task.cancelled() or _task.exception() is not None else _task.result()
+                # Replies refused before execution are not remembered: the retry should be admitted
+                refused = isinstance(reply, dict) and reply.get("error", {}).get("code") in (
+                    AUTO_FORGE_BUSY_CODE, AUTO_FORGE_RATE_LIMITED_CODE, AUTO_FORGE_OVERLOADED_CODE)
+                self._idempotency.settle(key, _entry, keep=reply is not None and not refused)
 
-            if not isinstance(msg, dict) or not isinstance(method, str):
-                return make_error(-32600, "invalid request")
-            if not isinstance(params, dict):
-                return make_error(-32602, "invalid params")
+            entry.task.add_done_callback(_settle)
+
+        reply = await asyncio.shield(entry.task)
+        if isinstance(reply, dict) and reply.get("id") != msg["id"]:
+            reply = {**reply, "id": msg["id"]}  # Replayed to a retry with its own request id
+        return reply
+
+    async def _handle_rpc_message(self, msg: dict[str, Any]) -> Optional[dict[str, Any]]:
+        """
+        Handle a single JSON-RPC message. Returns a response dict,
+        or None if input was a notification (no 'id').
+        """
+        jid = msg.get("id", None)
+        is_notification = jid is None
+        method = msg.get("method")
+        params = msg.get("params") or {}
+
+        with contextlib.suppress(Exception):
+            self._log_line(msg=f"Incoming method: {method}, id: {jid}", level="debug")
+            self._last_rpc_method = method
+
+        # Inline helpers return proper envelopes only when id is present
+        if is_notification:
+            def ok(_: Any) -> None:  # type: ignore[override]
+                return None
+
+            def make_error(_: int, __: str, ___: Any = None) -> None:  # type: ignore[override]
+                return None
+        else:
+            def ok(_result: Any) -> dict[str, Any]:
+                return self._jr_ok(jid, _result)
+
+            def make_error(_code: int, _message: str, _data: Any = None) -> dict[str, Any]:
+                return self._jr_err(jid, _code, _message, _data)
+
+        if not isinstance(msg, dict) or not isinstance(method, str):
+            return make_error(-32600, "invalid request")
+        if not isinstance(params, dict):
+            return make_error(-32602, "invalid params")
+
+        # -----------------------------------------------------------------
+        #
+        # Handle common MCP service methods
+        #
+        # -----------------------------------------------------------------
+
+        try:
+            if method == "initialize":
+                client_proto = params.get("protocolVersion", "2025-06-18")
+                info = {
+                    "protocolVersion": client_proto,
+                    "serverInfo": {
+                        "name": str(self._mcp_server_name),
+                        "version": str(self._mcp_server_version),
+                    },
+                    "capabilities": {
+                        "tools": {"listChanged": self._project_reload_interval > 0},
+                        "resources": {},
+                        "templates": {},
+                        "prompts": {}
+                    },
+                }
+                self._log_line(msg=f"Handled 'initialize'", level="debug")
+                return ok(info)
 
-            # -----------------------------------------------------------------
-            #
-            # Handle common MCP service methods
-            #
             # -----------------------------------------------------------------
 
-            try:
-                if method == "initialize":
-                    client_proto = params.get("protocolVersion", "2025-06-18")
-                    info = {
-                        "protocolVersion": client_proto,
-                        "serverInfo": {
-                            "name": str(self._mcp_server_name),
-                            "version": str(self._mcp_server_version),
-                        },
-                        "capabilities": {
-                            "tools": {},
-                            "resources": {},
-                            "templates": {},
-                            "prompts": {}
-                        },
-                    }
-                    self._log_line(msg=f"Handled 'initialize'", level="debug")
-                    return ok(info)
-
-                # -----------------------------------------------------------------
-
-                elif method == "tools/list":
-                    return ok(self._rpc_tools_list())
-
-                # -----------------------------------------------------------------
-
-                elif method == "help":
-                    result = await self._help_handler_rpc(params)
-                    return ok(result)
-
-                # -----------------------------------------------------------------
-
-                elif method == "resources/list":
-
-                    resources = []
-                    for tool_name, tool_info in self._project_data.get("tools", {}).items():
-                        resource_path = tool_info.get("resource")
-                        if not resource_path:
-                            continue
-                        abs_path = os.path.join(self._project_base_path, resource_path)
-                        uri = f"file://{os.path.abspath(abs_path)}"
-                        resources.append({
-                            "name": tool_name,
-                            "uri": uri,
-                            "mimeType": "text/markdown"
-                        })
-                    return ok({"resources": resources})
+            elif method == "tools/list":
+                try:
+                    return ok(self._rpc_tools_list(params))
+                except (TypeError, ValueError) as cursor_error:
+                    return make_error(-32602, f"Invalid tools/list params: {cursor_error}")
 
-                # -----------------------------------------------------------------
+            elif method == "tools/search":
+                try:
+                    return ok(self._rpc_tools_search(params))
+                except (TypeError, ValueError) as search_error:
+                    return make_error(-32602, f"Invalid tools/search params: {search_error}")
 
-                elif method == "resources/read":
+            # -----------------------------------------------------------------
 
-                    uri = params.get("uri")
-                    if not uri or not uri.startswith("file://"):
-                        return make_error(-32602, f"Invalid or missing URI: {uri}")
+            elif method == "help":
+                result = await self._help_handler_rpc(params)
+                return ok(result)
 
-                    parsed = urlparse(uri)
-                    path = unquote(parsed.path)
-                    query_params = dict(parse_qsl(parsed.query))
+            # -----------------------------------------------------------------
 
-                    try:
-                        with open(path, "r", encoding="utf-8") as f:
-                            text = f.read()
-                    except Exception as read_error:
-                        return make_error(-32000, f"Failed to read resource {uri}: {read_error}")
-
-                    # --- Dynamic substitution demo: used in templates  ---
-                    if query_params:
-                        # Append a small note at the bottom of the Markdown
-                        args_str = ", ".join(f"{k}={v}" for k, v in query_params.items())
-                        text += f"\n\n---\n*Template arguments applied:* {args_str}\n"
-
-                    return ok({
-                        "contents": [
-                            {"uri": uri, "text": text}
-                        ]
+            elif method == "resources/list":
+
+                resources = []
+                for tool_name, tool_info in self._project_data.get("tools", {}).items():
+                    resource_path = tool_info.get("resource")
+                    if not resource_path:
+                        continue
+                    abs_path = os.path.join(self._project_base_path, resource_path)
+                    uri = f"file://{os.path.abspath(abs_path)}"
+                    resources.append({
+                        "name": tool_name,
+                        "uri": uri,
+                        "mimeType": "text/markdown"
                     })
-                # -----------------------------------------------------------------
-
-                elif method in ("templates/list", "resources/templates/list"):
-                    resource_templates = []
-                    base = os.path.abspath(os.path.join(self._project_base_path, "resources"))
-
-                    for name, tmpl in self._project_data.get("templates", {}).items():
-                        args = []
-                        arg_name = ""
-                        for arg_name, default in tmpl.get("args", {}).items():
-                            args.append({
-                                "name": arg_name,
-                                "description": f"Argument for {tmpl.get('command')}",
-                                "default": default
-                            })
-
-                        # Build a simple uriTemplate using the resource path
-                        resource_path = tmpl.get("command").replace("tool_", "tool_") + ".md"
-                        uri_template = f"file://{base}/{resource_path}?{arg_name}={{{arg_name}}}"
-
-                        resource_templates.append({
-                            "name": name,
-                            "description": tmpl.get("description", ""),
-                            "uriTemplate": uri_template,
-                            "arguments": args
+                return ok({"resources": resources})
+
+            # -----------------------------------------------------------------
+
+            elif method == "resources/read":
+
+                uri = params.get("uri")
+                if not uri or not uri.startswith("file://"):
+                    return make_error(-32602, f"Invalid or missing URI: {uri}")
+
+                parsed = urlparse(uri)
+                path = unquote(parsed.path)
+                query_params = dict(parse_qsl(parsed.query))
+
+                try:
+                    # Off the event loop: a large resource must not stall other clients
+                    text = await asyncio.to_thread(Path(path).read_text, encoding="utf-8")
+                except Exception as read_error:
+                    return make_error(-32000, f"Failed to read resource {uri}: {read_error}")
+
+                # --- Dynamic substitution demo: used in templates  ---
+                if query_params:
+                    # Append a small note at the bottom of the Markdown
+                    args_str = ", ".join(f"{k}={v}" for k, v in query_params.items())
+                    text += f"\n\n---\n*Template arguments applied:* {args_str}\n"
+
+                return ok({
+                    "contents": [
+                        {"uri": uri, "text": text}
+                    ]
+                })
+            # -----------------------------------------------------------------
+
+            elif method in ("templates/list", "resources/templates/list"):
+                resource_templates = []
+                base = os.path.abspath(os.path.join(self._project_base_path, "resources"))
+
+                for name, tmpl in self._project_data.get("templates", {}).items():
+                    args = []
+                    arg_name = ""
+                    for arg_name, default in tmpl.get("args", {}).items():
+                        args.append({
+                            "name": arg_name,
+                            "description": f"Argument for {tmpl.get('command')}",
+                            "default": default
                         })
 
-                    return ok({"resourceTemplates": resource_templates})
+                    # Build a simple uriTemplate using the resource path
+                    resource_path = tmpl.get("command").replace("tool_", "tool_") + ".md"
+                    uri_template = f"file://{base}/{resource_path}?{arg_name}={{{arg_name}}}"
 
+                    resource_templates.append({
+                        "name": name,
+                        "description": tmpl.get("description", ""),
+                        "uriTemplate": uri_template,
+                        "arguments": args
+                    })
+
+                return ok({"resourceTemplates": resource_templates})
 
-                # -----------------------------------------------------------------
 
-                elif method == "tools/call":
-                    tool_name = params.get("name", "<?>")
+            # -----------------------------------------------------------------
+
+            elif method == "tools/call":
+                tool_name = params.get("name", "<?>")
+                with contextlib.suppress(Exception):
+                    self._log_line(msg=f"Calling tool: {tool_name} with: {params}", level="debug")
+
+                # Priority class: `_meta.priority`, else the tool's configured class
+                meta = params.get("_meta") if isinstance(params.get("_meta"), dict) else {}
+                tool = self._tools_registry.get(tool_name)
+                priority = meta.get("priority") or (tool.priority if tool is not None else AUTO_FORGE_DEFAULT_PRIORITY)
+                if priority not in AUTO_FORGE_PRIORITY_CLASSES:
+                    return make_error(-32602, f"Invalid priority '{priority}', expected one of "
+                                              f"{', '.join(AUTO_FORGE_PRIORITY_CLASSES)}")
+
+                # Admission: run now, wait in the bounded queue, or get shed with a retry hint
+                try:
+                    await self._scheduler.acquire(priority)
+                except _CoreMCPAdmissionError as admission_error:
+                    return make_error(admission_error.code, admission_error.message,
+                                      {"retryAfter": admission_error.retry_after})
+
+                # Tag everything this call broadcasts, so SSE clients can filter by tool / job.
+                # The job id is `_meta.jobId`, else `_meta.progressToken`, else the request id.
+                job_id = next((v for v in (meta.get("jobId"), meta.get("progressToken"), jid) if v is not None), None)
+                call_token = _mcp_call_context.set(_CoreMCPCallContextType(
+                    tool=str(tool_name), job=str(job_id) if job_id is not None else None))
+
+                started = time.monotonic()
+                record = self._job_store.start(str(tool_name), str(job_id) if job_id is not None else None,
+                                               params.get("arguments")) if self._job_store is not None else None
+                result, error, cancelled = None, None, False
+                try:
+                    result = await self._rpc_tools_call(params)
                     with contextlib.suppress(Exception):
-                        self._log_line(msg=f"Calling tool: {tool_name} with: {params}", level="debug")
+                        self._log_line(
+                            msg=f"Tool '{tool_name}' result keys: {list(result.keys())}",
+                            level="debug"
+                        )
+                        await self._broadcast({
+                            "jsonrpc": "2.0",
+                            "method": "tools/result",
+                            "params": {"name": tool_name, "result": result},
+                        })
+
+                    return ok(self._wrap_tool_result(result))
+
+                except asyncio.CancelledError:
+                    cancelled = True
+                    raise
+                except Exception as call_error:
+                    # KeyError (unknown tool) would otherwise be stored quoted
+                    error = str(call_error.args[0] if isinstance(call_error, KeyError) and call_error.args
+                                else call_error) or repr(call_error)
+                    raise
+                finally:
+                    if record is not None:
+                        self._job_store.finish(record, result, error, cancelled)
+                    _mcp_call_context.reset(call_token)
+                    self._scheduler.release(time.monotonic() - started)
+
+            # -----------------------------------------------------------------
+
+            elif method == "tools/pipeline":
+                try:
+                    pipeline, arguments = self._pipeline_request(params)
+                except ValueError as pipeline_error:
+                    return make_error(-32602, f"Invalid pipeline: {pipeline_error}")
+
+                # One admission for the whole pipeline; its branches run within it
+                meta = params.get("_meta") if isinstance(params.get("_meta"), dict) else {}
+                priority = meta.get("priority") or pipeline.priority or AUTO_FORGE_DEFAULT_PRIORITY
+                if priority not in AUTO_FORGE_PRIORITY_CLASSES:
+                    return make_error(-32602, f"Invalid priority '{priority}', expected one of "
+                                              f"{', '.join(AUTO_FORGE_PRIORITY_CLASSES)}")
+                try:
+                    await self._scheduler.acquire(priority)
+                except _CoreMCPAdmissionError as admission_error:
+                    return make_error(admission_error.code, admission_error.message,
+                                      {"retryAfter": admission_error.retry_after})
+
+                job_id = next((v for v in (meta.get("jobId"), meta.get("progressToken"), jid) if v is not None), None)
+                call_token = _mcp_call_context.set(_CoreMCPCallContextType(
+                    tool=None, job=str(job_id) if job_id is not None else None))
+
+                started = time.monotonic()
+                pipeline_name = params.get("name") if "steps" not in params else None
+                record = self._job_store.start(f"pipeline:{pipeline_name}" if pipeline_name else "pipeline",
+                                               str(job_id) if job_id is not None else None,
+                                               arguments if pipeline_name else params.get("steps")) \
+                    if self._job_store is not None else None
+                result, error, cancelled = None, None, False
+                try:
+                    result = await self._run_pipeline(pipeline, arguments)
+                    return ok(self._wrap_tool_result(result))
+                except asyncio.CancelledError:
+                    cancelled = True
+                    raise
+                except Exception as pipeline_error:
+                    error = str(pipeline_error) or repr(pipeline_error)
+                    raise
+                finally:
+                    if record is not None:
+                        self._job_store.finish(record, result, error, cancelled)
+                    _mcp_call_context.reset(call_token)
+                    self._scheduler.release(time.monotonic() - started)
+
+            # -----------------------------------------------------------------
 
-                    # Single flight: try to acquire immediately; reject if busy
-                    try:
-                        await asyncio.wait_for(self._single_flight.acquire(), timeout=0.001)
-                    except asyncio.TimeoutError:
-                        return make_error(
-                            AUTO_FORGE_BUSY_CODE,
-                            "Busy: another tool is currently running in this workspace")
+            elif method == "jobs/list":
+                if self._job_store is None:
+                    return make_error(-32601, "jobs/list: no job_store configured for this project")
+                try:
+                    page = await self._jobs_list(params)
+                except (TypeError, ValueError) as query_error:
+                    return make_error(-32602, f"Invalid jobs/list params: {query_error}")
+                return ok(page)
 
-                    self._current = (tool_name, asyncio.get_running_loop().time())
-                    try:
-                        result = await self._rpc_tools_call(params)
-                        with contextlib.suppress(Exception):
-                            self._log_line(
-                                msg=f"Tool '{tool_name}' result keys: {list(result.keys())}",
-                                level="debug"
-                            )
-                            await self._broadcast({
-                                "jsonrpc": "2.0",
-                                "method": "tools/result",
-                                "params": {"name": tool_name, "result": result},
-                            })
-
-                            # Adapt result for MCP inspector
-                            if isinstance(result, str):
-                                wrapped = {
-                                    "isError": False,
-                                    "content": [{"type": "text", "text": str(result)}]
-                                }
-                            else:
-                                # Dump dicts cleanly to text
-                                wrapped = {
-                                    "isError": False,
-                                    "content": [{
-                                        "type": "text",
-                                        "text": "\n" + json.dumps(result, indent=2)
-                                    }]
-                                }
-
-                        return ok(wrapped)
-
-                    finally:
-                        self._current = None
-                        self._single_flight.release()
-
-                # -----------------------------------------------------------------
-
-                elif method == "ping":
-                    return ok({})
-
-                return make_error(-32601, f"unknown method: {method}")
-
-            except KeyError as ke:
-                return make_error(-32601, str(ke))
-            except Exception as ex:
-                with contextlib.suppress(Exception):
-                    await self._broadcast({"jsonrpc": "2.0", "method": "tools/error", "params": {"error": str(ex)}})
-                    self._log_line(f"_handle_one crash: {ex!r}", level="error")
-                return make_error(-32603, "Internal error")
+            # -----------------------------------------------------------------
 
-        # Single vs batch
-        try:
-            if isinstance(payload, list):
-                # Empty batch is invalid
-                if len(payload) == 0:
-                    error_body = _jr_err(_jid=None, _code=-32600, _message="invalid request (empty batch)")
-                    return web.json_response(error_body)
+            elif method == "ping":
+                return ok({})
 
-                if len(payload) > AUTO_FORGE_MAX_BATCH_MCP_COMMANDS:
-                    error_body = _jr_err(_jid=None, _code=-32600, _message="batch too large")
-                    return web.json_response(error_body)
+            return make_error(-32601, f"unknown method: {method}")
 
-                replies: list[dict[str, Any]] = []
-                for item in payload:
-                    resp = await _handle_one(item if isinstance(item, dict) else {})
-                    if resp is not None:
-                        replies.append(resp)
+        except KeyError as ke:
+            return make_error(-32601, str(ke))
+        except Exception as ex:
+            with contextlib.suppress(Exception):
+                await self._broadcast({"jsonrpc": "2.0", "method": "tools/error", "params": {"error": str(ex)}})
+                self._log_line(f"_handle_rpc_message crash: {ex!r}", level="error")
+            return make_error(-32603, "Internal error")
 
-                if replies:
-                    return web.json_response(replies)
-                # All were notifications, return {} (VS Code compat)
-                return web.json_response({})
+    async def _jobs_list(self, params: dict[str, Any]) -> dict[str, Any]:
+        """
+        `jobs/list`: newest-first page of job records from the job store.
+        Params (all optional): tool, state, job, since / until (Unix time), limit, cursor
+        (the previous page's "nextCursor") and includeResults.
+        """
+        cursor = params.get("cursor")
+        state = params.get("state")
+        if state is not None and state not in AUTO_FORGE_JOB_STATES:
+            raise ValueError(f"state must be one of {', '.join(AUTO_FORGE_JOB_STATES)}")
+        query = {
+            "tool": params.get("tool"),
+            "state": state,
+            "job": None if params.get("job") is None else str(params["job"]),
+            "since": None if params.get("since") is None else float(params["since"]),
+            "until": None if params.get("until") is None else float(params["until"]),
+            "limit": int(params.get("limit", AUTO_FORGE_JOB_STORE_LIST_LIMIT)),
+            "cursor": None if cursor is None else int(cursor),
+            "include_results": bool(params.get("includeResults", False)),
+        }
+        store = self._job_store
 
-            # Single message
-            if not isinstance(payload, dict):
-                error_body = _jr_err(_jid=None, _code=-32600, _message="Invalid request")
-                return web.json_response(error_body)
+        def _query() -> dict[str, Any]:
+            store.flush(timeout=5.0)  # Read your own writes: include calls that just finished
+            return store.list_jobs(**query)
 
-            reply = await _handle_one(payload)
-            if reply is None:
-                return web.json_response({})
-            return web.json_response(reply)
+        return await asyncio.to_thread(_query)
 
-        except Exception as e:
-            with contextlib.suppress(Exception):
-                self._log_line(f"/message handler crash (outer): {e!r}", level="error")
-            error_body = _jr_err(_jid=None, _code=-32603, _message="Internal error")
-            return web.json_response(error_body)
+    @staticmethod
+    def _wrap_tool_result(result: Any) -> dict[str, Any]:
+        """ Adapt a tool (or pipeline) result to MCP content for clients such as the inspector. """
+        if isinstance(result, str):
+            return {"isError": False, "content": [{"type": "text", "text": str(result)}]}
+        # Dump dicts cleanly to text
+        return {"isError": False, "content": [{"type": "text", "text": "\n" + json.dumps(result, indent=2)}]}
 
     @staticmethod
     async def _help_handler_rpc(_params: dict[str, Any]) -> dict[str, Any]:
@@ -601,37 +2751,72 @@ class CoreMCPService:
               `tools/call` in the MCP JSON-RPC API.
         """
         self._tools_registry[tool.name] = tool
+        if self._tool_index is not None:
+            self._tool_index.add(tool.name, tool.description, tool.params)
 
     @staticmethod
-    def _json_response(data: Any, status: int = 200) -> web.Response:
+    def _json_response(data: Any, status: int = 200, pretty: bool = False,
+                       headers: Optional[dict[str, str]] = None) -> web.Response:
         """
-        Create a consistent JSON response with indentation.
+        Create a consistent JSON response.
         Args:
             data (dict): The data to serialize and return as JSON.
+            status (int): HTTP status.
+            pretty (bool): Indent for human readers (status / help pages); machine-facing
+                replies are compact, which keeps large tool results small.
+            headers (dict[str, str], optional): Extra response headers.
         Returns:
-            web.Response: A JSON response with pretty indentation.
+            web.Response: The JSON response.
         """
-        return web.json_response(
-            data,
-            status=status,
-            dumps=lambda x: json.dumps(x, indent=2, ensure_ascii=False) + "\n",
-        )
+        if pretty:
+            text = json.dumps(data, indent=2, ensure_ascii=False) + "\n"
+        else:
+            text = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+        return web.json_response(text=text, status=status, headers=headers)
 
     async def _run_one_cmdline_async(self,
                                      line: Optional[str] = None,
                                      argv: Optional[list[str]] = None,
                                      cwd: Optional[str] = None,
-                                     env: Optional[dict[str, str]] = None) -> dict[str, Any]:
+                                     env: Optional[dict[str, str]] = None,
+                                     limits: Optional[_CoreMCPToolLimitsType] = None,
+                                     stderr_metadata: bool = False,
+                                     stdin_data: Optional[bytes] = None,
+                                     output: Optional[dict[str, Any]] = None,
+                                     keywords: Optional[CoreKeywordScanner] = None,
+                                     stdin_stream: Optional[_CoreMCPStreamType] = None,
+                                     stdout_streams: Optional[list[_CoreMCPStreamType]] = None) -> dict[str, Any]:
         """
         Run a single command asynchronously inside the build shell.
         Args:
             line (str, optional): Command line string (legacy path).
             argv (list[str], optional): Command as argument vector (preferred).
             cwd (str, optional): Working directory to execute in.
-            env (dict[str, str], optional): Environment variables to apply.
-
+            env (dict[str, str], optional): Complete environment for the process;
+                None inherits the service environment.
+            limits (_CoreMCPToolLimitsType, optional): Resource limits applied before exec.
+                When the run fails because of one, the result carries "limit_exceeded".
+            stderr_metadata (bool): The tool reports a JSON object as its last stderr line;
+                return it parsed as "metadata" instead of as a stderr line.
+            stdin_data (bytes, optional): Streamed to the process stdin, which is then closed.
+                Without it stdin is /dev/null (never the service's own stdin).
+            output (dict[str, Any], optional): Output pipeline options applied to both streams
+                as lines arrive, before they are published or collected.
+            keywords (CoreKeywordScanner, optional): Flags keyword lines as they arrive: each hit
+                is published as a "keyword" event, and the result carries per-label counts
+                and the first location under "keywords".
+            stdin_stream (_CoreMCPStreamType, optional): Streamed to the process stdin as it arrives
+                (another pipeline step's stdout); replaces `stdin_data`.
+            stdout_streams (list[_CoreMCPStreamType], optional): Receive the raw stdout bytes as they
+                are read (pipeline steps consuming this one's output).
+        Returns:
+            dict[str, Any]: "status", "logs" (stdout lines), "stderr" (stderr lines), "summary",
+                and "metadata" / "keywords" / "limit_exceeded" when applicable.
         """
         logs: list[str] = []  # Executed process output lines
+        err_lines: list[str] = []  # Executed process stderr lines
+        hits: dict[str, dict[str, Any]] = {label: {"count": 0, "first": None}
+                                           for label in (keywords.labels if keywords is not None else ())}
         current_work_dir = str(cwd) if cwd is not None else str(Path.cwd())
 
         if argv is None:
@@ -639,126 +2824,833 @@ class CoreMCPService:
                 raise ValueError("Must provide either argv or line")
             argv = shlex.split(line)
 
+        # Limits need a hook in the child; without them the faster spawn path stays available
+        enforce_limits = limits is not None and resource is not None
+
         self._log_line(f"Executing: {argv}, cwd: {current_work_dir}", level="debug")
+        # CPU time of reaped children, to tell the CPU hard limit's SIGKILL from any other
+        children_before = resource.getrusage(resource.RUSAGE_CHILDREN) if enforce_limits else None
         try:
             proc = await asyncio.create_subprocess_exec(
                 *argv,
                 cwd=current_work_dir,
-                env=env or os.environ.copy(),
+                env=env,
+                stdin=asyncio.subprocess.PIPE if stdin_data is not None or stdin_stream is not None
+                else asyncio.subprocess.DEVNULL,
                 stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.STDOUT,
+                stderr=asyncio.subprocess.PIPE,
+                preexec_fn=limits.apply if enforce_limits else None,
+                start_new_session=True,  # A terminal Ctrl+C reaches only the service, which drains first
             )
         except Exception as execute_error:
             raise RuntimeError(f"Failed to launch {argv!r}: {execute_error}")
 
-        # Stream logs
-        assert proc.stdout is not None
-        async for raw_line in proc.stdout:
-            decoded: str = raw_line.decode(errors="replace")
-            text = decoded.rstrip()
-            logs.append(text)
-
-            with contextlib.suppress(Exception):
-                await self._broadcast({"event": "log", "data": text})
-
-        status = await proc.wait()
+        self._live_processes += 1
+        try:
+            # Stream both pipes concurrently, so neither can fill up and stall the tool
+            assert proc.stdout is not None and proc.stderr is not None
+            pumps = [self._pump_stream(proc.stdout, "stdout", logs, output, keywords, hits, stdout_streams),
+                     self._pump_stream(proc.stderr, "stderr", err_lines, output, keywords, hits)]
+            if stdin_stream is not None:
+                pumps.append(self._feed_stdin_stream(proc.stdin, stdin_stream))
+            elif stdin_data is not None:
+                pumps.append(self._feed_stdin(proc.stdin, stdin_data))
+            await asyncio.gather(*pumps)
+            status = await proc.wait()
+        except asyncio.CancelledError:
+            # Abandoned call (client gone, or a shutdown past its drain deadline): do not orphan the tool
+            with contextlib.suppress(ProcessLookupError):
+                proc.kill()
+            raise
+        finally:
+            self._live_processes -= 1
 
         result: dict[str, Any] = {
             "status": status,
             "logs": logs,
+            "stderr": err_lines,
             "summary": f"Executed: {' '.join(argv)} (exit {status})",
         }
 
+        if keywords is not None:
+            result["keywords"] = hits
+
+        if stderr_metadata:
+            metadata = self._pop_stderr_metadata(err_lines)
+            if metadata is not None:
+                result["metadata"] = metadata
+
+        exceeded = None
+        if enforce_limits:
+            # Over-counts other runs reaped meanwhile, but still rules out a run well below its limit
+            children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+            cpu_time = (children_after.ru_utime + children_after.ru_stime
+                        - children_before.ru_utime - children_before.ru_stime)
+            exceeded = limits.violation(status, logs[-5:] + err_lines[-5:], cpu_time)
+        if exceeded is not None:
+            result["limit_exceeded"] = exceeded
+            result["summary"] = f"Executed: {' '.join(argv)} (exit {status}, {exceeded} limit exceeded)"
+
         with contextlib.suppress(Exception):
             await self._broadcast({"event": "done", **result})
 
         return result
 
+    async def _pump_stream(self, stream: asyncio.StreamReader, name: str, lines: list[str],
+                           output: Optional[dict[str, Any]] = None,
+                           keywords: Optional[CoreKeywordScanner] = None,
+                           hits: Optional[dict[str, dict[str, Any]]] = None,
+                           tee: Optional[list[_CoreMCPStreamType]] = None) -> None:
+        """
+        Read a tool pipe to EOF in large chunks, split it into lines and publish each one.
+        Bytes accumulate in one reusable buffer; every chunk is decoded in a single call up to
+        its last newline, so lines of any length are handled (no StreamReader line limit)
+        and multibyte characters split across reads are decoded correctly.
+        Args:
+            stream (asyncio.StreamReader): The pipe to read.
+            name (str): "stdout" or "stderr"; stderr lines are tagged in published events.
+            lines (list[str]): Receives the decoded lines.
+            output (dict[str, Any], optional): Output pipeline options for this stream.
+            keywords (CoreKeywordScanner, optional): Scanner applied to each processed line.
+            hits (dict[str, dict[str, Any]], optional): Per-label "count" / "first" totals,
+                shared by both streams of a run.
+            tee (list[_CoreMCPStreamType], optional): Also receive every raw chunk, then the end of stream.
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        buffer = bytearray()
+        sink = _mcp_event_sink.get()
+        pipeline = CoreOutputPipeline(**output) if output else None
+
+        async def _publish_one(_line: str) -> None:
+            await self._publish_line(_line, name, lines, sink, keywords, hits)
+
+        async def _publish(_text: str) -> None:
+            for raw_line in _text.split("\n"):
+                if pipeline is None:
+                    await _publish_one(raw_line.rstrip())
+                    continue
+                for processed in pipeline.process(raw_line.rstrip()):
+                    await _publish_one(processed)
+
+        while chunk := await stream.read(AUTO_FORGE_PIPE_READ_SIZE):
+            for consumer in tee or ():
+                await consumer.put(chunk)
+            buffer += chunk
+            end = buffer.rfind(b"\n")
+            if end < 0:
+                continue  # No complete line yet
+            text = decoder.decode(buffer[:end])
+            del buffer[:end + 1]
+            await _publish(text)
+
+        for consumer in tee or ():
+            await consumer.put(None)
+
+        tail = decoder.decode(bytes(buffer), final=True)
+        if tail:
+            await _publish(tail)
+        if pipeline is not None:
+            for text in pipeline.flush():
+                await _publish_one(text)
+
+    async def _publish_line(self, line: str, name: str, lines: list[str],
+                            sink: Optional[Callable[[dict[str, Any]], None]],
+                            keywords: Optional[CoreKeywordScanner] = None,
+                            hits: Optional[dict[str, dict[str, Any]]] = None) -> None:
+        """ Collect one output line, publish it as a "log" event and flag its keywords. """
+        lines.append(line)
+        event = {"event": "log", "data": line} if name == "stdout" else \
+            {"event": "log", "data": line, "stream": name}
+        with contextlib.suppress(Exception):
+            await self._broadcast(event)
+        if sink is not None:
+            with contextlib.suppress(Exception):
+                sink(event)
+
+        for label, column, matched in (keywords.scan(line) if keywords is not None else ()):
+            location = {"stream": name, "line": len(lines), "column": column, "match": matched}
+            hits[label]["count"] += 1
+            if hits[label]["first"] is None:
+                hits[label]["first"] = location
+            keyword_event = {"event": "keyword", "data": {"keyword": label, **location, "text": line}}
+            with contextlib.suppress(Exception):
+                await self._broadcast(keyword_event)
+            if sink is not None:
+                with contextlib.suppress(Exception):
+                    sink(keyword_event)
+
+    async def _run_on_daemon(self, tool: _CoreMCPToolType, arguments: dict[str, Any]) -> dict[str, Any]:
+        """
+        Execute a call on one of the tool's daemon instances instead of starting a process.
+        Lines the daemon streams for the request go through the tool's output pipeline and
+        keyword scanner and are published like process output.
+        Returns:
+            dict[str, Any]: "status" (0, or 1 for an error reply), "logs", "stderr" (always empty:
+                daemon stderr goes to the service log), "summary", the daemon's "result" or
+                "error", and "keywords" when configured.
+        """
+        logs: list[str] = []
+        hits: dict[str, dict[str, Any]] = {label: {"count": 0, "first": None}
+                                           for label in (tool.keywords.labels if tool.keywords is not None else ())}
+        pipeline = CoreOutputPipeline(**tool.output) if tool.output else None
+        context, sink = _mcp_call_context.get(), _mcp_event_sink.get()
+
+        async def _on_log(_text: str) -> None:
+            # Runs in the daemon's reader task: publish under this call's context
+            token = _mcp_call_context.set(context)
+            try:
+                for raw_line in _text.split("\n"):
+                    for processed in (pipeline.process(raw_line.rstrip()) if pipeline else (raw_line.rstrip(),)):
+                        await self._publish_line(processed, "stdout", logs, sink, tool.keywords, hits)
+            finally:
+                _mcp_call_context.reset(token)
+
+        instance, reply = await tool.daemon.call(arguments, env=self._tool_env(tool), on_log=_on_log)
+        if pipeline is not None:
+            for text in pipeline.flush():
+                await self._publish_line(text, "stdout", logs, sink, tool.keywords, hits)
+
+        result: dict[str, Any] = {"status": 0, "logs": logs, "stderr": []}
+        if "error" in reply:
+            error = reply["error"]
+            message = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+            result.update(status=1, error=error)
+            result["summary"] = f"Daemon {tool.name} #{instance.index}: error: {message}"
+        else:
+            result["result"] = reply["result"]
+            result["summary"] = f"Daemon {tool.name} #{instance.index}: ok"
+        if tool.keywords is not None:
+            result["keywords"] = hits
+
+        with contextlib.suppress(Exception):
+            await self._broadcast({"event": "done", **result})
+        return result
+
+    def _retire_daemon(self, daemon: _CoreMCPDaemonPoolType) -> None:
+        """ Stop a daemon pool replaced by a project reload once its calls in flight are done. """
+        task = asyncio.create_task(daemon.close(grace=daemon.config.request_timeout))
+        self._retiring_daemons.add(task)
+        task.add_done_callback(self._retiring_daemons.discard)
+
+    @staticmethod
+    async def _feed_stdin(stream: Optional[asyncio.StreamWriter], data: bytes) -> None:
+        """ Write a stdin payload with flow control, then close the pipe so the tool sees EOF. """
+        assert stream is not None
+        try:
+            stream.write(data)
+            await stream.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The tool exited or closed stdin without reading everything
+        finally:
+            stream.close()
+
+    @staticmethod
+    async def _feed_stdin_stream(stream: Optional[asyncio.StreamWriter], source: _CoreMCPStreamType) -> None:
+        """ Copy a pipeline stream into stdin until its end; keeps draining it if the tool stops reading. """
+        assert stream is not None
+        writable = True
+        try:
+            while (chunk := await source.get()) is not None:
+                if writable:
+                    try:
+                        stream.write(chunk)
+                        await stream.drain()
+                    except (BrokenPipeError, ConnectionResetError):
+                        writable = False
+        finally:
+            source.close()
+            stream.close()
+
+    @staticmethod
+    def _pop_stderr_metadata(err_lines: list[str]) -> Optional[dict[str, Any]]:
+        """ Remove and return the last non-empty stderr line if it is a JSON object. """
+        for index in range(len(err_lines) - 1, -1, -1):
+            if not err_lines[index]:
+                continue
+            try:
+                metadata = json.loads(err_lines[index])
+            except ValueError:
+                return None
+            if not isinstance(metadata, dict):
+                return None
+            del err_lines[index]
+            return metadata
+        return None
+
+    def _build_tool(self, key: str, entry: dict[str, Any]) -> _CoreMCPToolType:
+        """
+        Validate one project tool entry and turn it into a registry record.
+        Args:
+            key (str): Tool key as written under "tools" in the project file.
+            entry (dict[str, Any]): The tool definition.
+        Returns:
+            _CoreMCPToolType: The tool, named with the configured prefix.
+        """
+        tool_name = f"{self._tool_prefix}{key}"
+        if not AUTO_FORGE_TOOL_NAME_PATTERN.fullmatch(tool_name):
+            raise RuntimeError(f"Invalid MCP tool name: {tool_name}")
+
+        if not isinstance(entry, dict):
+            raise RuntimeError(f"MCP tool entry must be an object: {tool_name}")
+
+        description = entry.get("description") or f"Run '{key}' tool."
+
+        command = entry.get("command")
+        if not command:
+            raise RuntimeError(f"Missing 'command' in MCP tool entry: {tool_name}")
+
+        working_dir = entry.get("working_dir")
+        static_args = entry.get("args", [])
+        params = entry.get("params", [])
+        env = entry.get("env", {})
+        resource_path = entry.get("resource")
+
+        # Per-tool "rate_limit" overrides the project-wide default; null disables it for this tool
+        rate_limit = _CoreMCPTokenBucketType.from_config(entry.get("rate_limit", self._tool_rate_limit))
+
+        styles = [p.get("style", "flag") for p in params]
+        unknown_styles = sorted({style for style in styles if style not in AUTO_FORGE_PARAM_STYLES})
+        if unknown_styles:
+            raise RuntimeError(f"Unknown param style '{unknown_styles[0]}' in MCP tool entry: {tool_name}")
+        if styles.count("stdin") > 1:
+            raise RuntimeError(f"Only one 'stdin' param is allowed in MCP tool entry: {tool_name}")
+
+        try:
+            output = CoreOutputPipeline.validate(entry.get("output"))
+        except ValueError as output_error:
+            raise RuntimeError(f"Invalid output in MCP tool entry {tool_name}: {output_error}")
+
+        try:
+            keywords = CoreKeywordScanner.from_config(entry.get("keywords"))
+        except ValueError as keywords_error:
+            raise RuntimeError(f"Invalid keywords in MCP tool entry {tool_name}: {keywords_error}")
+
+        priority = entry.get("priority") or AUTO_FORGE_DEFAULT_PRIORITY
+        if priority not in AUTO_FORGE_PRIORITY_CLASSES:
+            raise RuntimeError(f"Invalid priority '{priority}' in MCP tool entry: {tool_name}")
+
+        try:
+            limits = _CoreMCPToolLimitsType.from_config(entry.get("limits"))
+        except ValueError as limits_error:
+            raise RuntimeError(f"Invalid limits in MCP tool entry {tool_name}: {limits_error}")
+        if limits is not None and resource is None:
+            self._log_line(f"Resource limits are not supported on this platform; ignored for {tool_name}",
+                           level="warning")
+
+        runner = entry.get("runner", "process")
+        if runner not in AUTO_FORGE_TOOL_RUNNERS:
+            raise RuntimeError(f"Invalid runner '{runner}' in MCP tool entry: {tool_name}")
+        daemon: Optional[_CoreMCPDaemonPoolType] = None
+        if runner == "daemon":
+            try:
+                daemon_config = _CoreMCPDaemonConfigType.from_config(entry.get("daemon"))
+            except (TypeError, ValueError) as daemon_error:
+                raise RuntimeError(f"Invalid daemon options in MCP tool entry {tool_name}: {daemon_error}")
+            # The daemon gets the call arguments as JSON, so param styles do not apply to it
+            daemon = _CoreMCPDaemonPoolType(
+                name=tool_name,
+                argv=[os.path.expandvars(a) for a in [command, *static_args]],
+                cwd=working_dir,
+                limits=limits,
+                config=daemon_config,
+                log=self._log_line)
+
+        affinity = entry.get("affinity") or ()
+        if isinstance(affinity, str):
+            affinity = (affinity,)
+        if not isinstance(affinity, (list, tuple)) or not all(isinstance(label, str) for label in affinity):
+            raise RuntimeError(f"Invalid affinity in MCP tool entry {tool_name}: expected a label or list of labels")
+
+        # MCP-compatible JSON schema from declared params
+        input_schema = {
+            "type": "object",
+            "properties": {
+                p["name"]: {"type": p.get("type", "string"), "description": p.get("description", "")}
+                for p in params
+            },
+            "required": [p["name"] for p in params],  # all listed params required
+            "additionalProperties": False,
+        }
+
+        return _CoreMCPToolType(
+            name=tool_name,
+            description=description,
+            input_schema=input_schema,
+            command=command,
+            working_dir=working_dir,
+            args=static_args,
+            params=params,
+            env=env,
+            resource=resource_path,
+            rate_limit=rate_limit,
+            priority=priority,
+            limits=limits,
+            stderr_metadata=bool(entry.get("stderr_metadata", False)),
+            output=output,
+            keywords=keywords,
+            affinity=frozenset(affinity),
+            daemon=daemon,
+        )
+
     def _register_all_commands(self) -> None:
         """
-        Register all loaded tools both as MCP tools (for SSE JSON-RPC)
-        and, optionally, as REST POST endpoints under /tool/<name>.
+        Register all loaded tools as MCP tools (for SSE JSON-RPC).
+        The REST POST endpoints under /tool/<name> are served by a single dynamic
+        route that looks tools up in the same registry and calls them as `tools/call`.
         """
 
         if not isinstance(self._tools_data, dict) or not self._tools_data:
             raise TypeError("tools must be a non-empty dict")
 
         for key, entry in self._tools_data.items():
-            tool_name = f"{self._tool_prefix}{key}"
-            if not re.fullmatch(r"[a-z0-9_-]+", tool_name):
-                raise RuntimeError(f"Invalid MCP tool name: {tool_name}")
-
-            description = entry.get("description") or f"Run '{key}' tool."
-
-            command = entry.get("command")
-            if not command:
-                raise RuntimeError(f"Missing 'command' in MCP tool entry: {tool_name}")
-
-            working_dir = entry.get("working_dir")
-            static_args = entry.get("args", [])
-            params = entry.get("params", [])
-            env = entry.get("env", {})
-            resource = entry.get("resource")
-
-            # MCP-compatible JSON schema from declared params
-            input_schema = {
-                "type": "object",
-                "properties": {
-                    p["name"]: {"type": p.get("type", "string"), "description": p.get("description", "")}
-                    for p in params
-                },
-                "required": [p["name"] for p in params],  # all listed params required
-                "additionalProperties": False,
-            }
-
-            # Register as MCP tool
-            self._add_tool(_CoreMCPToolType(
-                name=tool_name,
-                description=description,
-                input_schema=input_schema,
-                command=command,
-                working_dir=working_dir,
-                args=static_args,
-                params=params,
-                env=env,
-                resource=resource,
-            ))
+            self._add_tool(self._build_tool(key, entry))
 
-            # Legacy REST fallback
-            def make_handler(_command=command, _args=static_args, _cwd=working_dir, _env=env):
-                async def handler(request):
-                    payload = {}
-                    with contextlib.suppress(Exception):
-                        payload = await request.json()
+    async def _rest_tool_handler(self, request: web.Request) -> web.StreamResponse:
+        """
+        REST access to one tool: POST /tool/<name>. The call is dispatched as a `tools/call`
+        message, so it gets the same admission control, rate limits, priority classes,
+        idempotency keys, job history and drain handling as a JSON-RPC client.
+        Body (optional JSON object):
+            - "arguments" (dict): Named arguments, mapped through the tool's params.
+            - "args" (list | str): Legacy positional values, bound to the params in declaration order.
+            - "_meta" (dict): As in `tools/call` (priority, jobId, idempotencyKey).
+        Replies:
+            - {"results": [result]}, or {"error": message} with the HTTP status of the failure
+              (400 bad arguments, 404 unknown tool, 429 rate limited, 503 busy or shutting down).
+            - With `Accept: application/x-ndjson` (or `?stream=1`) the reply is chunked NDJSON:
+              each "log" / "keyword" event as the tool produces it, then one final
+              {"event": "result", "result": ...} or {"event": "error", "error": {...}} line.
+              A call refused before it produced any output gets the plain error reply instead.
+        """
+        tool_name = request.match_info["name"]
+        tool = self._tools_registry.get(tool_name)
+        if tool is None:
+            return self._json_response({"error": f"unknown tool: {tool_name}"}, status=404)
 
-                    # Merge static args + runtime args
-                    runtime_args = []
-                    with contextlib.suppress(Exception):
-                        raw_args = payload.get("args", [])
-                        if isinstance(raw_args, str):
-                            runtime_args = [raw_args]
-                        elif isinstance(raw_args, list):
-                            runtime_args = [str(a) for a in raw_args]
+        payload: Any = {}
+        if request.can_read_body:
+            try:
+                payload = await request.json()
+            except ValueError as parse_error:
+                return self._json_response({"error": f"invalid JSON body: {parse_error}"}, status=400)
+        try:
+            if not isinstance(payload, dict):
+                raise ValueError("body must be a JSON object")
+            params: dict[str, Any] = {"name": tool.name, "arguments": self._rest_arguments(tool, payload)}
+        except ValueError as argument_error:
+            return self._json_response({"error": str(argument_error)}, status=400)
+        if isinstance(payload.get("_meta"), dict):
+            params["_meta"] = payload["_meta"]
+
+        self._rest_calls += 1
+        msg = {"jsonrpc": "2.0", "id": f"rest-{self._rest_calls}", "method": "tools/call", "params": params}
+        dispatch = self._dispatch_rpc_payload(msg, client_id=self._client_id(request),
+                                              idempotency_key=request.headers.get(AUTO_FORGE_IDEMPOTENCY_HEADER))
+
+        streaming = AUTO_FORGE_NDJSON_CONTENT_TYPE in request.headers.get(hdrs.ACCEPT, "") or \
+            request.query.get("stream", "0").lower() not in ("0", "false", "no")
+        if not streaming:
+            return self._rest_reply(await dispatch)
+
+        # Output events are batched between writes; a client that does not keep up loses
+        # events beyond the buffer (counted), never the final line, which carries all output.
+        events: deque[dict[str, Any]] = deque()
+        wake = asyncio.Event()
+        dropped = 0
+
+        def _sink(event: dict[str, Any]) -> None:
+            nonlocal dropped
+            if len(events) >= AUTO_FORGE_REST_STREAM_BUFFER:
+                dropped += 1
+                return
+            events.append(event)
+            wake.set()
+
+        def _line(obj: dict[str, Any]) -> bytes:
+            return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n"
+
+        token = _mcp_event_sink.set(_sink)
+        try:
+            call = asyncio.create_task(dispatch)  # Inherits the sink; this request's context does not keep it
+        finally:
+            _mcp_event_sink.reset(token)
+        call.add_done_callback(lambda _task: wake.set())
 
-                    final_argv = [_command] + _args + runtime_args
-                    line = " ".join(final_argv)
-                    line = os.path.expandvars(line)
+        response: Optional[web.StreamResponse] = None
+        try:
+            while True:
+                if not events:
+                    if call.done():
+                        break
+                    await wake.wait()
+                    wake.clear()
+                    continue
+                if response is None:
+                    response = await self._ndjson_response(request)
+                batch = b"".join(_line(event) for event in events)
+                events.clear()
+                await response.write(batch)
+
+            reply = call.result()
+            if response is None:
+                if "error" in reply:
+                    return self._rest_reply(reply)
+                response = await self._ndjson_response(request)
+            final = {"event": "error", "error": reply["error"]} if "error" in reply else \
+                {"event": "result", "result": self._unwrap_tool_result(reply["result"])}
+            if dropped:
+                final["dropped"] = dropped
+            await response.write(_line(final))
+            await response.write_eof()
+        except ConnectionResetError:
+            pass  # Client went away: the call is cancelled below
+        finally:
+            if not call.done():
+                call.cancel()
+            if dropped:
+                self._log_line(f"REST client of '{tool.name}' dropped {dropped} output events (slow consumer)",
+                               level="warning")
+        return response
+
+    async def _ndjson_response(self, request: web.Request) -> web.StreamResponse:
+        """ Start a chunked NDJSON reply to a streaming REST tool call. """
+        response = web.StreamResponse(status=200, headers={"Content-Type": AUTO_FORGE_NDJSON_CONTENT_TYPE,
+                                                           "Cache-Control": "no-cache"})
+        response.enable_chunked_encoding()
+        if self._draining:
+            response.force_close()
+        await response.prepare(request)
+        return response
+
+    def _rest_reply(self, reply: dict[str, Any]) -> web.Response:
+        """ Plain REST reply to a `tools/call` envelope: the tool result, or the error with a matching HTTP status. """
+        error = reply.get("error")
+        if error is None:
+            response = self._json_response({"results": [self._unwrap_tool_result(reply["result"])]})
+        else:
+            status = {-32601: 404, -32602: 400, AUTO_FORGE_BUSY_CODE: 503, AUTO_FORGE_RATE_LIMITED_CODE: 429,
+                      AUTO_FORGE_OVERLOADED_CODE: 503}.get(error.get("code"), 500)
+            data = error.get("data")
+            headers = {"Retry-After": str(math.ceil(data["retryAfter"]))} \
+                if isinstance(data, dict) and "retryAfter" in data else None
+            response = self._json_response({"error": error.get("message")}, status=status, headers=headers)
+        if self._draining:
+            response.force_close()  # Keep-alive clients reconnect, to the successor after a hand-off
+        return response
 
-                    try:
-                        result = await self._run_one_cmdline_async(
-                            line,
-                            cwd=_cwd,
-                            env={**os.environ, **_env}
-                        )
-                        return self._json_response({"results": [result]})
-                    except Exception as e:
-                        return self._json_response({"error": str(e)}, status=500)
+    @staticmethod
+    def _rest_arguments(tool: _CoreMCPToolType, payload: dict[str, Any]) -> dict[str, Any]:
+        """
+        Tool arguments of a REST call body.
+        Args:
+            tool (_CoreMCPToolType): The called tool.
+            payload (dict[str, Any]): The request body.
+        Returns:
+            dict[str, Any]: The named "arguments", or the legacy "args" values bound to the
+            tool's params in declaration order.
+        Raises:
+            ValueError: Malformed arguments, or more legacy values than the tool has params.
+        """
+        arguments, values = payload.get("arguments"), payload.get("args")
+        if arguments is not None:
+            if values is not None:
+                raise ValueError("pass either 'arguments' or 'args', not both")
+            if not isinstance(arguments, dict):
+                raise ValueError("'arguments' must be an object")
+            return arguments
+
+        if values is None:
+            return {}
+        if isinstance(values, str):
+            values = [values]
+        if not isinstance(values, list):
+            raise ValueError("'args' must be a list")
+        if len(values) > len(tool.params):
+            raise ValueError(f"tool '{tool.name}' takes at most {len(tool.params)} args, got {len(values)}; "
+                             f"pass named 'arguments' instead")
+        return {param["name"]: str(value) for param, value in zip(tool.params, values)}
+
+    @staticmethod
+    def _unwrap_tool_result(content: dict[str, Any]) -> Any:
+        """ Inverse of `_wrap_tool_result()`: the tool's own result, for REST clients. """
+        text = content["content"][0]["text"]
+        if text.startswith("\n"):
+            with contextlib.suppress(ValueError):
+                return json.loads(text)
+        return text
+
+    def _tool_env(self, tool: _CoreMCPToolType) -> Optional[dict[str, str]]:
+        """
+        Environment for running a tool: None (inherit the service environment) when the
+        tool has no overrides, otherwise the merged mapping, built once per tool and
+        cached until the tool is changed by a project reload.
+        """
+        if not tool.env:
+            return None
+        env = self._tool_env_cache.get(tool.name)
+        if env is None:
+            env = {**os.environ, **{k: str(v) for k, v in tool.env.items()}}
+            self._tool_env_cache[tool.name] = env
+        return env
+
+    async def _watch_project_loop(self) -> None:
+        """
+        Poll the project file's mtime/size every `project_reload_interval` seconds
+        and hot-reload it when it changes. Polling keeps this portable (no inotify
+        dependency); a stat() every couple of seconds is negligible.
+        """
+        interval = float(self._project_reload_interval)
+        path = self._project_path
+
+        def _signature() -> Optional[tuple[int, int]]:
+            with contextlib.suppress(OSError):
+                st = os.stat(path)
+                return st.st_mtime_ns, st.st_size
+            return None
+
+        last = _signature()
+        while not self._shutdown_event.is_set():
+            await asyncio.sleep(interval)
+            current = _signature()
+            if current is None or current == last:
+                continue
+            last = current
+            with contextlib.suppress(Exception):
+                await self._reload_project()
+
+    async def _reload_project(self) -> bool:
+        """
+        Re-parse the project file and apply tool/template changes in place.
+        Behavior:
+            - Parsing runs in a worker thread (JSONC parsing of large catalogs is slow).
+            - Tools are diffed by their raw entries: only added or changed entries are
+              rebuilt, removed ones are dropped. All new records are validated before
+              anything is swapped, so a broken edit leaves the running catalog intact.
+            - Calls already in flight keep the tool record they started with.
+            - The `tools/list` catalog and cached tool environments are invalidated,
+              and clients are notified with `notifications/tools/list_changed`.
+            - Settings outside "tools"/"templates" (ports, transports, ...) still need
+              a restart; a warning is logged when they differ.
+        Returns:
+            bool: True if the new project was applied.
+        """
+        if self._project_path is None or self._project_loader is None:
+            return False
+
+        data = await asyncio.to_thread(self._project_loader, self._project_path)
+        if not isinstance(data, dict):
+            self._log_line(f"Project reload skipped: could not load {self._project_path}", level="error")
+            return False
+
+        new_tools = data.get("tools", {})
+        if not isinstance(new_tools, dict) or not new_tools:
+            self._log_line("Project reload skipped: tools must be a non-empty dict", level="error")
+            return False
+
+        old_tools = self._tools_data or {}
+        removed = [key for key in old_tools if key not in new_tools]
+        changed = {key: entry for key, entry in new_tools.items() if old_tools.get(key) != entry}
+
+        try:
+            rebuilt = [self._build_tool(key, entry) for key, entry in changed.items()]
+            pipelines = self._build_pipelines(data.get("pipelines"))
+        except Exception as build_error:
+            self._log_line(f"Project reload skipped: {build_error}", level="error")
+            return False
+
+        # Replaced daemons finish the calls they are serving before they are stopped
+        for key in [*removed, *changed]:
+            old_tool = self._tools_registry.get(f"{self._tool_prefix}{key}")
+            if old_tool is not None and old_tool.daemon is not None:
+                self._retire_daemon(old_tool.daemon)
+
+        for key in removed:
+            tool_name = f"{self._tool_prefix}{key}"
+            self._tools_registry.pop(tool_name, None)
+            if self._tool_index is not None:
+                self._tool_index.remove(tool_name)
+            self._tool_env_cache.pop(tool_name, None)
+        for tool in rebuilt:
+            self._add_tool(tool)
+            self._tool_env_cache.pop(tool.name, None)
+
+        stale_settings = sorted(k for k in set(data) | set(self._project_data)
+                                if k not in ("tools", "templates", "pipelines")
+                                and data.get(k) != self._project_data.get(k))
+        if stale_settings:
+            self._log_line(f"Project reload: restart required to apply {', '.join(stale_settings)}",
+                           level="warning")
+
+        templates_changed = data.get("templates") != self._project_data.get("templates")
+        pipelines_changed = data.get("pipelines") != self._project_data.get("pipelines")
+        self._project_data = {**self._project_data, "tools": new_tools, "templates": data.get("templates", {}),
+                              "pipelines": data.get("pipelines", {})}
+        self._tools_data = new_tools
+        self._tools_list_cache = None
+        self._pipelines = pipelines
+
+        added = sum(1 for key in changed if key not in old_tools)
+        self._log_line(f"Project reloaded: {added} added, {len(changed) - added} changed, {len(removed)} removed"
+                       f"{', templates updated' if templates_changed else ''}"
+                       f"{', pipelines updated' if pipelines_changed else ''}")
+
+        if changed or removed:
+            with contextlib.suppress(Exception):
+                await self._notify({"jsonrpc": "2.0", "method": "notifications/tools/list_changed"})
+        return True
+
+    @staticmethod
+    def _build_pipelines(config: Any) -> dict[str, _CoreMCPPipelineType]:
+        """ Validate the project's declared "pipelines" (name -> definition). """
+        if config is None:
+            return {}
+        if not isinstance(config, dict):
+            raise RuntimeError("'pipelines' must be an object")
+        pipelines: dict[str, _CoreMCPPipelineType] = {}
+        for name, entry in config.items():
+            try:
+                pipelines[name] = _CoreMCPPipelineType.from_config(entry)
+            except ValueError as pipeline_error:
+                raise RuntimeError(f"Invalid pipeline '{name}': {pipeline_error}")
+        return pipelines
 
-                return handler
+    def _pipeline_request(self, params: Any) -> tuple[_CoreMCPPipelineType, dict[str, Any]]:
+        """
+        Resolve `tools/pipeline` params: {"name": <declared pipeline>, "arguments": {...}}
+        or an inline {"steps": [...], "output": ...}.
+        Returns:
+            The pipeline and its arguments (referenced as ${args.<name>}).
+        """
+        if not isinstance(params, dict):
+            raise ValueError("params must be an object")
+        if "steps" in params:
+            pipeline = _CoreMCPPipelineType.from_config(params)
+        else:
+            pipeline = self._pipelines.get(params.get("name"))
+            if pipeline is None:
+                raise ValueError(f"unknown pipeline: {params.get('name')}")
 
-            self._app.router.add_post(f"/tool/{tool_name}", make_handler())
+        arguments = params.get("arguments") or {}
+        if not isinstance(arguments, dict):
+            raise ValueError("'arguments' must be an object")
+        for step in pipeline.steps:
+            if step.tool not in self._tools_registry:
+                raise ValueError(f"step '{step.id}' uses unknown tool '{step.tool}'")
+            missing = sorted({field_name for ref, field_name in pipeline.references(step.arguments)
+                              if ref == "args" and field_name not in arguments})
+            if missing:
+                raise ValueError(f"missing pipeline arguments: {', '.join(missing)}")
+        return pipeline, arguments
+
+    async def _run_pipeline(self, pipeline: _CoreMCPPipelineType, arguments: dict[str, Any]) -> dict[str, Any]:
+        """
+        Run a pipeline's steps, each as soon as the steps it depends on have finished.
+        A step with a "stdin" source starts together with that step and reads its stdout
+        while it is produced. A step whose dependency failed (error or non-zero status)
+        is skipped.
+        Returns:
+            dict[str, Any]: "status" (0 when every step succeeded), "output" (the output step's
+                daemon result, else its stdout text), "steps" (each step's result, "error" or
+                "skipped"), and "summary".
+        """
+        results: dict[str, dict[str, Any]] = {}
+        finished = {step.id: asyncio.Event() for step in pipeline.steps}
+        stdin_streams = {step.id: _CoreMCPStreamType() for step in pipeline.steps if step.stdin is not None}
+        stdout_streams: dict[str, list[_CoreMCPStreamType]] = {}
+        for step in pipeline.steps:
+            if step.stdin is not None:
+                stdout_streams.setdefault(step.stdin, []).append(stdin_streams[step.id])
+        context = _mcp_call_context.get()
+        started = time.monotonic()
+
+        def _succeeded(_step_id: str) -> bool:
+            _result = results.get(_step_id, {})
+            return "error" not in _result and "skipped" not in _result and _result.get("status", 0) == 0
+
+        async def _run_step(_step: _CoreMCPPipelineStepType) -> None:
+            try:
+                for dep in _step.after:
+                    await finished[dep].wait()
+                failed = sorted(dep for dep in _step.after if not _succeeded(dep))
+                if failed:
+                    results[_step.id] = {"skipped": f"dependency failed: {', '.join(failed)}"}
+                    return
+
+                _mcp_call_context.set(_CoreMCPCallContextType(tool=_step.tool, job=context.job))
+                step_arguments = self._resolve_pipeline_refs(_step.arguments, results, arguments)
+                step_started = time.monotonic()
+                result = await self._rpc_tools_call({"name": _step.tool, "arguments": step_arguments},
+                                                    stdin_stream=stdin_streams.get(_step.id),
+                                                    stdout_streams=stdout_streams.get(_step.id))
+                results[_step.id] = {**result, "elapsed": round(time.monotonic() - step_started, 3)}
+            except Exception as step_error:
+                results[_step.id] = {"error": str(step_error)}
+            finally:
+                if _step.id in stdin_streams:
+                    stdin_streams[_step.id].close()
+                for consumer in stdout_streams.get(_step.id, ()):
+                    await consumer.put(None)  # Consumers of a step that failed or never ran see EOF
+                finished[_step.id].set()
+
+        await asyncio.gather(*(_run_step(step) for step in pipeline.steps))
+
+        output = results[pipeline.output]
+        failed = [step.id for step in pipeline.steps if "error" in results[step.id]
+                  or results[step.id].get("status", 0) != 0]
+        skipped = [step.id for step in pipeline.steps if "skipped" in results[step.id]]
+        elapsed = time.monotonic() - started
+        return {
+            "status": 1 if failed or skipped else 0,
+            "output": output["result"] if "result" in output else "\n".join(output.get("logs", [])),
+            "steps": {step.id: results[step.id] for step in pipeline.steps},
+            "summary": f"Pipeline: {len(pipeline.steps) - len(failed) - len(skipped)} steps ok, "
+                       f"{len(failed)} failed, {len(skipped)} skipped in {elapsed:.3f}s",
+        }
 
-    async def _rpc_tools_call(self, params: dict[str, Any]) -> dict[str, Any]:
+    @classmethod
+    def _resolve_pipeline_refs(cls, value: Any, results: dict[str, dict[str, Any]],
+                               arguments: dict[str, Any]) -> Any:
+        """
+        Substitute ${step.field} and ${args.name} references in step arguments.
+        Fields of a step: "output" (default: its stdout text), "last" (last non-empty stdout
+        line), "status", or a dotted path into its result ("result.files.0", "metadata.count").
+        A string that is exactly one reference takes the referenced value's type.
+        """
+        if isinstance(value, dict):
+            return {key: cls._resolve_pipeline_refs(item, results, arguments) for key, item in value.items()}
+        if isinstance(value, list):
+            return [cls._resolve_pipeline_refs(item, results, arguments) for item in value]
+        if not isinstance(value, str):
+            return value
+
+        def _lookup(_match: re.Match) -> Any:
+            name, path = _match.group(1), _match.group(2)
+            if name == "args":
+                return arguments[path]
+            result = results[name]
+            if path in (None, "output"):
+                return "\n".join(result.get("logs", [])).strip("\n")
+            if path == "last":
+                return next((line for line in reversed(result.get("logs", [])) if line.strip()), "")
+            found: Any = result
+            for part in path.split("."):
+                if isinstance(found, list) and part.lstrip("-").isdigit():
+                    found = found[int(part)]
+                elif isinstance(found, dict) and part in found:
+                    found = found[part]
+                else:
+                    raise ValueError(f"${{{name}.{path}}} does not resolve")
+            return found
+
+        whole = AUTO_FORGE_PIPELINE_REF_PATTERN.fullmatch(value)
+        if whole is not None:
+            return _lookup(whole)
+        return AUTO_FORGE_PIPELINE_REF_PATTERN.sub(
+            lambda m: (lambda v: v if isinstance(v, str) else json.dumps(v))(_lookup(m)), value)
+
+    async def _rpc_tools_call(self, params: dict[str, Any],
+                              stdin_stream: Optional[_CoreMCPStreamType] = None,
+                              stdout_streams: Optional[list[_CoreMCPStreamType]] = None) -> dict[str, Any]:
         """
         Invoke a registered MCP tool as a subprocess by name.
         Args:
@@ -766,6 +3658,9 @@ class CoreMCPService:
                 - "name" (str): The registered tool's name.
                 - "arguments" (dict): Arguments to pass to the tool.
                   Must conform to the tool's `input_schema`.
+            stdin_stream (_CoreMCPStreamType, optional): Pipeline stream to use as the tool's stdin.
+            stdout_streams (list[_CoreMCPStreamType], optional): Pipeline streams fed with the tool's stdout.
+                Calls with streams always run locally.
         Returns:
             dict[str, Any]: The tool's result payload, as returned by
             `_run_one_cmdline_async` (JSON-serializable).
@@ -777,71 +3672,212 @@ class CoreMCPService:
         if not tool:
             raise KeyError(f"unknown tool: {name}")
 
-        # Start with the base command
-        argv: list[str] = [tool.command]
+        streaming = stdin_stream is not None or bool(stdout_streams)
+        agent = self._pick_agent(tool) if not streaming else None
+        if agent is not None:
+            return await self._run_on_agent(agent, tool, arguments)
+        if tool.daemon is not None:
+            if stdin_stream is not None:
+                raise ValueError(f"daemon tool '{name}' cannot read a stdin stream")
+            result = await self._run_on_daemon(tool, arguments)
+            # No live stdout to forward: consumers get the streamed log lines once the call is done
+            for consumer in stdout_streams or ():
+                if result["logs"]:
+                    await consumer.put(("\n".join(result["logs"]) + "\n").encode("utf-8"))
+                await consumer.put(None)
+            return result
+
+        # Start with the base command and static args. The argument vector is executed
+        # directly (no shell re-splitting), so values with spaces stay one argument.
+        argv: list[str] = [os.path.expandvars(a) for a in [tool.command, *tool.args]]
+        stdin_data: Optional[bytes] = None
+        param_files: list[str] = []
 
-        # Add static args
-        if tool.args:
-            argv.extend(tool.args)
-
-        # Add dynamic params from JSON -> CLI
-        for p in tool.params:
-            pname = p["name"]
-            if pname not in arguments:
-                continue
-
-            val = arguments[pname]
-            style = p.get("style", "flag")  # default to "flag"
-
-            if style == "positional":
-                argv.append(str(val))
-            elif style == "flag":
-                argv.extend([f"--{pname}", str(val)])
-            else:
-                raise ValueError(f"Unknown param style '{style}' for {pname}")
-
-        cmdline = " ".join(argv)
-        cmdline = os.path.expandvars(cmdline)
+        try:
+            # Add dynamic params from JSON -> CLI / stdin / file
+            for p in tool.params:
+                pname = p["name"]
+                if pname not in arguments:
+                    continue
+
+                val = arguments[pname]
+                style = p.get("style", "flag")  # default to "flag"
+
+                if style == "positional":
+                    argv.append(os.path.expandvars(str(val)))
+                elif style == "flag":
+                    argv.extend([f"--{pname}", os.path.expandvars(str(val))])
+                elif style == "stdin":
+                    if stdin_stream is not None:
+                        raise ValueError(f"'{pname}' is a stdin param, but stdin is streamed from another step")
+                    stdin_data = self._param_bytes(val)
+                elif style == "file":
+                    param_files.append(await asyncio.to_thread(self._write_param_file, self._param_bytes(val)))
+                    argv.append(param_files[-1])
+                else:
+                    raise ValueError(f"Unknown param style '{style}' for {pname}")
+
+            return await self._run_one_cmdline_async(
+                argv=argv,
+                cwd=tool.working_dir,
+                env=self._tool_env(tool),
+                limits=tool.limits,
+                stderr_metadata=tool.stderr_metadata,
+                stdin_data=stdin_data,
+                output=tool.output,
+                keywords=tool.keywords,
+                stdin_stream=stdin_stream,
+                stdout_streams=stdout_streams, )
+        finally:
+            for path in param_files:
+                with contextlib.suppress(OSError):
+                    os.unlink(path)
 
-        # Merge environment (base + tool-specific overrides)
-        env = {**os.environ, **tool.env}
+    @staticmethod
+    def _param_bytes(value: Any) -> bytes:
+        """ Payload of a stdin / file param: strings as UTF-8, anything else as JSON. """
+        if isinstance(value, str):
+            return value.encode("utf-8")
+        return json.dumps(value, ensure_ascii=False).encode("utf-8")
 
-        return await self._run_one_cmdline_async(
-            cmdline,
-            cwd=tool.working_dir,
-            env=env, )
+    @staticmethod
+    def _write_param_file(data: bytes) -> str:
+        """ Write a "file" style param to a private temp file (memory backed where available); returns its path. """
+        fd, path = tempfile.mkstemp(prefix="mcp-param-", dir=AUTO_FORGE_PARAM_FILE_DIR)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        return path
 
-    def _rpc_tools_list(self) -> dict[str, Any]:
+    def _rpc_tools_list(self, params: Optional[dict[str, Any]] = None) -> dict[str, Any]:
         """
-        List all registered MCP tools.
+        List the registered MCP tools.
+        Args:
+            params (dict[str, Any], optional): JSON-RPC params; "cursor" is the previous
+                page's "nextCursor".
         Returns:
             dict[str, Any]: A dictionary with key "tools" containing a list of
             tool descriptors, where each descriptor includes:
                 - "name" (str): Tool name.
                 - "description" (str): Tool description.
                 - "inputSchema" (dict): JSON Schema for the tool's input.
+            With `tools_list_page_size` set, at most that many tools and, when more
+            follow, "nextCursor". The catalog is built once and reused until the registry changes.
+        Raises:
+            ValueError: Malformed cursor.
+        """
+        if self._tools_list_cache is None:
+            tools = [self._tool_descriptor(t) for t in self._tools_registry.values()]
+            self._tools_list_cache = {"tools": tools}
+
+        cursor = (params or {}).get("cursor")
+        if self._tools_list_page_size <= 0 and cursor is None:
+            return self._tools_list_cache
+
+        tools = self._tools_list_cache["tools"]
+        offset = self._page_offset(cursor)
+        size = self._tools_list_page_size if self._tools_list_page_size > 0 else len(tools)
+        page: dict[str, Any] = {"tools": tools[offset:offset + size]}
+        if offset + size < len(tools):
+            page["nextCursor"] = str(offset + size)
+        return page
+
+    def _rpc_tools_search(self, params: dict[str, Any]) -> dict[str, Any]:
+        """
+        `tools/search`: ranked tools matching a free text query, looked up in the tool index
+        (built on the first search, then updated as tools are registered or removed).
+        Args:
+            params (dict[str, Any]): "query" (str), optional "limit" (default
+                AUTO_FORGE_TOOL_SEARCH_LIMIT, at most AUTO_FORGE_TOOL_SEARCH_MAX_LIMIT) and
+                "cursor" (the previous page's "nextCursor").
+        Returns:
+            dict[str, Any]: "tools" (descriptors as in `tools/list`, best match first, each
+            with its "score"), "total" matches and "nextCursor" when more follow.
+        Raises:
+            ValueError: Missing query or malformed paging params.
         """
-        tools = [{
-            "name": t.name,
-            "description": t.description,
-            "inputSchema": t.input_schema
-        } for t in self._tools_registry.values()]
+        query = params.get("query")
+        if not isinstance(query, str) or not query.strip():
+            raise ValueError("'query' must be a non-empty string")
+        limit = min(int(params.get("limit", AUTO_FORGE_TOOL_SEARCH_LIMIT)), AUTO_FORGE_TOOL_SEARCH_MAX_LIMIT)
+        if limit <= 0:
+            raise ValueError("'limit' must be positive")
+        offset = self._page_offset(params.get("cursor"))
+
+        if self._tool_index is None:
+            self._tool_index = CoreToolIndex()
+            for tool in self._tools_registry.values():
+                self._tool_index.add(tool.name, tool.description, tool.params)
+
+        hits, total = self._tool_index.search(query, limit=limit, offset=offset)
+        result: dict[str, Any] = {
+            "tools": [{**self._tool_descriptor(self._tools_registry[name]), "score": score}
+                      for name, score in hits if name in self._tools_registry],
+            "total": total,
+        }
+        if offset + limit < total:
+            result["nextCursor"] = str(offset + limit)
+        return result
 
-        return {"tools": tools}
+    @staticmethod
+    def _tool_descriptor(tool: _CoreMCPToolType) -> dict[str, Any]:
+        """ A tool as listed to clients. """
+        return {"name": tool.name, "description": tool.description, "inputSchema": tool.input_schema}
+
+    @staticmethod
+    def _page_offset(cursor: Any) -> int:
+        """ Offset encoded in a "nextCursor" (opaque to clients); None is the first page. """
+        if cursor is None:
+            return 0
+        offset = int(cursor)
+        if offset < 0:
+            raise ValueError("cursor must not be negative")
+        return offset
 
     async def _run_sse(self):
         """
         Internal async loop that configures and starts the SSE server.
 
         - Uses `aiohttp.web.AppRunner` to attach `self._app` to an HTTP server.
-        - Binds to the configured host and port.
-        - Stays alive indefinitely, sleeping in 1-hour intervals until stopped.
-        - Ensures cleanup of resources on shutdown.
+        - Listens on a socket inherited from a predecessor handing off (see `hand_off()`),
+          else binds the configured host and port, or the Unix domain socket when the
+          "unix" transport is selected; a waiting predecessor is told once it is serving.
+        - Stays alive until stopped, then shuts the runner down (closing SSE, WebSocket
+          and agent connections through the on_shutdown hooks).
         """
         runner = web.AppRunner(self._app)
         await runner.setup()
-        site = web.TCPSite(runner, self._mcp_config.host, self._mcp_config.port)
-        await site.start()
+
+        inherited_fd = os.environ.pop(AUTO_FORGE_LISTEN_FD_ENV, None)
+        ready_fd = os.environ.pop(AUTO_FORGE_READY_FD_ENV, None)
+        if inherited_fd is not None:
+            sock = socket.socket(fileno=int(inherited_fd))
+        elif self._mcp_config.transport == "unix":
+            socket_path = Path(self._mcp_config.unix_socket)
+            # A stale socket left by a previous run would make bind() fail
+            with contextlib.suppress(FileNotFoundError):
+                if socket_path.is_socket():
+                    socket_path.unlink()
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.bind(str(socket_path))
+        else:
+            if not isinstance(self._mcp_config.host, str):
+                self._mcp_config.host = self._mcp_server_bind_address or "127.0.0.1"
+            family = socket.AF_INET6 if ":" in self._mcp_config.host else socket.AF_INET
+            sock = socket.create_server((self._mcp_config.host, self._mcp_config.port), family=family)
+
+        self._listen_socket = sock
+        self._listen_site = web.SockSite(runner, sock)
+        await self._listen_site.start()
+        self._startup_report("listening")
+        if ready_fd is not None:
+            with contextlib.suppress(OSError):
+                os.write(int(ready_fd), b"1")
+                os.close(int(ready_fd))
+        heartbeat = asyncio.create_task(self._sse_heartbeat_loop())
 
         try:
             await self._shutdown_event.wait()  # Block until told to exit
@@ -849,9 +3885,281 @@ class CoreMCPService:
             # Handles task.cancel() if loop is being cancelled
             pass
         finally:
+            heartbeat.cancel()
             await runner.cleanup()
-            # Give aiohttp tasks a chance to settle
-            await asyncio.sleep(1)
+            # The successor keeps serving on the same socket path
+            if self._mcp_config.transport == "unix" and not self._handed_off:
+                with contextlib.suppress(OSError):
+                    os.unlink(self._mcp_config.unix_socket)
+
+    async def drain(self, timeout: Optional[float] = None) -> None:
+        """
+        Graceful shutdown: stop listening, refuse new tool calls (with a retry hint), let the
+        calls already running finish for up to `timeout` seconds, then stop the service.
+        Calls still running at the deadline are cancelled, which kills their processes.
+        SSE clients get a reconnect hint and WebSocket clients a close frame on the way out.
+        Args:
+            timeout (float, optional): Seconds to wait; defaults to the project's `drain_timeout`.
+        """
+        if self._draining:
+            return
+        self._draining = True
+        timeout = self._drain_timeout if timeout is None else timeout
+
+        # New connections are refused (or accepted by the successor sharing the socket)
+        if self._listen_site is not None:
+            with contextlib.suppress(Exception):
+                await self._listen_site.stop()
+
+        running = len(self._calls_in_flight)
+        self._log_line(f"Draining: waiting up to {timeout:g} s for {running} running call(s)", level="warning")
+        try:
+            await asyncio.wait_for(self._calls_idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            self._log_line(f"Drain deadline reached: cancelling {len(self._calls_in_flight)} call(s)",
+                           level="warning")
+            for task in list(self._calls_in_flight):
+                task.cancel()
+            await asyncio.sleep(0)  # Let the cancelled calls kill their processes
+        self.stop()
+
+    async def hand_off(self) -> bool:
+        """
+        Zero-downtime restart: start a new copy of the service (`restart_argv`) that inherits
+        the listening socket, wait until it is serving on it, then drain this one. The
+        socket is never closed, so clients are not refused during the upgrade. If the new
+        process fails to start serving it is killed, and this one keeps serving.
+        Returns:
+            bool: True if the successor took over.
+        """
+        if self._draining or self._listen_socket is None or self._restart_argv is None:
+            self._log_line("Hand-off unavailable: needs a listening socket and a restart command "
+                           "(started from mcp.py with the tcp or unix transport)", level="warning")
+            return False
+
+        listen_fd = self._listen_socket.fileno()
+        ready_r, ready_w = os.pipe()
+        try:
+            successor = subprocess.Popen(self._restart_argv, cwd=self._restart_cwd,
+                                         env={**os.environ, AUTO_FORGE_LISTEN_FD_ENV: str(listen_fd),
+                                              AUTO_FORGE_READY_FD_ENV: str(ready_w)},
+                                         pass_fds=(listen_fd, ready_w), start_new_session=True)
+        except OSError as spawn_error:
+            os.close(ready_r)
+            self._log_line(f"Hand-off failed: {spawn_error}", level="error")
+            return False
+        finally:
+            os.close(ready_w)
+
+        # The successor writes one byte once it serves; EOF means it exited first
+        loop = asyncio.get_running_loop()
+        ready: asyncio.Future = loop.create_future()
+        loop.add_reader(ready_r, lambda: ready.done() or ready.set_result(os.read(ready_r, 1)))
+        try:
+            took_over = await asyncio.wait_for(ready, AUTO_FORGE_HANDOFF_TIMEOUT) == b"1"
+        except asyncio.TimeoutError:
+            took_over = False
+        finally:
+            loop.remove_reader(ready_r)
+            os.close(ready_r)
+
+        if not took_over:
+            with contextlib.suppress(OSError):
+                successor.kill()
+            self._log_line("Hand-off failed: the new process did not start serving", level="error")
+            return False
+
+        self._log_line(f"Handed off to pid {successor.pid}, draining")
+        self._handed_off = True
+        await self.drain()
+        return True
+
+    async def _run_stdio(self):
+        """
+        MCP stdio transport: newline-delimited JSON-RPC on stdin/stdout.
+
+        - Each line read from stdin is one JSON-RPC message or batch.
+        - Messages are dispatched concurrently through `_dispatch_rpc_payload()`,
+          so a long `tools/call` does not hold back a `ping`.
+        - Replies are written to stdout as single compact JSON lines; notifications
+          produce no output. Logs go to stderr (see `_log_fd`).
+        - Returns when stdin reaches EOF or shutdown is requested.
+        - Pipes, sockets and terminals are read and written asynchronously; regular files
+          (`mcp.py -t stdio < requests.jsonl > replies.jsonl`) cannot be polled, so they
+          are read and written with blocking calls in worker threads.
+        Raises:
+            RuntimeError: stdin or stdout is neither of those (e.g. a directory or a block device).
+        """
+        loop = asyncio.get_running_loop()
+        stdin_file, stdout_file = self._stdio_is_file(sys.stdin), self._stdio_is_file(sys.stdout)
+
+        reader: Optional[asyncio.StreamReader] = None
+        if stdin_file:
+            stdin = sys.stdin.buffer
+
+            async def _read_line() -> bytes:
+                return await asyncio.to_thread(stdin.readline, AUTO_FORGE_MAX_MESSAGE_SIZE)
+        else:
+            reader = asyncio.StreamReader(limit=AUTO_FORGE_MAX_MESSAGE_SIZE)
+            await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+            _read_line = reader.readline
+
+        writer: Optional[asyncio.StreamWriter] = None
+        if stdout_file:
+            stdout, write_lock = sys.stdout.buffer, asyncio.Lock()
+
+            def _write_flush(_data: bytes) -> None:
+                stdout.write(_data)
+                stdout.flush()
+
+            async def _write(_data: bytes) -> None:
+                async with write_lock:  # One reply at a time: replies must not interleave
+                    await asyncio.to_thread(_write_flush, _data)
+        else:
+            w_transport, w_protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout)
+            writer = asyncio.StreamWriter(w_transport, w_protocol, reader, loop)
+
+            async def _write(_data: bytes) -> None:
+                writer.write(_data)
+                with contextlib.suppress(ConnectionError):
+                    await writer.drain()
+
+        pending: set[asyncio.Task] = set()
+        self._stdio_write = _write
+        self._startup_report("listening")
+
+        async def _serve_line(_line: bytes) -> None:
+            try:
+                payload: Any = json.loads(_line)
+            except Exception as parse_error:
+                reply: Any = self._jr_err(jid=None, code=-32700, message="Parse error", data=str(parse_error))
+            else:
+                reply = await self._dispatch_rpc_payload(payload, client_id="stdio")
+
+            if reply is not None:
+                await _write(json.dumps(reply, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n")
+
+        shutdown_wait = asyncio.ensure_future(self._shutdown_event.wait())
+        try:
+            while not self._shutdown_event.is_set():
+                read_line = asyncio.ensure_future(_read_line())
+                await asyncio.wait({read_line, shutdown_wait}, return_when=asyncio.FIRST_COMPLETED)
+                if not read_line.done():
+                    read_line.cancel()
+                    break
+
+                raw_line = read_line.result()
+                line = raw_line.strip()
+                if not line:
+                    if not raw_line or (reader is not None and reader.at_eof()):
+                        break  # EOF
+                    continue
+                if self._startup_t0 is not None:
+                    self._startup_report("first message accepted", final=True)
+
+                task = asyncio.create_task(_serve_line(line))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+
+            # Let in-flight calls finish and flush their replies
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            self._stdio_write = None
+            shutdown_wait.cancel()
+            if writer is not None:
+                with contextlib.suppress(Exception):
+                    writer.close()
+
+    @staticmethod
+    def _stdio_is_file(stream: Any) -> bool:
+        """
+        Whether a standard stream is a regular file (True), or something the event loop can
+        poll: a pipe, socket or character device (False).
+        Raises:
+            RuntimeError: Any other kind of file, which the stdio transport cannot serve.
+        """
+        mode = os.fstat(stream.fileno()).st_mode
+        if stat.S_ISREG(mode):
+            return True
+        if stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode) or stat.S_ISCHR(mode):
+            return False
+        raise RuntimeError(f"stdio transport: {stream.name} must be a pipe, socket, terminal or regular file")
+
+    async def _loop_lag_probe(self) -> None:
+        """
+        Measure event loop scheduling delay: sleep for a fixed interval and record how much
+        later than asked the probe woke up. A long delay means synchronous work (JSON
+        encoding of a large reply, a file read, a slow log write) held the loop and every
+        client waited for it; those are logged, at most once per AUTO_FORGE_LOOP_LAG_WARN_EVERY.
+        """
+        loop = asyncio.get_running_loop()
+        last_warning = -math.inf
+        while not self._shutting_down:
+            expected = loop.time() + self._loop_lag_interval
+            await asyncio.sleep(self._loop_lag_interval)
+            lag = max(0.0, loop.time() - expected)
+            stalled = lag > self._loop_lag_warn
+            self._loop_lag.record(lag, stalled)
+            if stalled and expected - last_warning >= AUTO_FORGE_LOOP_LAG_WARN_EVERY:
+                last_warning = expected
+                self._log_line(f"Event loop blocked for {lag * 1000:.0f} ms "
+                               f"(last request: {self._last_rpc_method or 'none'})", level="warning")
+
+    def _new_event_loop(self) -> asyncio.AbstractEventLoop:
+        """ Create the loop start() runs on: uvloop when configured and installed, else asyncio's. """
+        if self._event_loop == "uvloop":
+            if uvloop is not None:
+                return uvloop.new_event_loop()
+            self._log_line("event_loop 'uvloop' requested but uvloop is not installed, using asyncio",
+                           level="warning")
+        return asyncio.new_event_loop()
+
+    async def serve(self) -> None:
+        """
+        Run the configured transport until `stop()` is called (or stdin closes for stdio).
+        Unlike `start()`, this does not print the banner, install signal handlers or
+        manage the event loop, which makes it suitable for embedding and benchmarks.
+        Also runs the project file watcher when hot reload is enabled, and the event
+        loop lag probe.
+        """
+        if self._diagnostics is not None:
+            self._diagnostics.install(asyncio.get_running_loop())
+        # Agents execute on behalf of a coordinator, which keeps the job history
+        if self._job_store_config is not None and self._job_store is None and self._mcp_config.transport != "agent":
+            # A successor shares the database with its predecessor while that one drains
+            self._job_store = await asyncio.to_thread(CoreJobStore, self._job_store_config, self._project_base_path,
+                                                      AUTO_FORGE_LISTEN_FD_ENV in os.environ)
+        watcher: Optional[asyncio.Task] = None
+        if self._project_reload_interval > 0 and self._project_path is not None and self._project_loader:
+            watcher = asyncio.create_task(self._watch_project_loop())
+        lag_probe: Optional[asyncio.Task] = None
+        if self._loop_lag_interval > 0:
+            lag_probe = asyncio.create_task(self._loop_lag_probe())
+        try:
+            if self._mcp_config.transport == "stdio":
+                await self._run_stdio()
+            elif self._mcp_config.transport == "agent":
+                await self._run_agent()
+            else:
+                await self._run_sse()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            if lag_probe is not None:
+                lag_probe.cancel()
+            await asyncio.gather(*(tool.daemon.close() for tool in self._tools_registry.values()
+                                   if tool.daemon is not None), *self._retiring_daemons, return_exceptions=True)
+            if self._job_store is not None:
+                await asyncio.to_thread(self._job_store.close)
+                self._job_store = None
+            if self._diagnostics is not None:
+                self._diagnostics.uninstall()
+
+    def stop(self) -> None:
+        """ Ask a running `serve()` to return. """
+        self._shutting_down = True
+        self._shutdown_event.set()
 
     @staticmethod
     def _remove_vscode_config(base_path: Optional[Union[Path, str]],
@@ -983,6 +4291,8 @@ class CoreMCPService:
             show_examples: If True, show example commands.
             host_bind_address (optional str): Bind address to bind to the MCP server.
         """
+        # Third-party (only needed for the banner)
+        from colorama import Fore, Style
 
         base = f"http://{host}:{port}"
         title = f"{Fore.CYAN}MCP SSE Service Info:{Style.RESET_ALL}"
@@ -993,6 +4303,7 @@ class CoreMCPService:
         print(f"{Fore.YELLOW}- Base:{Style.RESET_ALL}                  {Fore.GREEN}{base}{Style.RESET_ALL}")
         print(f"{Fore.YELLOW}- SSE stream:{Style.RESET_ALL}            {Fore.GREEN}{base}/sse{Style.RESET_ALL}")
         print(f"{Fore.YELLOW}- JSON-RPC message bus:{Style.RESET_ALL}  {Fore.GREEN}{base}/message{Style.RESET_ALL}")
+        print(f"{Fore.YELLOW}- WebSocket:{Style.RESET_ALL}             {Fore.GREEN}ws://{host}:{port}/ws{Style.RESET_ALL}")
         print(f"{Fore.YELLOW}- Name:{Style.RESET_ALL}                  {Fore.GREEN}{server_name}{Style.RESET_ALL}")
         if isinstance(host_bind_address, str):
             print(
@@ -1023,6 +4334,12 @@ class CoreMCPService:
                   "\\\"arguments\\\":{\\\"name\\\":\\\"Alice\\\"}}}\" "
                   f"http://{host_colored}:{port_colored}/message | jq{Style.RESET_ALL}")
 
+            print(f"\n{Fore.YELLOW}4. Execute 'greet_user' over REST, streaming its output as NDJSON:{Style.RESET_ALL}")
+            print(f"   {curl} -s -N --noproxy {host_colored} "
+                  "-H \"Accept: application/x-ndjson\" "
+                  "-d \"{\\\"arguments\\\":{\\\"name\\\":\\\"Alice\\\"}}\" "
+                  f"http://{host_colored}:{port_colored}/tool/greet_user{Style.RESET_ALL}")
+
         print(
             f"\n{Fore.MAGENTA}Running... Press {Style.BRIGHT}{Fore.RED}Ctrl+C{Style.RESET_ALL}{Fore.MAGENTA} to stop.{Style.RESET_ALL}\n")
 
@@ -1032,13 +4349,39 @@ class CoreMCPService:
         Attempts to determine the system's primary external IPv4 address
         (non-loopback) by connecting to a known public IP (Google DNS at 8.8.8.8).
         This does not require actual network reachability, no data is sent.
+        The probe, the VS Code config patching and the banner are TCP-only; the
+        Unix socket and stdio transports start serving right away.
         Runs the asynchronous SSE server loop until interrupted.
+        SIGINT / SIGTERM drain the service (see `drain()`); a second signal, or a
+        `drain_timeout` of 0, stops it at once. SIGUSR2 hands the listening socket
+        over to a freshly started copy (see `hand_off()`).
 
         Returns:
             int: 0 if the server started successfully, 1 if an exception occurred.
         """
+        background: set[asyncio.Task] = set()
+
+        def _run_in_background(coro) -> None:
+            task = loop.create_task(coro)
+            background.add(task)
+            task.add_done_callback(background.discard)
+
+        def _remove_vscode_config() -> None:
+            # The successor of a hand-off serves the same address: keep its entry
+            if self._patch_vscode_config and self._mcp_config.transport == "tcp" and not self._handed_off:
+                self._remove_vscode_config(
+                    base_path=None,
+                    host=self._mcp_config.advertise_ip,
+                    port=self._mcp_config.port,
+                    server_name=self._mcp_server_name, )
 
         def _handle_term_signal():
+            if not self._draining and self._drain_timeout > 0:
+                self._log_line(msg=f"Interrupted, finishing running calls (interrupt again to stop now)",
+                               level="warning")
+                _run_in_background(self.drain())
+                return
+
             self._log_line(msg=f"Interrupted by user, shutting down", level="warning")
 
             self._shutting_down = True
@@ -1049,12 +4392,7 @@ class CoreMCPService:
                 task.cancel()
 
             # Remove VSCode config if needed
-            if self._patch_vscode_config:
-                self._remove_vscode_config(
-                    base_path=None,
-                    host=self._mcp_config.advertise_ip,
-                    port=self._mcp_config.port,
-                    server_name=self._mcp_server_name, )
+            _remove_vscode_config()
             # Terminate
             if self._brutal_termination:
                 os.kill(os.getpid(), signal.SIGKILL)
@@ -1063,55 +4401,68 @@ class CoreMCPService:
 
         try:
 
-            # Determine the outward-facing local IP by opening a dummy UDP socket
-            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
-                s.connect(("8.8.8.8", 80))
-                self._mcp_config.advertise_ip = s.getsockname()[0]
-
-            if not isinstance(self._mcp_config.advertise_ip, str):
-                raise RuntimeError("Could not determine local IP address")
-
-            # Choose which host address to bind the server to:
-            # If a specific bind address is provided in the project JSON, use that.
-            # Otherwise, fall back to the discovered local IP.
-            # Note: binding to 0.0.0.0 (all interfaces) can sometimes resolve connectivity issues.
-
-            if isinstance(self._mcp_server_bind_address, str):
-                self._mcp_config.host = self._mcp_server_bind_address
+            if self._mcp_config.transport == "tcp":
+                # Determine the outward-facing local IP by opening a dummy UDP socket
+                with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                    s.connect(("8.8.8.8", 80))
+                    self._mcp_config.advertise_ip = s.getsockname()[0]
+
+                if not isinstance(self._mcp_config.advertise_ip, str):
+                    raise RuntimeError("Could not determine local IP address")
+
+                # Choose which host address to bind the server to:
+                # If a specific bind address is provided in the project JSON, use that.
+                # Otherwise, fall back to the discovered local IP.
+                # Note: binding to 0.0.0.0 (all interfaces) can sometimes resolve connectivity issues.
+
+                if isinstance(self._mcp_server_bind_address, str):
+                    self._mcp_config.host = self._mcp_server_bind_address
+                else:
+                    self._mcp_config.host = self._mcp_config.advertise_ip
+
+                if not isinstance(self._mcp_config.host, str):
+                    raise RuntimeError("Failed to resolve a valid host address")
+
+                # Create VSCode 'mcp.json' file in the solution workspace
+                if self._patch_vscode_config:
+                    self._generate_vscode_config(base_path=None, host=self._mcp_config.advertise_ip,
+                                                 port=self._mcp_config.port, server_name=self._mcp_server_name,
+                                                 overwrite_existing=True, create_parents=True)
+
+                # Show welcome message and usage examples
+                self._greetings(host=self._mcp_config.advertise_ip, port=self._mcp_config.port,
+                                server_name=self._mcp_server_name, show_examples=self._show_usage_examples,
+                                host_bind_address=self._mcp_server_bind_address)
+
+            elif self._mcp_config.transport == "unix":
+                self._log_line(msg=f"'{self._mcp_server_name}' listening on unix:{self._mcp_config.unix_socket}")
+            elif self._mcp_config.transport == "agent":
+                self._log_line(msg=f"'{self._mcp_server_name}' agent '{self._mcp_config.agent_name}' "
+                                   f"({self._mcp_config.agent_slots} slots) serving {self._mcp_config.agent_url}")
             else:
-                self._mcp_config.host = self._mcp_config.advertise_ip
-
-            if not isinstance(self._mcp_config.host, str):
-                raise RuntimeError("Failed to resolve a valid host address")
-
-            # Create VSCode 'mcp.json' file in the solution workspace
-            if self._patch_vscode_config:
-                self._generate_vscode_config(base_path=None, host=self._mcp_config.advertise_ip,
-                                             port=self._mcp_config.port, server_name=self._mcp_server_name,
-                                             overwrite_existing=True, create_parents=True)
-
-            # Show welcome message and usage examples
-            self._greetings(host=self._mcp_config.advertise_ip, port=self._mcp_config.port,
-                            server_name=self._mcp_server_name, show_examples=self._show_usage_examples,
-                            host_bind_address=self._mcp_server_bind_address)
+                self._log_line(msg=f"'{self._mcp_server_name}' serving JSON-RPC on stdio")
 
             # Prepare asyncio loop
             try:
                 loop = asyncio.get_running_loop()
             except RuntimeError:
-                loop = asyncio.new_event_loop()
+                loop = self._new_event_loop()
                 asyncio.set_event_loop(loop)
 
             # Attach signal handlers so Ctrl+C triggers shutdown cleanly
             for sig in (signal.SIGINT, signal.SIGTERM):
                 # noinspection PyTypeChecker
                 loop.add_signal_handler(sig, _handle_term_signal)
+            if hasattr(signal, "SIGUSR2"):
+                loop.add_signal_handler(signal.SIGUSR2, lambda: _run_in_background(self.hand_off()))
 
-            # Run the SSE server
+            # Run the selected transport
             if loop.is_running():
-                asyncio.create_task(self._run_sse())
+                asyncio.create_task(self.serve())
             else:
-                loop.run_until_complete(self._run_sse())
+                loop.run_until_complete(self.serve())
+                if self._draining:
+                    _remove_vscode_config()
 
             return 0
 
@@ -1120,7 +4471,8 @@ class CoreMCPService:
         except Exception as e:
             if self._shutting_down:
                 self._log_line(msg=f"MCP server terminated", level="debug")
-                print()
+                if self._mcp_config.transport != "stdio":
+                    print()
                 return 0
             self._log_line(msg=f"MCP Error: {e}", level="error")
             return 1
@@ -11,7 +11,7 @@ import os
 import re
 import shutil
 import string
-from typing import Optional, Tuple
+from typing import Any, Optional, Tuple
 
 # MCP Service imports
 from logger import CoreMCPLogger
@@ -21,6 +21,20 @@ from logger import CoreMCPLogger
 AUTO_FORGE_MODULE_NAME = "Platform"
 AUTO_FORGE_MODULE_DESCRIPTION = "Platform Services"
 
+# Patterns are compiled once at import; the helpers below run per output line
+_ANSI_CSI_PATTERN = re.compile(r'\x1b\[[0-?]*[ -/]*[@-~]')
+_ANSI_ESCAPE_PATTERN = re.compile(r'''
+    \x1B
+    (?:
+        [@-Z\\-_] |
+        \[ [0-?]* [ -/]* [@-~]
+    )
+''', re.VERBOSE)
+_BROKEN_LINK_PATTERN = re.compile(r'\[(https?://[^]]+)]')
+_WARNING_FLAG_PATTERN = re.compile(r'(-W[\w\-]+)')
+_NON_PRINTABLE_PATTERN = re.compile(f"[^{re.escape(string.ascii_letters + string.digits + string.punctuation)} \t\n]+")
+_LINE_ENDING_PATTERN = re.compile(r'(\r?\n|\r)$')
+
 
 class CorePlatform:
     """
@@ -34,7 +48,7 @@ class CorePlatform:
         """
         self._workspace_path: Optional[str] = workspace_path
         self._subprocess_execution_timeout: int = 30
-        self._pre_compiled_escape_patterns = re.compile(r'\x1b\[[0-?]*[ -/]*[@-~]')
+        self._pre_compiled_escape_patterns = _ANSI_CSI_PATTERN
         # Set an optional list of keywords which, when found in command output, will be colorized using ANSI colors
         self._build_colorize_keywords: list = []
 
@@ -129,7 +143,26 @@ class CorePlatform:
             Calculates the visible width of a string by removing ANSI escape codes.
             This assumes escape codes don't affect character width (e.g., no double-width chars).
             """
-            return len(self._pre_compiled_escape_patterns.sub('', text))
+            return len(self._pre_compiled_escape_patterns.sub('', _text))
+
+        def _truncate_visible(_text: str, _visible: int) -> str:
+            """
+            Keep the first `_visible` visible characters of a string, along with the escape
+            codes among them. Works on whole runs between escape codes, not per character.
+            """
+            kept = []
+            remaining = _visible
+            position = 0
+            for code in self._pre_compiled_escape_patterns.finditer(_text):
+                run = _text[position:code.start()]
+                if len(run) >= remaining:
+                    break
+                kept.append(run)
+                kept.append(code.group(0))
+                remaining -= len(run)
+                position = code.end()
+            kept.append(_text[position:position + remaining])
+            return "".join(kept)
 
         if not isinstance(text, str):
             return text
@@ -146,7 +179,7 @@ class CorePlatform:
         dots = "." * dots_length
 
         # Pattern to extract the trailing newline sequence (including \r\n, \n, \r)
-        newline_pattern = re.compile(r'(\r?\n|\r)$')
+        newline_pattern = _LINE_ENDING_PATTERN
 
         truncated_segments = []
         # splitlines(keepends=True) correctly separates lines and keeps their specific endings
@@ -193,33 +226,8 @@ class CorePlatform:
                     # Fill with as many dots as possible, preserving trailing codes and ending
                     truncated_segment_text = "." * effective_width
                 else:
-                    current_visible_length = 0
-                    truncated_text_chars = []
-                    # Iterate through the characters of the string (excluding trailing codes)
-                    # and build up the truncated string while tracking visible width.
-                    idx = 0
-                    while idx < len(
-                            content_without_trailing_codes) and current_visible_length < target_visible_length:
-                        char = content_without_trailing_codes[idx]
-                        if char == '\x1b' and self._pre_compiled_escape_patterns.match(
-                                content_without_trailing_codes,
-                                idx):
-                            # It's the start of an escape sequence, find its end
-                            match: re.Match = self._pre_compiled_escape_patterns.match(
-                                content_without_trailing_codes,
-                                idx)
-                            if match:
-                                # Add the full escape sequence without counting it towards visible width
-                                truncated_text_chars.append(match.group(0))
-                                idx = match.end()
-                                continue
-
-                        # Regular character, count it
-                        truncated_text_chars.append(char)
-                        current_visible_length += 1
-                        idx += 1
-
-                    truncated_segment_text = "".join(truncated_text_chars) + dots
+                    truncated_segment_text = _truncate_visible(content_without_trailing_codes,
+                                                               target_visible_length) + dots
 
                 # Combine truncated text with preserved trailing codes and line ending
                 truncated_segments.append(truncated_segment_text + trailing_codes + line_ending)
@@ -251,28 +259,166 @@ class CorePlatform:
             return text
 
         # Strip ANSI escape sequences (CSI, OSC, etc.)
-        ansi_escape = re.compile(r'''
-            \x1B
-            (?:
-                [@-Z\\-_] |
-                \[ [0-?]* [ -/]* [@-~]
-            )
-        ''', re.VERBOSE)
-        text = ansi_escape.sub('', text)
+        text = _ANSI_ESCAPE_PATTERN.sub('', text)
         if not text:
             return text
 
         def _recover_warning_flag(match):
             """ # Extract and preserve [-W...warning...] from broken [https://...] blocks """
             url = match.group(1)
-            warning_match = re.search(r'(-W[\w\-]+)', url)
+            warning_match = _WARNING_FLAG_PATTERN.search(url)
             return f"[{warning_match.group(1)}]" if warning_match else ""
 
-        text = re.sub(r'\[(https?://[^]]+)]', _recover_warning_flag, text).strip()
+        text = _BROKEN_LINK_PATTERN.sub(_recover_warning_flag, text).strip()
 
         # Optionally reduce to printable ASCII
         if bare_text:
-            allowed = set(string.ascii_letters + string.digits + string.punctuation + ' \t\n')
-            text = ''.join(c for c in text if c in allowed)
+            text = _NON_PRINTABLE_PATTERN.sub('', text)
 
         return text.strip()
+
+
+class CoreOutputPipeline:
+    """
+    Streaming post-processing of tool output, one line at a time.
+    Stages, applied in this order when enabled:
+        collapse_cr      : Keep only the last carriage-return separated update of a line (progress bars).
+        strip_ansi       : Remove ANSI escape sequences (colors, cursor movement).
+        max_line_length  : Cut longer lines, noting how many characters were dropped.
+        dedupe           : Collapse runs of identical lines into one line and a repeat count.
+    One instance holds the state of one stream; create a new one per stream and run.
+    """
+
+    OPTIONS = ("collapse_cr", "strip_ansi", "max_line_length", "dedupe")
+
+    def __init__(self, collapse_cr: bool = False, strip_ansi: bool = False, max_line_length: int = 0,
+                 dedupe: bool = False):
+        self._collapse_cr = bool(collapse_cr)
+        self._strip_ansi = bool(strip_ansi)
+        self._max_line_length = int(max_line_length or 0)
+        self._dedupe = bool(dedupe)
+        self._previous: Optional[str] = None
+        self._repeats = 0
+
+    @classmethod
+    def validate(cls, config: Any) -> Optional[dict[str, Any]]:
+        """
+        Check a tool's "output" entry.
+        Returns:
+            The options to construct pipelines with, or None when no stage is enabled.
+        Raises:
+            ValueError: Unknown option or invalid value.
+        """
+        if not config:
+            return None
+        if not isinstance(config, dict):
+            raise ValueError("'output' must be an object")
+        unknown = sorted(set(config) - set(cls.OPTIONS))
+        if unknown:
+            raise ValueError(f"unknown output options: {', '.join(unknown)}")
+        max_line_length = config.get("max_line_length") or 0
+        if not isinstance(max_line_length, int) or max_line_length < 0:
+            raise ValueError("'max_line_length' must be a non-negative integer")
+        return config if any(config.values()) else None
+
+    def _repeat_note(self) -> str:
+        note = f"[previous line repeated {self._repeats} more time{'s' if self._repeats > 1 else ''}]"
+        self._repeats = 0
+        return note
+
+    def process(self, line: str) -> list[str]:
+        """
+        Run one raw output line through the enabled stages.
+        Returns:
+            The lines to publish: none (a repeat being counted), the line, or a pending
+            repeat note followed by the line.
+        """
+        if self._collapse_cr and "\r" in line:
+            line = line.rstrip("\r").rsplit("\r", 1)[-1]
+        if self._strip_ansi and "\x1b" in line:
+            line = _ANSI_ESCAPE_PATTERN.sub('', line)
+        if self._max_line_length and len(line) > self._max_line_length:
+            line = f"{line[:self._max_line_length]}... [{len(line) - self._max_line_length} more chars]"
+
+        if not self._dedupe:
+            return [line]
+        if line == self._previous:
+            self._repeats += 1
+            return []
+        self._previous = line
+        return [self._repeat_note(), line] if self._repeats else [line]
+
+    def flush(self) -> list[str]:
+        """ Lines still held back at end of stream (a pending repeat note). """
+        return [self._repeat_note()] if self._repeats else []
+
+
+class CoreKeywordScanner:
+    """
+    Case-insensitive multi-keyword matcher for tool output.
+    Keywords are grouped under labels (e.g. {"error": ["error:", "fatal"], "warning": ["warning:"]})
+    and compiled into one regular expression shaped as a trie (shared prefixes are factored
+    out), so a line is scanned once, branching on one character per position, regardless of
+    how many keywords are configured; `CorePlatform.find_pattern_in_line` scans once per keyword.
+    """
+
+    def __init__(self, keywords: dict[str, list[str]]):
+        self.labels: tuple[str, ...] = tuple(keywords)
+        self._labels_by_word: dict[str, str] = {}
+        for label, words in keywords.items():
+            for word in words:
+                self._labels_by_word.setdefault(word.lower(), label)
+        self._pattern = re.compile(self._trie_pattern(sorted(self._labels_by_word)))
+
+    @classmethod
+    def _trie_pattern(cls, words: list[str]) -> str:
+        """ Regex source matching any of `words` (sorted), with common prefixes factored out. """
+        branches: dict[str, list[str]] = {}
+        terminal = False
+        for word in words:
+            if word:
+                branches.setdefault(word[0], []).append(word[1:])
+            else:
+                terminal = True
+        if not branches:
+            return ""
+
+        parts = []
+        for first, rests in branches.items():
+            parts.append(re.escape(first) + cls._trie_pattern(rests))
+        body = parts[0] if len(parts) == 1 and not terminal else f"(?:{'|'.join(parts)})"
+        # A word ending here: the longer continuations are tried first, then the word itself
+        return f"{body}?" if terminal else body
+
+    @classmethod
+    def from_config(cls, config: Any) -> Optional["CoreKeywordScanner"]:
+        """
+        Build a scanner from a tool's "keywords" entry.
+        Raises:
+            ValueError: The entry is not a {label: [keyword, ...]} object.
+        """
+        if not config:
+            return None
+        if not isinstance(config, dict) or not all(
+                isinstance(words, list) and words and all(isinstance(w, str) and w for w in words)
+                for words in config.values()):
+            raise ValueError("'keywords' must map labels to non-empty lists of strings")
+        return cls(config)
+
+    def scan(self, line: str) -> list[tuple[str, int, str]]:
+        """
+        Find the labels present in a line.
+        Returns:
+            One (label, column, keyword) tuple per label found, at its first position (the
+            keyword in lower case); empty for the common case of a line without keywords.
+        """
+        folded = line.lower()
+        if self._pattern.search(folded) is None:
+            return []
+
+        found: dict[str, tuple[str, int, str]] = {}
+        for match in self._pattern.finditer(folded):
+            label = self._labels_by_word[match.group(0)]
+            if label not in found:
+                found[label] = (label, match.start(), match.group(0))
+        return list(found.values())
@@ -0,0 +1,131 @@
+"""
+Script:         tool_index.py
+Author:         DevOps Team
+
+Description:
+    Inverted index over the MCP tool catalog, behind `tools/search`.
+    Tool names, parameter names and descriptions are split into lowercase tokens when a
+    tool is indexed; a search looks its terms up in the postings (exact tokens, and
+    tokens the term is a prefix of) instead of scanning every tool, so clients of large
+    generated catalogs can find a tool without downloading the whole `tools/list`.
+"""
+
+import bisect
+import heapq
+import math
+import re
+from typing import Any, Iterable, Optional
+
+AUTO_FORGE_MODULE_NAME = "ToolIndex"
+AUTO_FORGE_MODULE_DESCRIPTION = "Inverted index and ranked search over registered tools"
+
+# Weight of a token by the field it was found in; a token found in several fields keeps the highest
+AUTO_FORGE_TOOL_INDEX_NAME_WEIGHT = 4.0
+AUTO_FORGE_TOOL_INDEX_PARAM_WEIGHT = 2.0
+AUTO_FORGE_TOOL_INDEX_TEXT_WEIGHT = 1.0
+AUTO_FORGE_TOOL_INDEX_PREFIX_FACTOR = 0.5  # A term matching only the start of a token counts this much
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset(("a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of",
+                         "on", "or", "that", "the", "this", "to", "with"))
+
+
+def _tokens(text: str) -> list[str]:
+    """ Lowercase word tokens of `text`; names split on "_" and "-" as well. """
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in _STOP_WORDS]
+
+
+class CoreToolIndex:
+    """
+    Token -> {tool name: weight} postings for the registered tools.
+    Adding a tool that is already indexed replaces it, so the index follows project reloads.
+    Indexing costs about as much as registering the tool, so the service builds the index on
+    the first search rather than at startup, and keeps it current from then on.
+    """
+
+    def __init__(self) -> None:
+        self._postings: dict[str, dict[str, float]] = {}
+        self._documents: dict[str, tuple[str, ...]] = {}  # Tool name -> its tokens, for removal
+        self._vocabulary: Optional[list[str]] = None  # Sorted tokens for prefix lookups, rebuilt after changes
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, name: str, description: str, params: Iterable[dict[str, Any]]) -> None:
+        """
+        Index (or re-index) one tool.
+        Args:
+            name (str): Tool name.
+            description (str): Tool description.
+            params (Iterable[dict[str, Any]]): Declared params; their names and descriptions are indexed.
+        """
+        self.remove(name)
+        params = list(params)
+        texts = " ".join([description or "", *(str(p.get("description", "")) for p in params)])
+
+        # Lowest weight first: a token repeated in a stronger field is overwritten with its weight
+        weights = dict.fromkeys(_TOKEN_PATTERN.findall(texts.lower()), AUTO_FORGE_TOOL_INDEX_TEXT_WEIGHT)
+        weights.update(dict.fromkeys(_TOKEN_PATTERN.findall(" ".join(str(p.get("name", "")) for p in params).lower()),
+                                     AUTO_FORGE_TOOL_INDEX_PARAM_WEIGHT))
+        weights.update(dict.fromkeys(_TOKEN_PATTERN.findall(name.lower()), AUTO_FORGE_TOOL_INDEX_NAME_WEIGHT))
+        for stop_word in _STOP_WORDS.intersection(weights):
+            del weights[stop_word]
+
+        vocabulary_size = len(self._postings)
+        postings = self._postings
+        for token, weight in weights.items():
+            postings.setdefault(token, {})[name] = weight
+        if len(postings) != vocabulary_size:
+            self._vocabulary = None
+        self._documents[name] = tuple(weights)
+
+    def remove(self, name: str) -> None:
+        """ Drop a tool from the index (no-op if it is not indexed). """
+        for token in self._documents.pop(name, ()):
+            postings = self._postings[token]
+            del postings[name]
+            if not postings:
+                del self._postings[token]
+                self._vocabulary = None
+
+    def search(self, query: str, limit: int, offset: int = 0) -> tuple[list[tuple[str, float]], int]:
+        """
+        Rank the tools matching `query`.
+        Tools matching more of the query terms come first, then by score: the field weight of
+        each matched term (halved for prefix-only matches) times the term's rarity, so a term
+        shared by half the catalog says less than one found in a single tool.
+        Args:
+            query (str): Free text; its terms are matched as whole tokens or token prefixes.
+            limit (int): Results returned at most.
+            offset (int): Ranked results skipped (pagination).
+        Returns:
+            tuple[list[tuple[str, float]], int]: The (tool name, score) page, and the number of
+            tools matching at least one term.
+        """
+        terms = list(dict.fromkeys(_tokens(query)))
+        if not terms or limit <= 0:
+            return [], 0
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+
+        scores: dict[str, float] = {}
+        matched: dict[str, int] = {}
+        total_tools = max(1, len(self._documents))
+        for term in terms:
+            hits: dict[str, float] = dict(self._postings.get(term, {}))
+            position = bisect.bisect_right(self._vocabulary, term)
+            while position < len(self._vocabulary) and self._vocabulary[position].startswith(term):
+                for name, weight in self._postings[self._vocabulary[position]].items():
+                    weight *= AUTO_FORGE_TOOL_INDEX_PREFIX_FACTOR
+                    if hits.get(name, 0.0) < weight:
+                        hits[name] = weight
+                position += 1
+            if not hits:
+                continue
+            rarity = math.log(1.0 + total_tools / len(hits))
+            for name, weight in hits.items():
+                scores[name] = scores.get(name, 0.0) + weight * rarity
+                matched[name] = matched.get(name, 0) + 1
+
+        ranked = heapq.nsmallest(offset + limit, scores, key=lambda _name: (-matched[_name], -scores[_name], _name))
+        return [(name, round(scores[name], 3)) for name in ranked[offset:]], len(scores)
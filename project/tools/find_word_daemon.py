@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Daemon tool demo: finds the resource documents that mention a word.
+
+The word index is built once at start-up; the engine then keeps this process alive and
+sends one JSON-RPC request per line on stdin ("tools/call" and "ping"), reading one reply
+per line on stdout. Progress goes out as "log" notifications tagged with the request id.
+The process exits when stdin is closed.
+"""
+import json
+import re
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+
+def build_index(folder):
+    index = defaultdict(list)
+    for path in sorted(Path(folder).glob("*.md")):
+        for number, line in enumerate(path.read_text(encoding="utf-8").splitlines(), start=1):
+            for word in set(re.findall(r"[a-z0-9_]+", line.lower())):
+                index[word].append({"file": path.name, "line": number, "text": line.strip()})
+    return index
+
+
+def send(message):
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def main():
+    index = build_index(sys.argv[1] if len(sys.argv) > 1 else "resources")
+    print(f"indexed {len(index)} words", file=sys.stderr, flush=True)
+
+    for line in sys.stdin:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            continue
+        request_id = request.get("id")
+        if request_id is None:
+            continue  # Notifications (e.g. notifications/cancelled): nothing to answer
+
+        if request.get("method") == "ping":
+            send({"jsonrpc": "2.0", "id": request_id, "result": {}})
+            continue
+
+        word = str(request.get("params", {}).get("arguments", {}).get("word", "")).lower()
+        if not word:
+            send({"jsonrpc": "2.0", "id": request_id, "error": {"code": -32602, "message": "missing 'word'"}})
+            continue
+
+        matches = index.get(word, [])
+        for match in matches:
+            send({"jsonrpc": "2.0", "method": "log",
+                  "params": {"id": request_id, "data": f"{match['file']}:{match['line']}: {match['text']}"}})
+        send({"jsonrpc": "2.0", "id": request_id,
+              "result": {"word": word, "files": sorted({m["file"] for m in matches}), "count": len(matches)}})
+
+
+if __name__ == "__main__":
+    main()